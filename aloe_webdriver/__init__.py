@@ -5,14 +5,25 @@ Basic Selenium_ :class:`Webdriver` steps for Aloe_.
 from aloe import step, world
 
 from aloe_webdriver.util import (
+    confirm_absent,
     ElementSelector,
+    fill_in_fields,
     find_any_field,
     find_button,
     find_field,
     find_option,
+    first_interactable,
+    form_state,
+    form_states,
+    locate,
     option_in_select,
+    single_state,
+    step_timeout,
+    tagged_timeout,
     wait_for,
+    wait_until_idle,
     string_literal,
+    TEXT_SEARCH_SCRIPT,
 )
 
 from selenium.webdriver.support.ui import Select
@@ -20,7 +31,6 @@ from selenium.webdriver.common.alert import Alert
 from selenium.webdriver.common.keys import Keys
 from selenium.common.exceptions import (
     NoSuchElementException,
-    StaleElementReferenceException,
     NoAlertPresentException,
     WebDriverException)
 
@@ -36,19 +46,10 @@ def contains_content(browser, content):
     for in it or its subelements, but whose children do NOT contain that
     text - otherwise matches <body> or <html> or other similarly useless
     things.
-    """
-    for elem in browser.find_elements_by_xpath(str(
-            '//*[contains(normalize-space(.), {content}) '
-            'and not(./*[contains(normalize-space(.), {content})])]'
-            .format(content=string_literal(content)))):
-
-        try:
-            if elem.is_displayed():
-                return True
-        except StaleElementReferenceException:
-            pass
 
-    return False
+    The search is done by the browser in a single request.
+    """
+    return bool(browser.execute_script(TEXT_SEARCH_SCRIPT, content))
 
 
 # Navigation ################################################################
@@ -61,6 +62,27 @@ def visit(self, url):
     world.browser.get(url)
 
 
+@step('I wait for the page to be idle$')
+def page_idle(self):
+    """
+    Wait until the page has finished loading and there are no requests in
+    flight.
+
+    The requests are only known from the first check of the page on, so
+    check before the action starting them:
+
+    .. code-block:: gherkin
+
+        When I wait for the page to be idle
+        And I press "Load more"
+        And I wait for the page to be idle
+        Then I should see "Page 2"
+    """
+
+    if not wait_until_idle(world.browser, timeout=tagged_timeout(self)):
+        raise AssertionError("The page did not become idle.")
+
+
 @step('The browser\'s URL should be "([^"]*)"$')
 @step('I should be at "([^"]*)"$')
 @wait_for
@@ -129,9 +151,8 @@ def click(self, name):
 def should_see_link(self, link_url):
     """Assert a link with the provided URL is visible on the page."""
 
-    elements = ElementSelector(
-        world.browser,
-        str('//a[@href="%s"]' % link_url),
+    elements = locate(
+        world.browser, 'a', [('href', link_url)],
         filter_displayed=True,
     )
     if not elements:
@@ -217,13 +238,12 @@ def should_see_id_in_seconds(self, element_id, timeout):
     def check_element():
         """Check for the element with the given id."""
 
-        assert ElementSelector(
-            world.browser,
-            'id("%s")' % element_id,
+        assert locate(
+            world.browser, attributes=[('id', element_id)],
             filter_displayed=True,
         ), "Expected element with given id."
 
-    wait_for(check_element)(timeout=int(timeout))
+    wait_for(check_element, timeout=int(timeout))()
 
 
 @step('I should see an element with id of "([^"]*)"$')
@@ -233,9 +253,8 @@ def should_see_id(self, element_id):
     Assert an element with the given ``id`` is visible.
     """
 
-    elements = ElementSelector(
-        world.browser,
-        'id("%s")' % element_id,
+    elements = locate(
+        world.browser, attributes=[('id', element_id)],
         filter_displayed=True,
     )
     if not elements:
@@ -243,18 +262,17 @@ def should_see_id(self, element_id):
 
 
 @step('I should not see an element with id of "([^"]*)"$')
-@wait_for
 def should_not_see_id(self, element_id):
     """
     Assert an element with the given ``id`` is not visible.
     """
 
-    elements = ElementSelector(
-        world.browser,
-        'id("%s")' % element_id,
+    elements = locate(
+        world.browser, attributes=[('id', element_id)],
         filter_displayed=True,
     )
-    if elements:
+    if not confirm_absent(world.browser, {'plan': elements.plan},
+                          timeout=step_timeout(self)):
         raise AssertionError("Expected element with given id to be absent.")
 
 
@@ -318,7 +336,7 @@ def should_see_in_seconds(self, text, timeout):
         assert contains_content(world.browser, text), \
             "Expected element with the given text."
 
-    wait_for(check_element)(timeout=int(timeout))
+    wait_for(check_element, timeout=int(timeout))()
 
 
 @step('I should see "([^"]+)"$')
@@ -340,7 +358,6 @@ def should_see(self, text):
 
 @step('I should not see "([^"]+)"$')
 @step("I should not see '([^']+)'$")
-@wait_for
 def should_not_see(self, text):
     """
     Assert provided text is not visible.
@@ -348,7 +365,8 @@ def should_not_see(self, text):
     Be aware that because of the caveats of the positive case, the text MAY
     be on the screen in a slightly different form.
     """
-    if contains_content(world.browser, text):
+    if not confirm_absent(world.browser, {'text': text},
+                          timeout=step_timeout(self)):
         raise AssertionError("Content unexpectedly found.")
 
 
@@ -362,9 +380,8 @@ def see_form(self, url):
     Assert the existence of a HTML form that submits to the given URL.
     """
 
-    elements = ElementSelector(
-        world.browser,
-        str('//form[@action="%s"]' % url),
+    elements = locate(
+        world.browser, 'form', [('action', url)],
         filter_displayed=True,
     )
     if not elements:
@@ -394,6 +411,10 @@ TEXT_FIELDS = (
 )
 
 
+# All the fields with values that can be checked
+FORM_FIELDS = DATE_FIELDS + TEXT_FIELDS + ('checkbox', 'radio', 'select')
+
+
 @step('I fill in "([^"]*)" with "([^"]*)"$')
 @step("I fill in '([^']*)' with '([^']*)'$")
 @wait_for
@@ -428,6 +449,64 @@ def fill_in_textfield(self, field_name, value):
     field.send_keys(value)
 
 
+def fill_in_problem(field, problem):
+    """The error message for a field that cannot be filled in."""
+
+    kind = problem[0]
+    if kind == 'missing':
+        return "Cannot find a field named '{}'.".format(field)
+    if kind == 'multiple':
+        return "Found {} fields named '{}', expected one.".format(
+            problem[1], field)
+    if kind == 'disabled':
+        return "Field '{}' is disabled or read-only.".format(field)
+    if kind == 'state':
+        return "Cannot set field '{}' to '{}', expected 'checked' " \
+            "or 'unchecked'.".format(field, problem[1])
+    return "Cannot find option '{}' in '{}'.".format(problem[1], field)
+
+
+@step(r'I fill in the following:?$')
+@wait_for
+def fill_in_fields_table(self):
+    """
+    Fill in the form fields with the given labels (recommended), names or
+    ids with the given values, all in a single request.
+
+    .. code-block:: gherkin
+
+        When I fill in the following:
+            | field       | value          |
+            | Username    | alice          |
+            | Remember me | checked        |
+            | Country     | New Zealand    |
+
+    The fields are found as with the other steps, and can be text fields,
+    checkboxes, radio buttons or selects. Checkboxes and radio buttons take
+    the value ``checked`` or ``unchecked``. The value of a select is the
+    text (or the value) of the option to select; for multiple selects, of
+    all the options to select, separated by commas. Date fields take their
+    values in ISO format (``yyyy-mm-dd``).
+
+    The values are set directly, firing the ``input`` and ``change`` events,
+    rather than typed key by key. No field is changed unless all of them
+    can be filled in.
+    """
+
+    rows = [(row['field'], row['value']) for row in self.hashes]
+    problems = fill_in_fields(world.browser, [
+        (find_any_field(world.browser, DATE_FIELDS, field).otherwise(
+            find_any_field(world.browser, FORM_FIELDS, field)), value)
+        for field, value in rows
+    ])
+
+    errors = [fill_in_problem(field, problem)
+              for (field, _), problem in zip(rows, problems)
+              if problem is not None]
+    if errors:
+        raise AssertionError('\n'.join(errors))
+
+
 @step('I press "([^"]*)"$')
 @step("I press '([^']*)'$")
 @wait_for
@@ -435,11 +514,12 @@ def press_button(self, value):
     """
     Click the button with the given label.
     """
-    button = find_button(world.browser, value)
-    if not button:
-        raise AssertionError(
-            "Cannot find a button named '{}'.".format(value))
-    button.click()
+    first_interactable(
+        world.browser,
+        find_button(world.browser, value),
+        "a button named '{}'".format(value),
+        single=True,
+    ).click()
 
 
 @step('I click on label "([^"]*)"')
@@ -452,15 +532,17 @@ def click_on_label(self, label):
     On a correctly set up form this will highlight the appropriate field.
     """
 
-    elem = ElementSelector(
+    first_interactable(
         world.browser,
-        str('//label[normalize-space(text())=%s]' % string_literal(label)),
-        filter_displayed=True,
-    )
-    if not elem:
-        raise AssertionError(
-            "Cannot find a label with text '{}'.".format(label))
-    elem.click()
+        ElementSelector(
+            world.browser,
+            str('//label[normalize-space(text())=%s]' %
+                string_literal(label)),
+            filter_displayed=True,
+        ),
+        "a label with text '{}'".format(label),
+        single=True,
+    ).click()
 
 
 @step(r'Input "([^"]*)" (?:has|should have) value "([^"]*)"')
@@ -470,20 +552,88 @@ def input_has_value(self, field_name, value):
     """
     Assert the form input with label (recommended), name or id has given value.
     """
-    text_field = find_any_field(world.browser,
-                                DATE_FIELDS + TEXT_FIELDS,
-                                field_name)
-    if text_field is False:
-        raise AssertionError(
-            "Can not find a field named {!r}.".format(field_name))
+    text_field = single_state(
+        form_state(find_any_field(world.browser,
+                                  DATE_FIELDS + TEXT_FIELDS,
+                                  field_name)),
+        "a field named {!r}".format(field_name))
 
-    actual = text_field.get_attribute('value')
+    actual = text_field['value']
     if actual != value:
         raise AssertionError(
             "Field value expected to be {!r}, got {!r}.".format(
                 value, actual))
 
 
+def field_value(state):
+    """
+    The value of a form field as written in the steps: the value of a text
+    field, ``checked`` or ``unchecked`` for a checkbox or a radio button, and
+    the text of the selected options of a select, separated by commas.
+    """
+
+    if state['type'] in ('checkbox', 'radio'):
+        return 'checked' if state['selected'] else 'unchecked'
+
+    if state['tag'] == 'select':
+        return ', '.join(option['text'] for option in state['controls']
+                         if option['selected'])
+
+    return state['value']
+
+
+def field_value_matches(state, value):
+    """Whether the form field has the value, as written in the steps."""
+
+    if state['tag'] == 'select':
+        selected = [option for option in state['controls']
+                    if option['selected']]
+        return value in (
+            ', '.join(option['text'] for option in selected),
+            ', '.join(option['value'] for option in selected),
+        )
+
+    return field_value(state) == value
+
+
+@step(r'The form should have values:?$')
+@wait_for
+def assert_form_values(self):
+    """
+    Assert the form fields with the given labels (recommended), names or ids
+    have the given values, checking all of them in a single request.
+
+    .. code-block:: gherkin
+
+        Then the form should have values:
+            | field       | value          |
+            | Username    | alice          |
+            | Remember me | checked        |
+            | Country     | New Zealand    |
+
+    Checkboxes and radio buttons have the value ``checked`` or
+    ``unchecked``. The value of a select is the text (or the value) of the
+    selected option; for multiple selects, of all the selected options,
+    separated by commas.
+    """
+
+    rows = [(row['field'], row['value']) for row in self.hashes]
+    states = form_states(world.browser, [
+        find_any_field(world.browser, FORM_FIELDS, field)
+        for field, _ in rows
+    ])
+
+    errors = []
+    for (field, value), field_states in zip(rows, states):
+        state = single_state(field_states, "a field named {!r}".format(field))
+        if not field_value_matches(state, value):
+            errors.append("Field {!r} expected to be {!r}, got {!r}.".format(
+                field, value, field_value(state)))
+
+    if errors:
+        raise AssertionError('\n'.join(errors))
+
+
 @step(r'I submit the only form')
 @wait_for
 def submit_the_only_form(self):
@@ -492,7 +642,7 @@ def submit_the_only_form(self):
 
     Asserts if more than one form exists.
     """
-    form = ElementSelector(world.browser, str('//form'))
+    form = locate(world.browser, 'form')
     assert form, "Cannot find a form on the page."
     form.submit()
 
@@ -504,10 +654,7 @@ def submit_form_id(self, id_):
     Submit the form with given id (used to disambiguate between multiple
     forms).
     """
-    form = ElementSelector(
-        world.browser,
-        str('id("{id}")'.format(id=id_)),
-    )
+    form = locate(world.browser, attributes=[('id', id_)])
     assert form, "Cannot find a form with ID '{}' on the page.".format(id_)
     form.submit()
 
@@ -518,10 +665,7 @@ def submit_form_action(self, url):
     Submit the form with the given action URL (i.e. the form that submits to
     ``/post/my/data``).
     """
-    form = ElementSelector(
-        world.browser,
-        str('//form[@action="%s"]' % url),
-    )
+    form = locate(world.browser, 'form', [('action', url)])
     assert form, \
         "Cannot find a form with action '{}' on the page.".format(url)
     form.submit()
@@ -535,10 +679,11 @@ def submit_form_action(self, url):
 @wait_for
 def check_checkbox(self, value):
     """Check the checkbox with label (recommended), name or id."""
-    check_box = find_field(world.browser, 'checkbox', value)
-    assert check_box, "Cannot find checkbox '{}'.".format(value)
-    if not check_box.is_selected():
-        check_box.click()
+    check_box = single_state(
+        form_state(find_field(world.browser, 'checkbox', value)),
+        "checkbox '{}'".format(value))
+    if not check_box['selected']:
+        check_box['element'].click()
 
 
 @step('I uncheck "([^"]*)"$')
@@ -546,10 +691,11 @@ def check_checkbox(self, value):
 @wait_for
 def uncheck_checkbox(self, value):
     """Uncheck the checkbox with label (recommended), name or id."""
-    check_box = find_field(world.browser, 'checkbox', value)
-    assert check_box, "Cannot find checkbox '{}'.".format(value)
-    if check_box.is_selected():
-        check_box.click()
+    check_box = single_state(
+        form_state(find_field(world.browser, 'checkbox', value)),
+        "checkbox '{}'".format(value))
+    if check_box['selected']:
+        check_box['element'].click()
 
 
 @step('The "([^"]*)" checkbox should be checked$')
@@ -557,9 +703,10 @@ def uncheck_checkbox(self, value):
 @wait_for
 def assert_checked_checkbox(self, value):
     """Assert the checkbox with label (recommended), name or id is checked."""
-    check_box = find_field(world.browser, 'checkbox', value)
-    assert check_box, "Cannot find checkbox '{}'.".format(value)
-    assert check_box.is_selected(), "Check box should be selected."
+    check_box = single_state(
+        form_state(find_field(world.browser, 'checkbox', value)),
+        "checkbox '{}'".format(value))
+    assert check_box['selected'], "Check box should be selected."
 
 
 @step('The "([^"]*)" checkbox should not be checked$')
@@ -569,9 +716,10 @@ def assert_not_checked_checkbox(self, value):
     """
     Assert the checkbox with label (recommended), name or id is not checked.
     """
-    check_box = find_field(world.browser, 'checkbox', value)
-    assert check_box, "Cannot find checkbox '{}'.".format(value)
-    assert not check_box.is_selected(), "Check box should not be selected."
+    check_box = single_state(
+        form_state(find_field(world.browser, 'checkbox', value)),
+        "checkbox '{}'".format(value))
+    assert not check_box['selected'], "Check box should not be selected."
 
 
 # Selects ###################################################################
@@ -635,29 +783,36 @@ def assert_single_selected(self, option_name, select_name):
 
     If multiple selections are supported other options may be selected.
     """
-    option = find_option(world.browser, select_name, option_name)
-    assert option.is_selected(), "Option should be selected."
+    option = single_state(
+        form_state(find_option(world.browser, select_name, option_name)),
+        "option '{}' in '{}'".format(option_name, select_name))
+    assert option['selected'], "Option should be selected."
 
 
 @step('The following options from "([^"]*?)" should be selected:?$')
 @step("The following options from '([^']*?)' should be selected:?$")
 @wait_for
 def assert_multi_selected(self, select_name):
-    select_box = find_field(world.browser, 'select', select_name)
-    assert select_box, "Cannot find a '{}' select.".format(select_name)
+    """
+    Assert that exactly the given options of a select are selected, including
+    the options within an ``optgroup``. Pass a multiline string of options as
+    for :func:`select_multi_items`.
+    """
+    select_box = single_state(
+        form_state(find_field(world.browser, 'select', select_name)),
+        "a '{}' select".format(select_name))
 
     option_names = self.multiline.split('\n')
-    option_elems = select_box.find_elements_by_xpath(str('./option'))
 
     # Check only the options that are specified are selected
-    for option in option_elems:
-        if option.get_attribute('id') in option_names or \
-                option.get_attribute('name') in option_names or \
-                option.get_attribute('value') in option_names or \
-                option.text in option_names:
-            assert option.is_selected(), "Option should be selected."
+    for option in select_box['controls']:
+        if option['id'] in option_names or \
+                option['name'] in option_names or \
+                option['value'] in option_names or \
+                option['text'] in option_names:
+            assert option['selected'], "Option should be selected."
         else:
-            assert not option.is_selected(), \
+            assert not option['selected'], \
                 "Option should not be selected."
 
 
@@ -703,9 +858,10 @@ def assert_radio_selected(self, value):
     Assert the radio button with the given label (recommended), name or id is
     chosen.
     """
-    radio = find_field(world.browser, 'radio', value)
-    assert radio, "Cannot find a '{}' radio button.".format(value)
-    assert radio.is_selected(), "Radio button should be selected."
+    radio = single_state(
+        form_state(find_field(world.browser, 'radio', value)),
+        "a '{}' radio button".format(value))
+    assert radio['selected'], "Radio button should be selected."
 
 
 @step('The "([^"]*)" option should not be chosen$')
@@ -716,9 +872,10 @@ def assert_radio_not_selected(self, value):
     Assert the radio button with the given label (recommended), name or id is
     not chosen.
     """
-    radio = find_field(world.browser, 'radio', value)
-    assert radio, "Cannot find a '{}' radio button.".format(value)
-    assert not radio.is_selected(), "Radio button should not be selected."
+    radio = single_state(
+        form_state(find_field(world.browser, 'radio', value)),
+        "a '{}' radio button".format(value))
+    assert not radio['selected'], "Radio button should not be selected."
 
 
 # Alerts ####################################################################
@@ -796,10 +953,11 @@ def find_by_tooltip(browser, tooltip):
     Returns: an :class:`ElementSelector`
     """
 
-    return ElementSelector(
-        world.browser,
-        str('//*[@title=%(tooltip)s or @data-original-title=%(tooltip)s]' %
-            dict(tooltip=string_literal(tooltip))),
+    return locate(
+        world.browser, attributes=[('title', tooltip)],
+        filter_displayed=True,
+    ) + locate(
+        world.browser, attributes=[('data-original-title', tooltip)],
         filter_displayed=True,
     )
 
@@ -820,14 +978,14 @@ def see_tooltip(self, tooltip):
 
 @step(r'I should not see an element with tooltip "([^"]*)"')
 @step(r"I should not see an element with tooltip '([^']*)'")
-@wait_for
 def no_see_tooltip(self, tooltip):
     """
     Assert an element with the given tooltip (title) is not visible.
     """
 
-    assert not find_by_tooltip(world.browser, tooltip), \
-        "Expected no elements with given tooltip."
+    assert confirm_absent(world.browser, {
+        'plan': find_by_tooltip(world.browser, tooltip).plan,
+    }, timeout=step_timeout(self)), "Expected no elements with given tooltip."
 
 
 @step(r'I (?:click|press) the element with tooltip "([^"]*)"')
@@ -838,15 +996,11 @@ def press_by_tooltip(self, tooltip):
 
     This is very useful if you're clicking on icon buttons, etc.
     """
-    for button in find_by_tooltip(world.browser, tooltip):
-        try:
-            button.click()
-            break
-        except:  # pylint:disable=bare-except
-            pass
-    else:
-        raise AssertionError("No button with tooltip '{0}' found"
-                             .format(tooltip))
+    first_interactable(
+        world.browser,
+        find_by_tooltip(world.browser, tooltip),
+        "a button with tooltip '{}'".format(tooltip),
+    ).click()
 
 # Frames ####################################################################
 
@@ -0,0 +1,194 @@
+"""
+Hooks to save the last WebDriver commands and the browser console messages
+when tests fail.
+
+Assumes a browser instance is stored in ``world.browser``.
+
+The last ``SIZE`` commands sent to the browser, with their responses, are
+kept in memory, along with the steps they were sent from. Whenever a step
+fails, they are saved together with the console messages and JavaScript
+errors of the page, next to the files saved by
+:mod:`aloe_webdriver.screenshot_failed` (which is enabled too)::
+
+    failed_features_account_feature_1_Log_in.commands.json
+
+.. code-block:: python
+
+    import aloe_webdriver.command_log
+
+The console messages are those the browser reports through the WebDriver
+log, if it supports it, and those recorded on the page: while the hooks are
+enabled, a script recording them is run on every page the steps visit, and
+on any other page when a step fails on it.
+
+Parameters and responses are kept truncated to ``TRUNCATE`` characters.
+"""
+
+import json
+from collections import deque
+from functools import wraps
+from time import time
+
+from aloe import after, before, world
+from selenium.webdriver.remote.command import Command
+
+from aloe_webdriver import screenshot_failed
+from aloe_webdriver.util import CAPTURE_CONSOLE_SCRIPT, CONSOLE_SCRIPT
+
+# Pylint cannot infer the attributes on world
+# pylint:disable=no-member
+
+
+SIZE = 100
+TRUNCATE = 500
+
+# The last commands sent and steps started
+COMMANDS = deque(maxlen=SIZE)
+
+
+def instrument(browser):
+    """
+    Record the commands sent to the browser, and have the pages it visits
+    record the console messages.
+
+    Does nothing if the browser is already instrumented.
+    """
+
+    execute = browser.execute
+    if getattr(execute, 'records_commands', False):
+        return
+
+    @wraps(execute)
+    def execute_recording(driver_command, params=None):
+        """Execute the command, recording it and the response."""
+
+        started = time()
+        try:
+            response = execute(driver_command, params)
+        except Exception as ex:
+            COMMANDS.append((started, driver_command, truncate(params),
+                             None, truncate(str(ex))))
+            raise
+        COMMANDS.append((started, driver_command, truncate(params), truncate(
+            response.get('value') if isinstance(response, dict)
+            else response), None))
+
+        if driver_command == Command.GET:
+            try:
+                browser.execute_script(CAPTURE_CONSOLE_SCRIPT)
+            except Exception:  # pylint:disable=broad-except
+                # The page might not allow scripts, e.g. with an alert open
+                pass
+
+        return response
+
+    execute_recording.records_commands = True
+    browser.execute = execute_recording
+
+
+def shorten(value):
+    """
+    The value with long strings and lists cut, so that the JSON of the rest
+    is never truncated.
+    """
+
+    if isinstance(value, str):
+        return value[:TRUNCATE + 1]
+    if isinstance(value, dict):
+        return {key: shorten(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [shorten(item) for item in value[:TRUNCATE]]
+    return value
+
+
+def truncate(value):
+    """The value as JSON, truncated to TRUNCATE characters."""
+
+    text = json.dumps(shorten(value), default=str)
+    if len(text) > TRUNCATE:
+        text = text[:TRUNCATE] + '...'
+    return text
+
+
+def describe(entry):
+    """A recorded command or step as a JSON-serialisable dictionary."""
+
+    if len(entry) == 2:
+        started, step = entry
+        return {'time': started, 'step': step}
+
+    started, command, params, response, error = entry
+    described = {
+        'time': started,
+        'command': command,
+        'params': params,
+    }
+    if error is None:
+        described['response'] = response
+    else:
+        described['error'] = error
+    return described
+
+
+def console_messages(browser):
+    """The browser console messages and JavaScript errors."""
+
+    messages = []
+
+    try:
+        messages.extend(browser.get_log('browser'))
+    except Exception:  # pylint:disable=broad-except
+        # Not every browser supports the log
+        pass
+
+    try:
+        messages.extend(browser.execute_script(CONSOLE_SCRIPT) or [])
+    except Exception:  # pylint:disable=broad-except
+        pass
+
+    return messages
+
+
+def write_command_log(filename, entries, console):
+    """Write the commands and the console messages to a file."""
+
+    with open(filename, 'w') as output:
+        json.dump({
+            'commands': [describe(entry) for entry in entries],
+            'console': console,
+        }, output, indent=2)
+
+
+@before.each_step
+def start_step(step):
+    """Record the step being started, and the commands it sends."""
+
+    global COMMANDS  # pylint:disable=global-statement
+
+    if COMMANDS.maxlen != SIZE:
+        COMMANDS = deque(COMMANDS, maxlen=SIZE)
+
+    browser = getattr(world, 'browser', None)
+    if browser:
+        instrument(browser)
+
+    COMMANDS.append((time(), step.sentence))
+
+
+@after.each_step
+def save_command_log(step):
+    """Save the last commands and the console messages after a failed step."""
+
+    if not step.failed:
+        return
+
+    browser = getattr(world, 'browser', None)
+    if not browser:
+        return
+
+    entries = list(COMMANDS)
+    console = console_messages(browser)
+
+    filename = '{}.commands.json'.format(screenshot_failed.artifact_name(step))
+    screenshot_failed.writer().add(
+        filename, write_command_log, filename, entries, console)
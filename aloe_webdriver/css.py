@@ -8,11 +8,13 @@ See :ref:`good-bdd`.
 .. note::
 
     Be aware these steps require jQuery_. If jQuery_ is not present it will be
-    added (v1.12).
+    added (v3.6, bundled with ``aloe_webdriver``, so no network access is
+    needed).
 
 .. _jQuery: https://jquery.com/
 """
 
+import pkgutil
 from functools import wraps
 from time import sleep
 
@@ -20,6 +22,10 @@ from aloe import step
 from aloe import world
 
 from aloe_webdriver.util import (
+    ABSENCE_SCRIPT,
+    browser_script,
+    confirm_absent,
+    step_timeout,
     wait_for,
 )
 
@@ -31,19 +37,24 @@ from selenium.common.exceptions import WebDriverException
 # pylint:disable=no-member
 
 
-def load_script(browser, url):
-    """Ensure that JavaScript at a given URL is available to the browser."""
-    if browser.current_url.startswith('file:'):
-        url = 'https:' + url
-    browser.execute_script("""
-    var script_tag = document.createElement("script");
-    script_tag.setAttribute("type", "text/javascript");
-    script_tag.setAttribute("src", arguments[0]);
-    document.getElementsByTagName("head")[0].appendChild(script_tag);
-    """, url)
+# jQuery, to be evaluated in the page
+JQUERY_SCRIPT = browser_script('jquery', pkgutil.get_data(
+    'aloe_webdriver', 'jquery.min.js').decode('utf-8'))
 
+# Add jQuery to the page if it has none
+LOAD_JQUERY_JS = "if (!window.jQuery) {\n" + JQUERY_SCRIPT + "\n}\n"
 
-JQUERY = '//ajax.googleapis.com/ajax/libs/jquery/1.12.0/jquery.min.js'
+# Find the elements (or their parents, if the second argument is true) with
+# jQuery, adding it to the page first if it has none
+LOAD_AND_FIND_BY_JQUERY_SCRIPT = browser_script(
+    'load_and_find_by_jquery', LOAD_JQUERY_JS + """
+var found = window.jQuery(arguments[0]);
+return (arguments[1] ? found.parent() : found).get();
+""")
+
+# util.ABSENCE_SCRIPT, adding jQuery to the page first if it has none
+LOAD_AND_CONFIRM_ABSENT_SCRIPT = browser_script(
+    'load_and_confirm_absent', LOAD_JQUERY_JS + ABSENCE_SCRIPT)
 
 
 def is_jquery_not_defined_error(msg):
@@ -65,8 +76,8 @@ def load_jquery(func):
     """
     A decorator to ensure a function is run with jQuery available.
 
-    If an exception from a function indicates jQuery is missing, it is loaded
-    and the function re-executed.
+    If an exception from a function indicates jQuery is missing, it is added
+    to the page and the function re-executed.
 
     The browser to load jQuery into must be the first argument of the function.
     """
@@ -81,31 +92,31 @@ def load_jquery(func):
             if not is_jquery_not_defined_error(ex.msg):
                 raise
 
-            load_script(browser, JQUERY)
-
-            @wait_for
-            def jquery_available():
-                """Assert that jQuery has loaded."""
-                try:
-                    return browser.execute_script('return $')
-                except WebDriverException:
-                    raise AssertionError("jQuery is not loaded") from None
-
-            jquery_available()
+            browser.execute_script(JQUERY_SCRIPT)
 
             return func(browser, *args, **kwargs)
 
     return wrapped
 
 
-@load_jquery
+def find_by_jquery(browser, selector, parents=False):
+    """
+    Find HTML elements, or their parents, using jQuery-style selectors.
+
+    jQuery is added to the page if it has none and the elements are found in
+    a single script, which carries the bundled jQuery for that.
+    """
+
+    return browser.execute_script(
+        LOAD_AND_FIND_BY_JQUERY_SCRIPT, selector, parents)
+
+
 def find_elements_by_jquery(browser, selector):
     """Find HTML elements using jQuery-style selectors.
 
     Ensures that jQuery is available to the browser."""
 
-    return browser.execute_script(
-        """return ($ || jQuery)(arguments[0]).get();""", selector)
+    return find_by_jquery(browser, selector)
 
 
 def find_element_by_jquery(browser, selector):
@@ -118,14 +129,31 @@ def find_element_by_jquery(browser, selector):
     return elements[0]
 
 
-@load_jquery
+def no_elements_by_jquery(browser, selector, timeout=None):
+    """
+    Check that no HTML elements match the jQuery-style selector, waiting up to
+    the timeout in seconds for them to disappear, see
+    :func:`aloe_webdriver.util.confirm_absent`.
+
+    As with :func:`find_by_jquery`, jQuery is added in the same script if the
+    page has none.
+    """
+
+    def check_now(browser, query):
+        """Check once that nothing matches, adding jQuery if needed."""
+        return not find_by_jquery(browser, query['jquery'])
+
+    return confirm_absent(
+        browser, {'jquery': selector}, timeout=timeout,
+        script=LOAD_AND_CONFIRM_ABSENT_SCRIPT, check_now=check_now)
+
+
 def find_parents_by_jquery(browser, selector):
     """Find HTML elements' parents using jQuery-style selectors.
 
     Ensures that jQuery is available to the browser."""
 
-    return browser.execute_script(
-        """return ($ || jQuery)(arguments[0]).parent().get();""", selector)
+    return find_by_jquery(browser, selector, parents=True)
 
 
 @step(r'There should be an element matching \$\("(.*?)"\)$')
@@ -138,13 +166,12 @@ def check_element_by_selector(self, selector):
 
 
 @step(r'There should not be an element matching \$\("(.*?)"\)$')
-@wait_for
 def check_no_element_by_selector(self, selector):
     """Assert an element does not exist matching the given selector."""
-    elems = find_elements_by_jquery(world.browser, selector)
-    if elems:
+    if not no_elements_by_jquery(world.browser, selector,
+                                 timeout=step_timeout(self)):
         raise AssertionError("Expected no matching elements, found {}.".format(
-            len(elems)))
+            len(find_elements_by_jquery(world.browser, selector))))
 
 
 @step(r'There should be an element matching \$\("(.*?)"\) '
@@ -160,7 +187,7 @@ def wait_for_element_by_selector(self, selector, seconds):
         if not find_elements_by_jquery(world.browser, selector):
             raise AssertionError("Expected a matching element.")
 
-    wait_for(assert_element_present)(timeout=int(seconds))
+    wait_for(assert_element_present, timeout=int(seconds))()
 
 
 @step(r'There should be exactly (\d+) elements matching \$\("(.*?)"\)$')
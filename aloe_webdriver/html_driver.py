@@ -0,0 +1,1663 @@
+"""
+A WebDriver running in-process without a browser, for pages that work
+without JavaScript, such as server-rendered Django pages.
+
+The pages are fetched over HTTP and parsed with lxml_; no JavaScript on them
+is run and only inline styles are taken into account for visibility. The
+scripts the steps execute in the browser are recognised and answered by
+their Python equivalents, so the same steps work as with a real browser:
+
+.. code-block:: python
+
+    from contextlib import contextmanager
+
+    from aloe import around, world
+    from aloe_webdriver.html_driver import HTMLDriver
+
+    @around.all
+    @contextmanager
+    def with_browser():
+        world.browser = HTMLDriver()
+        yield
+        world.browser.quit()
+
+Requires lxml_ and cssselect_ (``pip install aloe_webdriver[html]``).
+
+.. _lxml: https://lxml.de/
+.. _cssselect: https://github.com/scrapy/cssselect
+"""
+
+import base64
+import json
+import pkgutil
+import re
+import traceback
+from http.cookiejar import Cookie, CookieJar
+from itertools import count
+from time import sleep, time
+from urllib.error import HTTPError
+from urllib.parse import urldefrag, urlencode, urljoin, urlparse
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+import lxml.html
+from lxml.cssselect import CSSSelector
+
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from aloe_webdriver import util
+
+# pylint:disable=too-many-public-methods,unused-argument
+
+
+ELEMENT_KEY = 'element-6066-11e4-a52e-4f735466cecf'
+
+# A 1x1 transparent PNG
+SCREENSHOT = base64.b64encode(bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c63600000020001'
+    '00e221bc330000000049454e44ae426082'
+)).decode()
+
+BLANK_PAGE = '<html><head></head><body></body></html>'
+
+# Elements never displayed
+INVISIBLE_TAGS = {
+    'head', 'title', 'meta', 'link', 'script', 'style', 'template',
+    'noscript',
+}
+
+# Elements displayed even without any content
+REPLACED_TAGS = {
+    'input', 'textarea', 'select', 'button', 'img', 'iframe', 'canvas',
+    'video', 'audio', 'object', 'embed', 'hr', 'br', 'svg',
+}
+
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'dd', 'div', 'dl', 'dt',
+    'fieldset', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5',
+    'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section',
+    'table', 'tr', 'ul', 'option',
+}
+
+BOOLEAN_ATTRIBUTES = {
+    'async', 'autofocus', 'autoplay', 'checked', 'compact', 'complete',
+    'controls', 'declare', 'defaultchecked', 'defaultselected', 'defer',
+    'disabled', 'draggable', 'ended', 'formnovalidate', 'hidden',
+    'indeterminate', 'iscontenteditable', 'ismap', 'itemscope', 'loop',
+    'multiple', 'muted', 'nohref', 'noresize', 'noshade', 'novalidate',
+    'nowrap', 'open', 'paused', 'pubdate', 'readonly', 'required',
+    'reversed', 'scoped', 'seamless', 'seeking', 'selected', 'spellcheck',
+    'truespeed', 'willvalidate',
+}
+
+# The scripts Selenium runs itself, by a part of them, and the names of their
+# ``script_`` methods: the atoms WebElement uses in W3C mode, and its script
+# to submit a form
+SELENIUM_SCRIPTS = {
+    util.IS_DISPLAYED_JS: 'is_displayed',
+    pkgutil.get_data('selenium.webdriver.remote', 'getAttribute.js')
+    .decode('utf8'): 'get_attribute',
+    "var e = arguments[0].ownerDocument.createEvent('Event');": 'submit',
+}
+
+
+class WebDriverError(Exception):
+    """An error to return to the client."""
+
+    def __init__(self, error, message='', status=500):
+        super().__init__(message)
+        self.error = error
+        self.message = message
+        self.status = status
+
+
+def is_element(node):
+    """Whether an lxml node is an element (and not a comment etc.)."""
+
+    return isinstance(node.tag, str)
+
+
+def inline_style(element):
+    """The inline style of an element as a dictionary."""
+
+    style = {}
+    for declaration in (element.get('style') or '').split(';'):
+        if ':' in declaration:
+            name, value = declaration.split(':', 1)
+            style[name.strip().lower()] = value.strip().lower()
+    return style
+
+
+def normalize_space(text):
+    """Normalise whitespace as XPath normalize-space() does."""
+
+    return re.sub(r'[ \t\r\n]+', ' ', text).strip(' ')
+
+
+def poll(check, timeout):
+    """
+    Call the function until it returns a true value, every
+    ``util.CHECK_EVERY`` seconds for at most the timeout in milliseconds,
+    returning the last value.
+    """
+
+    deadline = time() + timeout / 1000
+    result = check()
+    while not result:
+        remaining = deadline - time()
+        if remaining <= 0:
+            break
+        sleep(min(remaining, util.CHECK_EVERY))
+        result = check()
+    return result
+
+
+def in_order(elements, order):
+    """The unique elements, in document order."""
+
+    return sorted(set(elements), key=order.get)
+
+
+class Document(object):
+    """A page loaded in the browser."""
+
+    ids = count()
+
+    def __init__(self, url, source):
+        self.url = url
+        self.tree = lxml.html.document_fromstring(source)
+        self.doc_id = 'doc{}'.format(next(self.ids))
+        self.generation = 0
+        self.jquery = False
+
+    @property
+    def token(self):
+        """The page token of the page state instrumentation."""
+
+        return '{}:{}'.format(self.doc_id, self.generation)
+
+    @property
+    def title(self):
+        """The document title."""
+
+        return normalize_space(self.tree.findtext('.//title') or '')
+
+    def order(self):
+        """The positions of the elements in document order."""
+
+        return {
+            element: position
+            for position, element in enumerate(self.tree.iter())
+        }
+
+
+# The browser keeps the whole state of a session: the pages, the element
+# references, the form control values, the cookies and the windows
+class HTMLBrowser(object):  # pylint:disable=too-many-instance-attributes
+    """
+    A browser session.
+
+    :param float timeout: seconds to wait for each page to load
+    """
+
+    session_ids = count()
+
+    # The browser name to report in the session capabilities
+    name = 'html'
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self.elements = {}
+        self.element_ids = {}
+        self.properties = {}
+        self.focused = None
+        self.cookie_jar = CookieJar()
+        self.history = []
+        self.windows = ['main']
+        self.session_id = 'session{}'.format(next(self.session_ids))
+        self.top = self.document = Document('about:blank', BLANK_PAGE)
+
+    # Pages
+
+    def fetch(self, url, data=None):
+        """
+        Request the page at the given URL, posting the form data if given.
+
+        Returns: the URL of the page, after any redirects, and its source
+        """
+
+        if url == 'about:blank':
+            return url, BLANK_PAGE
+
+        request = Request(
+            url, data=None if data is None else urlencode(data).encode())
+        try:
+            response = build_opener(HTTPCookieProcessor(self.cookie_jar)) \
+                .open(request, timeout=self.timeout)
+        except HTTPError as error:
+            # Error pages are shown like any other
+            response = error
+        except (OSError, ValueError) as error:
+            # The server cannot be reached
+            raise WebDriverError(
+                'unknown error',
+                "Cannot load {}: {}".format(url, error)) from None
+
+        with response:
+            charset = response.headers.get_content_charset() or 'utf-8'
+            source = response.read().decode(charset, 'replace')
+        # lxml cannot parse an empty document
+        return response.geturl(), source or BLANK_PAGE
+
+    def load(self, url, data=None, history=True):
+        """Navigate to the given URL, posting the form data if given."""
+
+        url = urljoin(self.top.url, url)
+
+        if history:
+            self.history.append(self.top.url)
+
+        if data is None and \
+                urldefrag(url)[0] == urldefrag(self.top.url)[0] and \
+                '#' in url:
+            # Same page navigation
+            self.top.url = url
+            self.top.generation += 1
+            return
+
+        self.top = self.document = Document(*self.fetch(url, data))
+        self.elements.clear()
+        self.element_ids.clear()
+        self.properties.clear()
+        self.focused = None
+
+    # Cookies
+
+    def cookie_domain(self):
+        """The cookie domain of the current page, as CookieJar has it."""
+
+        host = urlparse(self.top.url).hostname or ''
+        # CookieJar treats hosts without dots as local ones
+        return host if '.' in host else host + '.local'
+
+    def cookies(self):
+        """The cookies for the current page, as WebDriver returns them."""
+
+        domain = self.cookie_domain()
+        return [
+            {
+                'name': cookie.name,
+                'value': cookie.value,
+                'path': cookie.path,
+                'domain': cookie.domain,
+                'secure': cookie.secure,
+                'httpOnly': cookie.has_nonstandard_attr('HttpOnly'),
+                'expiry': cookie.expires,
+            }
+            for cookie in self.cookie_jar
+            if ('.' + domain).endswith('.' + cookie.domain.lstrip('.'))
+        ]
+
+    def add_cookie(self, cookie):
+        """Add a cookie given as WebDriver does, for the current page."""
+
+        domain = cookie.get('domain') or self.cookie_domain()
+        self.cookie_jar.set_cookie(Cookie(
+            version=0,
+            name=cookie['name'],
+            value=cookie['value'],
+            port=None,
+            port_specified=False,
+            domain=domain,
+            domain_specified='domain' in cookie,
+            domain_initial_dot=domain.startswith('.'),
+            path=cookie.get('path') or '/',
+            path_specified=True,
+            secure=cookie.get('secure', False),
+            expires=cookie.get('expiry'),
+            discard=cookie.get('expiry') is None,
+            comment=None,
+            comment_url=None,
+            rest={'HttpOnly': None} if cookie.get('httpOnly') else {},
+        ))
+
+    # Element references
+
+    def reference(self, element):
+        """A WebDriver reference to the element."""
+
+        try:
+            element_id = self.element_ids[element]
+        except KeyError:
+            element_id = 'element{}'.format(len(self.elements))
+            self.elements[element_id] = element
+            self.element_ids[element] = element_id
+        return {ELEMENT_KEY: element_id, 'ELEMENT': element_id}
+
+    def element(self, element_id):
+        """The element by its reference ID."""
+
+        try:
+            return self.elements[element_id]
+        except KeyError:
+            raise WebDriverError(
+                'stale element reference',
+                "Element {} is not attached to the page.".format(element_id),
+                status=404,
+            ) from None
+
+    def wrap(self, value):
+        """Convert the elements in a script result to references."""
+
+        if isinstance(value, (list, tuple)):
+            return [self.wrap(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self.wrap(item) for key, item in value.items()}
+        if isinstance(value, lxml.html.HtmlElement):
+            return self.reference(value)
+        return value
+
+    def unwrap(self, value):
+        """Convert the element references in script arguments to elements."""
+
+        if isinstance(value, list):
+            return [self.unwrap(item) for item in value]
+        if isinstance(value, dict):
+            element_id = value.get(ELEMENT_KEY, value.get('ELEMENT'))
+            if element_id is not None:
+                return self.element(element_id)
+            return {key: self.unwrap(item) for key, item in value.items()}
+        return value
+
+    # DOM emulation
+
+    def value(self, element):
+        """The value property of a form control."""
+
+        try:
+            return self.properties[element]['value']
+        except KeyError:
+            pass
+
+        if element.tag == 'textarea':
+            return element.text_content()
+        if element.tag == 'select':
+            selected = [option for option in element.iter('option')
+                        if self.selected(option)]
+            return self.value(selected[0]) if selected else ''
+        if element.tag == 'option':
+            value = element.get('value')
+            return normalize_space(element.text_content()) \
+                if value is None else value
+        if element.tag == 'input' and \
+                element.get('type') in ('checkbox', 'radio'):
+            return element.get('value', 'on')
+        return element.get('value', '')
+
+    def set_property(self, element, name, value):
+        """Set a property of an element."""
+
+        self.properties.setdefault(element, {})[name] = value
+
+    def checked(self, element):
+        """Whether a checkbox or a radio button is checked."""
+
+        try:
+            return self.properties[element]['checked']
+        except KeyError:
+            return element.get('checked') is not None
+
+    def select_element(self, option):
+        """The select an option belongs to."""
+
+        for ancestor in option.iterancestors('select'):
+            return ancestor
+        return None
+
+    def selected(self, element):
+        """Whether an option is selected, or a checkbox checked."""
+
+        if element.tag != 'option':
+            return self.checked(element)
+
+        try:
+            return self.properties[element]['selected']
+        except KeyError:
+            pass
+
+        if element.get('selected') is not None:
+            return True
+
+        select = self.select_element(element)
+        if select is None or select.get('multiple') is not None:
+            return False
+
+        # A single select has its first option selected by default
+        options = list(select.iter('option'))
+        explicit = [
+            self.properties.get(option, {}).get(
+                'selected', option.get('selected') is not None)
+            for option in options
+        ]
+        if any(explicit):
+            return False
+        return options[0] is element
+
+    def displayed(self, element):
+        """Whether the element is displayed, as far as inline styles go."""
+
+        if element.tag in ('option', 'optgroup'):
+            select = self.select_element(element)
+            return select is not None and self.displayed(select)
+
+        if element.tag in INVISIBLE_TAGS:
+            return False
+        if element.tag == 'input' and element.get('type') == 'hidden':
+            return False
+
+        for node in [element] + list(element.iterancestors()):
+            if node.tag in INVISIBLE_TAGS or node.get('hidden') is not None:
+                return False
+            style = inline_style(node)
+            if style.get('display') == 'none' or \
+                    style.get('visibility') == 'hidden':
+                return False
+
+        return self.has_size(element)
+
+    def has_size(self, element):
+        """Whether the element would take up any space on the page."""
+
+        if element.tag in REPLACED_TAGS or element.tag in ('html', 'body'):
+            return True
+        if (element.text or '').strip():
+            return True
+        for child in element:
+            if (child.tail or '').strip():
+                return True
+            if is_element(child) and child.tag not in INVISIBLE_TAGS and \
+                    inline_style(child).get('display') != 'none' and \
+                    self.has_size(child):
+                return True
+        return False
+
+    def enabled(self, element):
+        """Whether the element is enabled."""
+
+        if element.get('disabled') is not None:
+            return False
+        for ancestor in element.iterancestors():
+            if ancestor.tag in ('fieldset', 'optgroup', 'select') and \
+                    ancestor.get('disabled') is not None:
+                return False
+        return True
+
+    def text(self, element):
+        """The visible text of the element."""
+
+        if not self.displayed(element):
+            return ''
+
+        parts = []
+
+        def walk(node):
+            """Collect the text of the displayed elements."""
+
+            if not self.displayed(node):
+                return
+            if node.tag == 'br':
+                parts.append('\n')
+            block = node.tag in BLOCK_TAGS
+            if block:
+                parts.append('\n')
+            if node.text:
+                parts.append(re.sub(r'\s+', ' ', node.text))
+            for child in node:
+                if is_element(child):
+                    walk(child)
+                if child.tail:
+                    parts.append(re.sub(r'\s+', ' ', child.tail))
+            if block:
+                parts.append('\n')
+
+        walk(element)
+        lines = (line.strip() for line in ''.join(parts).split('\n'))
+        return '\n'.join(line for line in lines if line)
+
+    def attribute(self, element, name):
+        """The attribute as Selenium's getAttribute atom would return it."""
+
+        name = name.lower()
+        if name in ('checked', 'selected'):
+            return 'true' if self.selected(element) else None
+        if name == 'value':
+            return self.value(element)
+        if name in ('href', 'src') and element.get(name) is not None:
+            return urljoin(self.document.url, element.get(name))
+        if name in BOOLEAN_ATTRIBUTES:
+            return 'true' if element.get(name) is not None else None
+        return element.get(name)
+
+    def find(self, using, value, context=None):
+        """Find the elements by the given strategy."""
+
+        root = self.document.tree if context is None else context
+
+        if using == 'xpath':
+            try:
+                found = root.xpath(value)
+            except lxml.etree.XPathError as ex:
+                raise WebDriverError(
+                    'invalid selector', str(ex), status=400) from None
+            if not isinstance(found, list):
+                raise WebDriverError(
+                    'invalid selector',
+                    "The XPath does not select elements.", status=400)
+            return [node for node in found
+                    if hasattr(node, 'tag') and is_element(node)]
+
+        if using == 'css selector':
+            return CSSSelector(value)(root)
+
+        if using == 'tag name':
+            return list(root.iter(value))
+
+        if using in ('link text', 'partial link text'):
+            return [
+                link for link in root.iter('a')
+                if (self.text(link) == value if using == 'link text'
+                    else value in self.text(link))
+            ]
+
+        raise WebDriverError('invalid argument',
+                             "Unknown strategy: {}".format(using), status=400)
+
+    def find_one(self, using, value, context=None):
+        """Find the first element by the given strategy."""
+
+        found = self.find(using, value, context)
+        if not found:
+            raise WebDriverError(
+                'no such element',
+                "Unable to locate element: {}".format(value),
+                status=404,
+            )
+        return found[0]
+
+    # Interaction
+
+    def form(self, element):
+        """The form the element belongs to."""
+
+        for ancestor in element.iterancestors('form'):
+            return ancestor
+        return None
+
+    def submit(self, form, submitter=None):
+        """Submit the form, navigating to its action."""
+
+        data = []
+        for control in form.iter('input', 'select', 'textarea', 'button'):
+            name = control.get('name')
+            if not name or not self.enabled(control):
+                continue
+
+            control_type = (control.get('type') or '').lower()
+            if control.tag == 'select':
+                data.extend(
+                    (name, self.value(option))
+                    for option in control.iter('option')
+                    if self.selected(option)
+                )
+            elif control.tag == 'button' or control_type in (
+                    'submit', 'image', 'reset', 'button'):
+                if control is submitter:
+                    data.append((name, self.value(control)))
+            elif control_type in ('checkbox', 'radio'):
+                if self.checked(control):
+                    data.append((name, self.value(control)))
+            else:
+                data.append((name, self.value(control)))
+
+        action = urljoin(self.document.url,
+                         form.get('action') or self.document.url)
+        if (form.get('method') or 'get').lower() == 'get':
+            action = urldefrag(action)[0].split('?')[0] + '?' + \
+                urlencode(data)
+            self.load(action)
+        else:
+            self.load(urldefrag(action)[0], data=data)
+
+    def click(self, element):
+        """Click the element."""
+
+        if not self.displayed(element):
+            raise WebDriverError('element not interactable',
+                                 "Element is not displayed.", status=400)
+
+        self.focused = element
+
+        if element.tag == 'label':
+            self.click_label(element)
+        elif element.tag == 'option':
+            self.click_option(element)
+        elif self.enabled(element):
+            self.activate(element)
+
+    def click_label(self, label):
+        """Click the control a label is for."""
+
+        target = label.get('for')
+        if target:
+            target = self.document.tree.get_element_by_id(target, None)
+        else:
+            target = next(label.iter('input', 'select', 'textarea'), None)
+        if target is not None and self.displayed(target):
+            self.click(target)
+
+    def click_option(self, option):
+        """Select an option, or toggle it in a multiple select."""
+
+        select = self.select_element(option)
+        if select is not None and select.get('multiple') is None:
+            for other in select.iter('option'):
+                self.set_property(other, 'selected', False)
+            self.set_property(option, 'selected', True)
+        else:
+            self.set_property(option, 'selected', not self.selected(option))
+
+    def activate(self, element):
+        """Run the default action of clicking an enabled element."""
+
+        control_type = (element.get('type') or '').lower()
+
+        if element.tag == 'input' and control_type == 'checkbox':
+            self.set_property(element, 'checked', not self.checked(element))
+        elif element.tag == 'input' and control_type == 'radio':
+            self.check_radio(element)
+        elif element.tag == 'input' and control_type in ('submit', 'image') \
+                or element.tag == 'button' and control_type in ('', 'submit'):
+            form = self.form(element)
+            if form is not None:
+                self.submit(form, submitter=element)
+        else:
+            self.follow_link(element)
+
+    def check_radio(self, radio):
+        """Check a radio button, unchecking the others in its group."""
+
+        form = self.form(radio)
+        root = self.document.tree if form is None else form
+        for other in root.iter('input'):
+            if other.get('type') == 'radio' and \
+                    other.get('name') == radio.get('name'):
+                self.set_property(other, 'checked', False)
+        self.set_property(radio, 'checked', True)
+
+    def follow_link(self, element):
+        """Navigate to the link the element is in, if any."""
+
+        for ancestor in [element] + list(element.iterancestors('a')):
+            href = ancestor.get('href') if ancestor.tag == 'a' else None
+            if href is not None and not href.startswith('javascript:'):
+                self.load(href)
+                return
+
+    def type_keys(self, element, text):
+        """Type the text into the element."""
+
+        self.focused = element
+        # Drop the special keys (arrows, Delete, etc.)
+        text = re.sub('[\ue000-\uf8ff]', '', text)
+        self.set_property(element, 'value', self.value(element) + text)
+
+    # Scripts
+
+    def select_css(self, selector, context=None):
+        """The elements matching a CSS selector, as querySelectorAll does."""
+
+        # Unlike querySelectorAll, lxml includes the context itself
+        return [element
+                for element in self.find('css selector', selector, context)
+                if element is not context]
+
+    def select_fields(self, types, value, context=None):
+        """The form fields by ID, name or label, as util.fieldIndex has it."""
+
+        labels = {}
+        for label in self.document.tree.iter('label'):
+            if label.get('for') is not None:
+                labels.setdefault(label.get('for'), []).append(
+                    label.text_content())
+
+        root = self.document.tree if context is None else context
+        fields = []
+        for element in root.iterdescendants('input', 'select', 'textarea'):
+            if element.tag == 'input':
+                matches_type = (element.get('type') or '').lower() in [
+                    field_type for field_type in types
+                    if field_type not in ('select', 'textarea')]
+            else:
+                matches_type = element.tag in types
+            if not matches_type:
+                continue
+
+            label_texts = labels.get(element.get('id'), ())
+            if value in (element.get('id'), element.get('name')) or \
+                    any(value in text for text in label_texts):
+                fields.append(element)
+        return fields
+
+    def evaluate_plan(self, plan, context=None, order=None):
+        """
+        Evaluate a query plan as util.QUERY_SCRIPT does, with the
+        ``plan_<op>`` method for its operation.
+        """
+
+        if order is None:
+            order = self.document.order()
+
+        try:
+            evaluate = getattr(self, 'plan_' + plan['op'])
+        except AttributeError:
+            raise WebDriverError(
+                'javascript error',
+                "Unknown query operation: {}".format(plan['op'])) from None
+
+        return evaluate(plan, context, order)
+
+    def plan_xpath(self, plan, context, order):
+        """The elements matching an XPath expression."""
+
+        return self.find('xpath', plan['xpath'], context)
+
+    def plan_css(self, plan, context, order):
+        """The elements matching a CSS selector."""
+
+        return self.select_css(plan['css'], context)
+
+    def plan_id(self, plan, context, order):
+        """The element with an ID, if it matches the CSS selector."""
+
+        if context is None:
+            element = self.document.tree.get_element_by_id(plan['id'], None)
+            if element is None:
+                return []
+            if element in self.select_css(plan['css']):
+                return [element]
+        return self.select_css(plan['css'], context)
+
+    def plan_field(self, plan, context, order):
+        """The form fields by ID, name or label."""
+
+        return self.select_fields(plan['types'], plan['value'], context)
+
+    def plan_elements(self, plan, context, order):
+        """Elements passed in."""
+
+        return list(plan['elements'])
+
+    def plan_filter(self, plan, context, order):
+        """The displayed or enabled elements of another plan."""
+
+        elements = self.evaluate_plan(plan['plan'], context, order)
+        if plan['displayed']:
+            elements = [el for el in elements if self.displayed(el)]
+        if plan['enabled']:
+            elements = [el for el in elements if self.enabled(el)]
+        return elements
+
+    def plan_concat(self, plan, context, order):
+        """The elements of all the plans, in turn."""
+
+        return [element for subplan in plan['plans']
+                for element in self.evaluate_plan(subplan, context, order)]
+
+    def plan_union(self, plan, context, order):
+        """The elements of any of the plans, in document order."""
+
+        return in_order(
+            (element for subplan in plan['plans']
+             for element in self.evaluate_plan(subplan, context, order)),
+            order)
+
+    def plan_intersection(self, plan, context, order):
+        """The elements of all of the plans."""
+
+        result = self.evaluate_plan(plan['plans'][0], context, order)
+        for subplan in plan['plans'][1:]:
+            other = self.evaluate_plan(subplan, context, order)
+            result = [element for element in result if element in other]
+        return result
+
+    def plan_otherwise(self, plan, context, order):
+        """The elements of the first plan finding any."""
+
+        for subplan in plan['plans']:
+            result = self.evaluate_plan(subplan, context, order)
+            if result:
+                return result
+        return []
+
+    def plan_scope(self, plan, context, order):
+        """The elements of a plan within the elements of another one."""
+
+        return in_order(
+            (element
+             for scope in self.evaluate_plan(plan['context'], context, order)
+             for element in self.evaluate_plan(plan['plan'], scope, order)),
+            order)
+
+    def plan_limit(self, plan, context, order):
+        """The first elements of a plan."""
+
+        return self.evaluate_plan(plan['plan'], context, order)[:plan['count']]
+
+    def plan_shortest(self, plan, context, order):
+        """The element of a plan with the shortest text or value."""
+
+        candidates = self.evaluate_plan(plan['plan'], context, order)
+        if not candidates:
+            return []
+        length = self.text if plan['by_text'] else self.value
+        return [min(candidates, key=lambda element: len(length(element)))]
+
+    def script_query(self, plan):
+        """util.QUERY_SCRIPT"""
+
+        return self.evaluate_plan(plan)
+
+    def script_cached_query(self, token, cached, plan):
+        """util.CACHED_QUERY_SCRIPT"""
+
+        if cached is not None and token == self.document.token:
+            return [token, None]
+        return [self.document.token, self.evaluate_plan(plan)]
+
+    def script_text_search(self, text):
+        """util.TEXT_SEARCH_SCRIPT"""
+
+        def contains_text(element):
+            """Whether the normalised text of the element has the text."""
+            return text in normalize_space(element.text_content())
+
+        root = self.document.tree
+        if not contains_text(root):
+            return False
+
+        # Only descend into the elements containing the text, and check the
+        # innermost ones
+        elements = [root]
+        while elements:
+            element = elements.pop()
+            inner = [child for child in element
+                     if is_element(child) and contains_text(child)]
+            if not inner and self.displayed(element):
+                return True
+            elements.extend(reversed(inner))
+        return False
+
+    def absent(self, query):
+        """Whether nothing matches a query of util.ABSENCE_SCRIPT."""
+
+        if 'text' in query:
+            return not self.script_text_search(query['text'])
+        if 'jquery' in query:
+            return not self.find('css selector', query['jquery'])
+        return not self.evaluate_plan(query['plan'])
+
+    def script_absence(self, query, quiet, timeout):
+        """util.ABSENCE_SCRIPT"""
+
+        if 'jquery' in query and not self.document.jquery:
+            return None
+        # Nothing changes the page by itself, so the quiet time always passes
+        return poll(lambda: self.absent(query), timeout)
+
+    def script_wait_for_change(self, token, timeout):
+        """util.WAIT_FOR_CHANGE_SCRIPT"""
+
+        poll(lambda: self.document.token != token, timeout)
+        return self.document.token
+
+    def script_idle(self, quiet, timeout):
+        """util.IDLE_SCRIPT"""
+
+        # Pages do not run scripts, so never make requests
+        return True
+
+    def script_reset_storage(self, names):
+        """util.RESET_STORAGE_SCRIPT"""
+
+        # There is no storage, nor IndexedDB
+        return False
+
+    def control_state(self, element):
+        """The state of a form control, as util.FORM_STATE_SCRIPT has it."""
+
+        if element.tag == 'input':
+            control_type = (element.get('type') or 'text').lower()
+        elif element.tag == 'select':
+            control_type = 'select-multiple' \
+                if element.get('multiple') is not None else 'select-one'
+        elif element.tag in ('textarea', 'button'):
+            control_type = element.tag
+        else:
+            control_type = None
+
+        is_control = element.tag in (
+            'input', 'select', 'textarea', 'option', 'button')
+        return {
+            'element': element,
+            'tag': element.tag,
+            'type': control_type,
+            'id': element.get('id', ''),
+            'name': element.get('name'),
+            'value': self.value(element) if is_control else None,
+            'text': (normalize_space(element.text_content())
+                     if element.tag == 'option' else None),
+            'selected': self.selected(element) if is_control else False,
+        }
+
+    def script_form_state(self, plans):
+        """util.FORM_STATE_SCRIPT"""
+
+        result = []
+        for plan in plans:
+            states = []
+            for element in self.evaluate_plan(plan):
+                state = self.control_state(element)
+                state['controls'] = [
+                    self.control_state(control)
+                    for control in element.iterdescendants(
+                        'input', 'select', 'textarea', 'option')
+                ]
+                states.append(state)
+            result.append(states)
+        return result
+
+    def prepare_fill_in(self, plan, value):
+        """
+        The problem with setting the value of a field, as
+        util.FILL_IN_SCRIPT reports it, or the function to set it.
+        """
+
+        elements = self.evaluate_plan(plan)
+        if not elements:
+            return ['missing'], None
+        if len(elements) > 1:
+            return ['multiple', len(elements)], None
+
+        element = elements[0]
+        if not self.enabled(element) or element.get('readonly') is not None:
+            return ['disabled'], None
+
+        control_type = self.control_state(element)['type']
+        if control_type in ('checkbox', 'radio'):
+            return self.prepare_check(element, control_type, value)
+        if element.tag == 'select':
+            return self.prepare_select(element, control_type, value)
+        return None, lambda: self.set_property(element, 'value', value)
+
+    def prepare_check(self, element, control_type, value):
+        """Prepare checking or unchecking a checkbox or a radio button."""
+
+        if value not in ('checked', 'unchecked'):
+            return ['state', value], None
+        check = value == 'checked'
+        if control_type == 'radio' and self.checked(element) and not check:
+            return ['state', value], None
+
+        def toggle():
+            """Click the element if it is not as it should be."""
+            if self.checked(element) != check:
+                self.click(element)
+        return None, toggle
+
+    def prepare_select(self, element, control_type, value):
+        """Prepare selecting the options of a select by text or value."""
+
+        if control_type == 'select-multiple':
+            names = [name.strip() for name in value.split(',')
+                     if name.strip()]
+        else:
+            names = [value]
+
+        options = list(element.iter('option'))
+        chosen = []
+        for name in names:
+            matching = [
+                option for option in options
+                if name in (normalize_space(option.text_content()),
+                            self.value(option))
+            ]
+            if not matching:
+                return ['option', name], None
+            chosen.append(matching[0])
+
+        def select():
+            """Select the chosen options only."""
+            for option in options:
+                self.set_property(option, 'selected', option in chosen)
+        return None, select
+
+    def script_fill_in(self, fields):
+        """util.FILL_IN_SCRIPT"""
+
+        prepared = [self.prepare_fill_in(plan, value)
+                    for plan, value in fields]
+        if not any(problem for problem, _ in prepared):
+            for _, apply in prepared:
+                apply()
+        return [problem for problem, _ in prepared]
+
+    def script_interactable(self, plan, probe_all):
+        """util.INTERACTABLE_SCRIPT"""
+
+        probed = []
+        for element in self.evaluate_plan(plan):
+            displayed = self.displayed(element)
+            enabled = self.enabled(element)
+            # There is no layout: everything displayed fits in the window
+            probed.append({
+                'element': element,
+                'displayed': displayed,
+                'enabled': enabled,
+                'in_viewport': displayed and enabled,
+                'hit': displayed and enabled,
+            })
+            if displayed and enabled and not probe_all:
+                break
+        return probed
+
+    def script_capture_console(self):
+        """util.CAPTURE_CONSOLE_SCRIPT"""
+
+    def script_console(self):
+        """util.CONSOLE_SCRIPT"""
+
+        return []
+
+    def script_jquery(self):
+        """css.JQUERY_SCRIPT"""
+
+        self.document.jquery = True
+
+    def script_load_and_find_by_jquery(self, selector, parents):
+        """css.LOAD_AND_FIND_BY_JQUERY_SCRIPT"""
+
+        self.document.jquery = True
+
+        # jQuery extensions to CSS are not supported
+        elements = self.find('css selector', selector)
+        if not parents:
+            return elements
+
+        return in_order((element.getparent() for element in elements),
+                        self.document.order())
+
+    def script_load_and_confirm_absent(self, query, quiet, timeout):
+        """css.LOAD_AND_CONFIRM_ABSENT_SCRIPT"""
+
+        self.document.jquery = True
+        return self.script_absence(query, quiet, timeout)
+
+    def script_is_displayed(self, element):
+        """Selenium's isDisplayed atom."""
+
+        return self.displayed(element)
+
+    def script_get_attribute(self, element, name):
+        """Selenium's getAttribute atom."""
+
+        return self.attribute(element, name)
+
+    def script_submit(self, form):
+        """Selenium's script to submit a form."""
+
+        self.submit(form)
+
+    def execute_script(self, script, args):
+        """
+        Run one of the known scripts, recognised by the name marking it (see
+        :func:`aloe_webdriver.util.browser_script`) or by a part of Selenium's
+        own scripts.
+        """
+
+        name = util.script_name(script)
+        if name is None:
+            name = next((name for part, name in SELENIUM_SCRIPTS.items()
+                         if part in script), None)
+
+        handler = name and getattr(self, 'script_' + name, None)
+        if handler is None:
+            raise WebDriverError(
+                'javascript error',
+                "The {} browser cannot run this script: {}".format(
+                    self.name, script[:200]),
+            )
+
+        return self.wrap(handler(*self.unwrap(args)))
+
+    # Commands
+
+    def cmd_new_session(self, params):
+        """Describe the new session."""
+
+        return {
+            'sessionId': self.session_id,
+            'capabilities': {
+                'browserName': self.name,
+                'acceptInsecureCerts': False,
+            },
+        }
+
+    def cmd_quit(self, params):
+        """End the session."""
+
+        return None
+
+    def cmd_get(self, params):
+        """Navigate to a URL."""
+
+        self.load(params['url'])
+
+    def cmd_get_current_url(self, params):
+        """The URL of the current page."""
+
+        return self.top.url
+
+    def cmd_get_title(self, params):
+        """The title of the current page."""
+
+        return self.top.title
+
+    def cmd_get_page_source(self, params):
+        """The source of the current document."""
+
+        return lxml.html.tostring(self.document.tree, encoding='unicode')
+
+    def cmd_refresh(self, params):
+        """Load the current page again."""
+
+        self.load(self.top.url, history=False)
+
+    def cmd_go_back(self, params):
+        """Go back to the previous page, if any."""
+
+        if self.history:
+            self.load(self.history.pop(), history=False)
+
+    def cmd_screenshot(self, params):
+        """A blank screenshot, as nothing is rendered."""
+
+        return SCREENSHOT
+
+    def cmd_find_element(self, params, element_id=None):
+        """Find an element in the document or within another element."""
+
+        context = None if element_id is None else self.element(element_id)
+        return self.reference(
+            self.find_one(params['using'], params['value'], context))
+
+    def cmd_find_elements(self, params, element_id=None):
+        """Find the elements in the document or within another element."""
+
+        context = None if element_id is None else self.element(element_id)
+        return [self.reference(element) for element in
+                self.find(params['using'], params['value'], context)]
+
+    def cmd_get_active_element(self, params):
+        """The focused element, or the body."""
+
+        focused = self.focused
+        if focused is None:
+            focused = self.document.tree.find('body')
+        return self.reference(focused)
+
+    def cmd_click(self, params, element_id):
+        """Click an element."""
+
+        self.click(self.element(element_id))
+
+    def cmd_clear(self, params, element_id):
+        """Clear the value of a form control."""
+
+        self.set_property(self.element(element_id), 'value', '')
+
+    def cmd_send_keys(self, params, element_id):
+        """Type into a form control."""
+
+        self.type_keys(self.element(element_id), params['text'])
+
+    def cmd_get_text(self, params, element_id):
+        """The rendered text of an element."""
+
+        return self.text(self.element(element_id))
+
+    def cmd_get_tag_name(self, params, element_id):
+        """The tag name of an element."""
+
+        return self.element(element_id).tag
+
+    def cmd_is_selected(self, params, element_id):
+        """Whether a checkbox, radio button or option is selected."""
+
+        return self.selected(self.element(element_id))
+
+    def cmd_is_enabled(self, params, element_id):
+        """Whether an element is enabled."""
+
+        return self.enabled(self.element(element_id))
+
+    def cmd_is_displayed(self, params, element_id):
+        """Whether an element is displayed."""
+
+        return self.displayed(self.element(element_id))
+
+    def cmd_get_attribute(self, params, element_id, name):
+        """The value of an attribute of an element."""
+
+        return self.element(element_id).get(name)
+
+    def cmd_get_property(self, params, element_id, name):
+        """The value of a property of an element."""
+
+        return self.attribute(self.element(element_id), name)
+
+    def cmd_get_css(self, params, element_id, name):
+        """The value of an inline style property of an element."""
+
+        return inline_style(self.element(element_id)).get(name, '')
+
+    def cmd_get_rect(self, params, element_id):
+        """A nominal size and position, as nothing is laid out."""
+
+        return {'x': 0, 'y': 0, 'width': 100, 'height': 20}
+
+    def cmd_execute_script(self, params):
+        """Run one of the known scripts."""
+
+        return self.execute_script(params['script'], params['args'])
+
+    def cmd_window_handle(self, params):
+        """The handle of the only window."""
+
+        if not self.windows:
+            raise WebDriverError('no such window', status=404)
+        return 'main'
+
+    def cmd_window_handles(self, params):
+        """The handles of the open windows."""
+
+        return self.windows
+
+    def cmd_switch_to_window(self, params):
+        """Switch to the only window."""
+
+        if params['handle'] not in self.windows:
+            raise WebDriverError('no such window', status=404)
+
+    def cmd_close_window(self, params):
+        """Close the window."""
+
+        self.windows = []
+        return self.windows
+
+    def cmd_switch_to_frame(self, params):
+        """Switch to a frame by element or index, or to the top document."""
+
+        frame = params.get('id')
+        if frame is None:
+            self.document = self.top
+            return
+        if isinstance(frame, dict):
+            frame = self.unwrap(frame)
+        else:
+            frames = list(self.document.tree.iter('iframe', 'frame'))
+            try:
+                frame = frames[frame]
+            except (IndexError, TypeError):
+                raise WebDriverError('no such frame', status=404) from None
+        if frame.get('srcdoc') is not None:
+            self.document = Document('about:srcdoc', frame.get('srcdoc'))
+        else:
+            url = urljoin(self.document.url, frame.get('src') or 'about:blank')
+            self.document = Document(*self.fetch(url))
+
+    def cmd_switch_to_parent_frame(self, params):
+        """Switch to the top document, as frames are not nested."""
+
+        self.document = self.top
+
+    def cmd_get_cookies(self, params):
+        """The cookies for the current page."""
+
+        return self.cookies()
+
+    def cmd_get_cookie(self, params, name):
+        """The cookie for the current page with the given name."""
+
+        for cookie in self.cookies():
+            if cookie['name'] == name:
+                return cookie
+        raise WebDriverError(
+            'no such cookie', "No cookie {}.".format(name), status=404)
+
+    def cmd_add_cookie(self, params):
+        """Set a cookie for the current page."""
+
+        self.add_cookie(params['cookie'])
+
+    def cmd_delete_cookie(self, params, name):
+        """Delete the cookies for the current page with the given name."""
+
+        for cookie in self.cookies():
+            if cookie['name'] == name:
+                self.cookie_jar.clear(
+                    cookie['domain'], cookie['path'], cookie['name'])
+
+    def cmd_delete_cookies(self, params):
+        """Delete all the cookies."""
+
+        self.cookie_jar.clear()
+
+    def cmd_set_timeouts(self, params):
+        """Accept the timeouts, as nothing is waited for."""
+
+        return None
+
+    def cmd_no_alert(self, params):
+        """Fail to find an alert, as there are none without JavaScript."""
+
+        raise WebDriverError('no such alert', "No alert is open.", status=404)
+
+
+# The WebDriver commands answered: the Selenium command, its HTTP method and
+# path, and the name of the ``cmd_`` method of HTMLBrowser handling it
+COMMANDS = (
+    (Command.STATUS, 'GET', '/status', 'status'),
+    (Command.NEW_SESSION, 'POST', '/session', 'new_session'),
+    (Command.QUIT, 'DELETE', '/session/$sessionId', 'quit'),
+    (Command.GET, 'POST', '/session/$sessionId/url', 'get'),
+    (Command.GET_CURRENT_URL, 'GET', '/session/$sessionId/url',
+     'get_current_url'),
+    (Command.GET_TITLE, 'GET', '/session/$sessionId/title', 'get_title'),
+    (Command.GET_PAGE_SOURCE, 'GET', '/session/$sessionId/source',
+     'get_page_source'),
+    (Command.REFRESH, 'POST', '/session/$sessionId/refresh', 'refresh'),
+    (Command.GO_BACK, 'POST', '/session/$sessionId/back', 'go_back'),
+    (Command.SCREENSHOT, 'GET', '/session/$sessionId/screenshot',
+     'screenshot'),
+    (Command.W3C_GET_ACTIVE_ELEMENT, 'GET',
+     '/session/$sessionId/element/active', 'get_active_element'),
+    (Command.FIND_ELEMENT, 'POST', '/session/$sessionId/element',
+     'find_element'),
+    (Command.FIND_ELEMENTS, 'POST', '/session/$sessionId/elements',
+     'find_elements'),
+    (Command.FIND_CHILD_ELEMENT, 'POST',
+     '/session/$sessionId/element/$id/element', 'find_element'),
+    (Command.FIND_CHILD_ELEMENTS, 'POST',
+     '/session/$sessionId/element/$id/elements', 'find_elements'),
+    (Command.CLICK_ELEMENT, 'POST', '/session/$sessionId/element/$id/click',
+     'click'),
+    (Command.CLEAR_ELEMENT, 'POST', '/session/$sessionId/element/$id/clear',
+     'clear'),
+    (Command.SEND_KEYS_TO_ELEMENT, 'POST',
+     '/session/$sessionId/element/$id/value', 'send_keys'),
+    (Command.GET_ELEMENT_TEXT, 'GET', '/session/$sessionId/element/$id/text',
+     'get_text'),
+    (Command.GET_ELEMENT_TAG_NAME, 'GET',
+     '/session/$sessionId/element/$id/name', 'get_tag_name'),
+    (Command.IS_ELEMENT_SELECTED, 'GET',
+     '/session/$sessionId/element/$id/selected', 'is_selected'),
+    (Command.IS_ELEMENT_ENABLED, 'GET',
+     '/session/$sessionId/element/$id/enabled', 'is_enabled'),
+    (Command.IS_ELEMENT_DISPLAYED, 'GET',
+     '/session/$sessionId/element/$id/displayed', 'is_displayed'),
+    (Command.GET_ELEMENT_RECT, 'GET', '/session/$sessionId/element/$id/rect',
+     'get_rect'),
+    (Command.GET_ELEMENT_ATTRIBUTE, 'GET',
+     '/session/$sessionId/element/$id/attribute/$name', 'get_attribute'),
+    (Command.GET_ELEMENT_PROPERTY, 'GET',
+     '/session/$sessionId/element/$id/property/$name', 'get_property'),
+    (Command.GET_ELEMENT_VALUE_OF_CSS_PROPERTY, 'GET',
+     '/session/$sessionId/element/$id/css/$propertyName', 'get_css'),
+    (Command.W3C_EXECUTE_SCRIPT, 'POST', '/session/$sessionId/execute/sync',
+     'execute_script'),
+    (Command.W3C_EXECUTE_SCRIPT_ASYNC, 'POST',
+     '/session/$sessionId/execute/async', 'execute_script'),
+    (Command.W3C_GET_CURRENT_WINDOW_HANDLE, 'GET',
+     '/session/$sessionId/window', 'window_handle'),
+    (Command.W3C_GET_WINDOW_HANDLES, 'GET',
+     '/session/$sessionId/window/handles', 'window_handles'),
+    (Command.SWITCH_TO_WINDOW, 'POST', '/session/$sessionId/window',
+     'switch_to_window'),
+    (Command.CLOSE, 'DELETE', '/session/$sessionId/window', 'close_window'),
+    (Command.SWITCH_TO_FRAME, 'POST', '/session/$sessionId/frame',
+     'switch_to_frame'),
+    (Command.SWITCH_TO_PARENT_FRAME, 'POST',
+     '/session/$sessionId/frame/parent', 'switch_to_parent_frame'),
+    (Command.GET_ALL_COOKIES, 'GET', '/session/$sessionId/cookie',
+     'get_cookies'),
+    (Command.GET_COOKIE, 'GET', '/session/$sessionId/cookie/$name',
+     'get_cookie'),
+    (Command.ADD_COOKIE, 'POST', '/session/$sessionId/cookie', 'add_cookie'),
+    (Command.DELETE_COOKIE, 'DELETE', '/session/$sessionId/cookie/$name',
+     'delete_cookie'),
+    (Command.DELETE_ALL_COOKIES, 'DELETE', '/session/$sessionId/cookie',
+     'delete_cookies'),
+    (Command.SET_TIMEOUTS, 'POST', '/session/$sessionId/timeouts',
+     'set_timeouts'),
+    (Command.W3C_GET_ALERT_TEXT, 'GET', '/session/$sessionId/alert/text',
+     'no_alert'),
+    (Command.W3C_ACCEPT_ALERT, 'POST', '/session/$sessionId/alert/accept',
+     'no_alert'),
+    (Command.W3C_DISMISS_ALERT, 'POST', '/session/$sessionId/alert/dismiss',
+     'no_alert'),
+)
+
+# The names of the handler arguments for the variables in the command paths
+PATH_ARGUMENTS = {
+    'sessionId': 'session_id',
+    'id': 'element_id',
+    'name': 'name',
+    'propertyName': 'name',
+}
+
+PATH_VARIABLE = re.compile(r'\$(\w+)')
+
+
+def path_pattern(path):
+    """A regular expression matching a command path, capturing variables."""
+
+    return re.compile('^' + PATH_VARIABLE.sub(
+        lambda match: '(?P<{}>[^/]+)'.format(PATH_ARGUMENTS[match.group(1)]),
+        path,
+    ) + '$')
+
+
+# The handlers by HTTP method and path pattern
+ROUTES = [
+    (method, path_pattern(path), handler)
+    for _, method, path, handler in COMMANDS
+]
+
+# The paths and handlers by Selenium command
+COMMAND_HANDLERS = {
+    command: (path, handler)
+    for command, _, path, handler in COMMANDS
+}
+
+
+def route(method, path):
+    """
+    The handler of a WebDriver request: the name of the ``cmd_`` method of
+    :class:`HTMLBrowser` and the arguments from the path, or ``None`` for an
+    unknown command.
+    """
+
+    for route_method, pattern, handler in ROUTES:
+        match = pattern.match(path)
+        if route_method == method and match:
+            return handler, match.groupdict()
+    return None
+
+
+def command_handler(command, params):
+    """
+    The handler of a Selenium command: the name of the ``cmd_`` method of
+    :class:`HTMLBrowser` and the arguments from the parameters filling in
+    the path, or ``None`` for an unknown command.
+    """
+
+    try:
+        path, handler = COMMAND_HANDLERS[command]
+    except KeyError:
+        return None
+
+    return handler, {
+        PATH_ARGUMENTS[variable]: str(params[variable])
+        for variable in PATH_VARIABLE.findall(path)
+    }
+
+
+class Sessions(object):
+    """
+    The browser sessions, answering the WebDriver commands.
+
+    :param browser_class: the class of the browsers (default
+        :class:`HTMLBrowser`)
+    :param browser_args: arguments for the browser class
+    """
+
+    def __init__(self, browser_class=None, **browser_args):
+        self.browser_class = browser_class or HTMLBrowser
+        self.browser_args = browser_args
+        self.sessions = {}
+
+    def new_session(self):
+        """Start a new browser session."""
+
+        browser = self.browser_class(**self.browser_args)
+        self.sessions[browser.session_id] = browser
+        return browser
+
+    def session(self, session_id):
+        """The browser of a session."""
+
+        try:
+            return self.sessions[session_id]
+        except KeyError:
+            raise WebDriverError(
+                'invalid session id',
+                "No session {}.".format(session_id), status=404) from None
+
+    def execute(self, method, path, params):
+        """
+        Run a WebDriver command sent over HTTP.
+
+        Returns: the response status and body
+        """
+
+        return self.run(route(method, path), params,
+                        "{} {}".format(method, path))
+
+    def execute_command(self, command, params):
+        """
+        Run a Selenium command.
+
+        Returns: the response status and body
+        """
+
+        return self.run(command_handler(command, params), params, command)
+
+    def run(self, handler, params, command):
+        """
+        Run a WebDriver command.
+
+        :param handler: the name of the ``cmd_`` method of the browser and its
+            arguments, as :func:`route` returns them
+        :param dict params: the command parameters
+        :param command: the command, to report if it is unknown
+
+        Returns: the response status and body
+        """
+
+        status = 200
+        try:
+            if handler is None:
+                raise WebDriverError(
+                    'unknown command', str(command), status=404)
+            handler, arguments = handler
+            if handler == 'status':
+                value = {'ready': True, 'message': "Ready."}
+            else:
+                if handler == 'new_session':
+                    browser = self.new_session()
+                else:
+                    browser = self.session(arguments.pop('session_id'))
+                if handler == 'quit':
+                    del self.sessions[browser.session_id]
+                value = getattr(browser, 'cmd_' + handler)(
+                    params, **arguments)
+        except WebDriverError as ex:
+            status = ex.status
+            value = {
+                'error': ex.error,
+                'message': ex.message,
+                'stacktrace': '',
+            }
+        except Exception as ex:  # pylint:disable=broad-except
+            # A bug in the emulation
+            status = 500
+            value = {
+                'error': 'unknown error',
+                'message': repr(ex),
+                'stacktrace': traceback.format_exc(),
+            }
+
+        return status, {'value': value}
+
+
+class InProcessConnection(RemoteConnection):
+    """
+    A Selenium connection running the commands on in-process browsers
+    instead of sending them to a WebDriver server.
+
+    :param browser_args: arguments for :class:`Sessions`
+    """
+
+    def __init__(self, **browser_args):
+        super().__init__('http://in-process', resolve_ip=False)
+        self.sessions = Sessions(**browser_args)
+
+    def execute(self, command, params):
+        """Run a command, answering as a W3C WebDriver server would."""
+
+        status, response = self.sessions.execute_command(command, params)
+
+        # Only pass on the JSON values a server can return
+        response = json.loads(json.dumps(response))
+        if status >= 400:
+            # The error code for Selenium's error handler
+            response['status'] = response['value']['error']
+        return response
+
+
+class HTMLDriver(WebDriver):
+    """
+    A WebDriver for pages that work without JavaScript, running in-process
+    without a browser.
+
+    :param browser_args: arguments for :class:`HTMLBrowser`, or
+        `browser_class` for another class of browsers
+    """
+
+    def __init__(self, **browser_args):
+        super().__init__(
+            command_executor=InProcessConnection(**browser_args),
+            desired_capabilities={},
+        )
@@ -0,0 +1,239 @@
+"""
+Hooks to record the WebDriver commands issued by each step.
+
+Assumes a browser instance is stored in ``world.browser``.
+
+Every command sent to the browser is attributed to the step being run. For
+each step, the number of the commands of each type (e.g. ``findElements``,
+``executeScript``) and a histogram of their latencies are recorded, and
+written out after all the tests have run:
+
+.. code-block:: python
+
+    import aloe_webdriver.metrics
+
+By default the metrics are written as JSON to ``webdriver_metrics.json`` in
+the current directory. To write them elsewhere, or as CSV (with a row per
+command type of each step), override the constant ``OUTPUT``:
+
+.. code-block:: python
+
+    from aloe_webdriver import metrics
+
+    metrics.OUTPUT = '/alternative/directory/metrics.csv'
+
+The histogram bucket upper bounds, in milliseconds, are set by ``BUCKETS``.
+"""
+
+import csv
+import json
+from functools import wraps
+from time import time
+
+from aloe import after, before, world
+
+# Pylint cannot infer the attributes on world
+# pylint:disable=no-member
+
+
+OUTPUT = 'webdriver_metrics.json'
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Commands issued outside of any step
+OUTSIDE_STEPS = '(outside steps)'
+
+
+class StepMetrics(object):
+    """
+    The commands issued during a single run of a step.
+
+    :param step: the Aloe step, or ``None`` for the commands issued outside
+        of steps
+    """
+
+    def __init__(self, step=None):
+        self.step = step
+        self.started = time()
+        self.duration = None
+        self.failed = None
+        self.commands = {}
+
+    def record(self, command, latency):
+        """
+        Record a command.
+
+        :param str command: command name
+        :param float latency: time taken, in seconds
+        """
+
+        try:
+            stats = self.commands[command]
+        except KeyError:
+            stats = self.commands[command] = {
+                'count': 0,
+                'total': 0.0,
+                'histogram': [0] * (len(BUCKETS) + 1),
+            }
+
+        stats['count'] += 1
+        stats['total'] += latency
+
+        latency_ms = latency * 1000
+        bucket = next(
+            (idx for idx, bound in enumerate(BUCKETS) if latency_ms <= bound),
+            len(BUCKETS),
+        )
+        stats['histogram'][bucket] += 1
+
+    def finish(self, failed):
+        """Record the step completion."""
+
+        self.duration = time() - self.started
+        self.failed = failed
+
+    @property
+    def location(self):
+        """The step file name and line."""
+
+        if self.step is None:
+            return OUTSIDE_STEPS
+
+        try:
+            return self.step.location
+        except (AttributeError, TypeError):
+            return ''
+
+    @property
+    def sentence(self):
+        """The step sentence."""
+
+        if self.step is None:
+            return ''
+
+        return self.step.sentence
+
+    @property
+    def scenario(self):
+        """The name of the scenario (or background) the step is in."""
+
+        if self.step is None:
+            return ''
+
+        try:
+            return self.step.scenario.name
+        except AttributeError:
+            return self.step.background.keyword
+
+    def as_dict(self):
+        """The metrics as a JSON-serialisable dictionary."""
+
+        return {
+            'location': self.location,
+            'scenario': self.scenario,
+            'step': self.sentence,
+            'failed': self.failed,
+            'duration': self.duration,
+            'commands': self.commands,
+        }
+
+
+# The metrics of the steps run, and a stack of the currently running steps
+# (the innermost last) to attribute the commands to
+STEPS = []
+RUNNING = []
+
+
+def current_metrics():
+    """The metrics of the innermost running step."""
+
+    if not RUNNING:
+        if not STEPS or STEPS[-1].step is not None:
+            STEPS.append(StepMetrics())
+        return STEPS[-1]
+
+    return RUNNING[-1]
+
+
+def instrument(browser):
+    """
+    Record the commands sent to the browser.
+
+    Does nothing if the browser is already instrumented.
+    """
+
+    execute = browser.execute
+    if getattr(execute, 'records_metrics', False):
+        return
+
+    @wraps(execute)
+    def execute_recording(driver_command, params=None):
+        """Execute the command, recording the time taken."""
+
+        start = time()
+        try:
+            return execute(driver_command, params)
+        finally:
+            current_metrics().record(driver_command, time() - start)
+
+    execute_recording.records_metrics = True
+    browser.execute = execute_recording
+
+
+def write_metrics(filename):
+    """
+    Write the recorded metrics to a file, as CSV if the file name ends with
+    ``.csv``, otherwise as JSON.
+    """
+
+    if filename.endswith('.csv'):
+        header = ['location', 'scenario', 'step', 'failed', 'command',
+                  'count', 'total']
+        header.extend('<={}ms'.format(bound) for bound in BUCKETS)
+        header.append('>{}ms'.format(BUCKETS[-1]))
+
+        with open(filename, 'w', newline='') as output:
+            writer = csv.writer(output)
+            writer.writerow(header)
+            for metrics in STEPS:
+                for command, stats in sorted(metrics.commands.items()):
+                    row = [metrics.location, metrics.scenario,
+                           metrics.sentence, metrics.failed, command,
+                           stats['count'], stats['total']]
+                    row.extend(stats['histogram'])
+                    writer.writerow(row)
+    else:
+        with open(filename, 'w') as output:
+            json.dump({
+                'buckets': BUCKETS,
+                'steps': [metrics.as_dict() for metrics in STEPS],
+            }, output, indent=2)
+
+
+@before.each_step
+def start_step(step):
+    """Start recording the commands of a step."""
+
+    browser = getattr(world, 'browser', None)
+    if browser:
+        instrument(browser)
+
+    metrics = StepMetrics(step)
+    STEPS.append(metrics)
+    RUNNING.append(metrics)
+
+
+@after.each_step
+def finish_step(step):
+    """Finish recording the commands of a step."""
+
+    if RUNNING:
+        RUNNING.pop().finish(step.failed)
+
+
+@after.all
+def save_metrics():
+    """Write the metrics of all the steps run."""
+
+    if STEPS:
+        write_metrics(OUTPUT)
+        del STEPS[:]
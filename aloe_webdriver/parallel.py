@@ -0,0 +1,353 @@
+"""
+Run the scenarios in several worker processes, each with its own browser.
+
+The steps keep using ``world.browser``: every worker starts a browser with a
+factory function while loading the features (see
+:mod:`aloe_webdriver.prewarm`) and quits it after running its share of the
+scenarios:
+
+.. code-block:: bash
+
+    python -m aloe_webdriver.parallel --workers 4 \\
+        --browser-factory myproject.browser:create_browser \\
+        features/
+
+Any arguments after the options are passed to Aloe in each worker.
+
+Every worker runs the whole suite, claiming each scenario as it reaches it; a
+scenario already claimed by another worker is passed over. A worker finishing
+a slow scenario thus moves on to the next scenario nobody has started, so the
+scenarios are spread evenly even if they take very different times to run.
+
+Aloe hooks run in every worker as usual, so the ``all`` and ``each_feature``
+hooks run once per worker: every worker loads all the features, and runs the
+``each_feature`` hooks of a feature even if another worker claimed all its
+scenarios. Without a browser factory, a browser created by such a hook is used
+instead.
+
+Each worker writes its output to ``aloe-worker-N.log`` in the log directory
+(the current directory by default). If :mod:`aloe_webdriver.screenshot_failed`
+is used, the screenshots of every worker are saved to a ``worker-N``
+subdirectory of its ``DIRECTORY``. When all the workers are done, their
+results are merged into a single report.
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import traceback
+from collections import namedtuple
+from time import time
+
+from aloe.plugin import GherkinPlugin
+from aloe.runner import Runner
+
+from aloe_webdriver import prewarm
+from aloe_webdriver.util import import_function
+
+
+WORKER_NAME = 'worker-{}'
+LOG_FORMAT = 'aloe-{worker}.log'
+
+# How the workers run the scenarios:
+# argv: the arguments to pass to Aloe
+# browser_factory: ``module:function`` to create the browser with, or ``None``
+# log_directory: the directory to write the worker output to
+# directory: the directory to run the scenarios in
+WorkerOptions = namedtuple(
+    'WorkerOptions', 'argv browser_factory log_directory directory')
+
+
+class WorkerPlugin(GherkinPlugin):
+    """
+    Only run the scenarios claimed by this worker.
+
+    :param worker: the worker name
+    :param claim: a function claiming the scenario at the given position
+        in the suite, returning whether the claim succeeded
+    """
+
+    def __init__(self, worker, claim):
+        super().__init__()
+        self.worker = worker
+        self.claim = claim
+        self.position = 0
+        self.result = None
+
+    def begin(self):
+        """Load the step definitions and separate the worker artifacts."""
+
+        super().begin()
+
+        # The steps have been imported and may have set the directory
+        screenshot_failed = sys.modules.get('aloe_webdriver.screenshot_failed')
+        if screenshot_failed is not None:
+            screenshot_failed.DIRECTORY = os.path.join(
+                screenshot_failed.DIRECTORY, self.worker)
+            os.makedirs(screenshot_failed.DIRECTORY, exist_ok=True)
+
+    def prepareTestCase(self, test):  # pylint:disable=invalid-name
+        """Pass over the scenarios claimed by other workers."""
+
+        position = self.position
+        self.position += 1
+
+        if self.claim(position):
+            return None
+
+        return lambda result: None
+
+    def finalize(self, result):
+        """Keep the result to report to the main process."""
+
+        super().finalize(result)
+        self.result = result
+
+
+class WorkerRunner(Runner):
+    """A runner using the given plugin."""
+
+    def __init__(self, plugin, *args, **kwargs):
+        self.plugin = plugin
+        super().__init__(*args, **kwargs)
+
+    def gherkin_plugin(self):
+        return self.plugin
+
+
+def summarize(worker, result, duration):
+    """The result of a worker as a dictionary to send to the main process."""
+
+    def describe(problems):
+        """The tests and tracebacks of failures or errors."""
+        return [(str(test), details) for test, details in problems]
+
+    return {
+        'worker': worker,
+        'tests_run': result.testsRun,
+        'failures': describe(result.failures),
+        'errors': describe(result.errors),
+        'skipped': len(result.skipped),
+        'duration': duration,
+    }
+
+
+def run_worker(number, counter, results, options):
+    """
+    Run the claimed scenarios in a worker process.
+
+    :param int number: the worker number
+    :param counter: the shared position after the last claimed scenario
+    :param results: the queue to put the worker result on
+    :param WorkerOptions options: how to run the scenarios
+    """
+
+    worker = WORKER_NAME.format(number)
+    os.chdir(options.directory)
+
+    def claim(position):
+        """
+        Claim the scenario at the given position.
+
+        All the workers go through the scenarios in the same order, so the
+        ones before the last claimed scenario are already claimed.
+        """
+
+        with counter.get_lock():
+            if counter.value <= position:
+                counter.value = position + 1
+                return True
+        return False
+
+    log_path = os.path.join(options.log_directory,
+                            LOG_FORMAT.format(worker=worker))
+    with open(log_path, 'w') as log:
+        sys.stdout = sys.stderr = log
+
+        plugin = WorkerPlugin(worker, claim)
+        start = time()
+        try:
+            # Start the browser while the features are loading
+            if options.browser_factory:
+                prewarm.start(import_function(options.browser_factory))
+
+            try:
+                WorkerRunner(plugin, argv=['aloe'] + list(options.argv),
+                             exit=False)
+            finally:
+                prewarm.quit_prewarmed()
+        except Exception:  # pylint:disable=broad-except
+            # Report the worker failing, rather than losing its scenarios
+            results.put(worker_error(
+                worker, traceback.format_exc(), time() - start))
+            raise
+
+        results.put(summarize(worker, plugin.result, time() - start))
+
+
+def worker_error(worker, message, duration=0):
+    """The result of a worker which failed to run the scenarios."""
+
+    return {
+        'worker': worker,
+        'tests_run': 0,
+        'failures': [],
+        'errors': [(worker, message)],
+        'skipped': 0,
+        'duration': duration,
+    }
+
+
+class ParallelResult(object):
+    """The merged results of the workers."""
+
+    def __init__(self, workers, duration):
+        self.workers = sorted(workers, key=lambda worker: worker['worker'])
+        self.duration = duration
+
+    @property
+    def tests_run(self):
+        """The number of scenarios run."""
+        return sum(worker['tests_run'] for worker in self.workers)
+
+    @property
+    def failures(self):
+        """The failed scenarios and their tracebacks."""
+        return [failure for worker in self.workers
+                for failure in worker['failures']]
+
+    @property
+    def errors(self):
+        """The scenarios and workers that errored, and their tracebacks."""
+        return [error for worker in self.workers
+                for error in worker['errors']]
+
+    @property
+    def success(self):
+        """Whether all the scenarios passed."""
+        return bool(self.workers) and not self.failures and not self.errors
+
+    def report(self, stream):
+        """Write a report of the results to the stream."""
+
+        for worker in self.workers:
+            failed = len(worker['failures']) + len(worker['errors'])
+            stream.write("{worker}: {tests_run} scenarios in {duration:.1f}s, "
+                         "{failed} failed\n".format(failed=failed, **worker))
+
+        for kind, problems in (('FAIL', self.failures),
+                               ('ERROR', self.errors)):
+            for test, details in problems:
+                stream.write('=' * 70 + '\n')
+                stream.write('{}: {}\n'.format(kind, test))
+                stream.write('-' * 70 + '\n')
+                stream.write(details + '\n')
+
+        stream.write('-' * 70 + '\n')
+        stream.write("Ran {} scenarios in {:.1f}s with {} workers\n".format(
+            self.tests_run, self.duration, len(self.workers)))
+
+        if self.success:
+            stream.write("OK\n")
+        else:
+            stream.write("FAILED (failures={}, errors={})\n".format(
+                len(self.failures), len(self.errors)))
+
+
+def run_parallel(argv=(), workers=None, browser_factory=None,
+                 log_directory='.'):
+    """
+    Run the scenarios in several worker processes.
+
+    :param argv: the arguments to pass to Aloe
+    :param int workers: the number of workers, by default the number of CPUs
+    :param str browser_factory: ``module:function`` to create each worker's
+        browser with
+    :param str log_directory: the directory to write the worker output to
+    :returns: :class:`ParallelResult`
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    # Start the workers afresh, without the steps and hooks of this process
+    context = multiprocessing.get_context('spawn')
+    counter = context.Value('i', 0)
+    results = context.Queue()
+
+    options = WorkerOptions(
+        argv=list(argv),
+        browser_factory=browser_factory,
+        log_directory=os.path.abspath(log_directory),
+        directory=os.getcwd(),
+    )
+
+    start = time()
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(number, counter, results, options),
+            name=WORKER_NAME.format(number),
+        )
+        for number in range(1, workers + 1)
+    ]
+    for process in processes:
+        process.start()
+
+    # Collect the results before joining to not block on a full queue
+    summaries = []
+    while len(summaries) < workers:
+        try:
+            summaries.append(results.get(timeout=1))
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+    for process in processes:
+        process.join()
+
+    # Report the workers which died without sending their results
+    reported = {summary['worker'] for summary in summaries}
+    for process in processes:
+        if process.name not in reported:
+            summaries.append(worker_error(
+                process.name,
+                "Worker exited with code {}.".format(process.exitcode),
+            ))
+
+    return ParallelResult(summaries, time() - start)
+
+
+def main(argv=None):
+    """Run the scenarios in parallel from the command line."""
+
+    parser = argparse.ArgumentParser(
+        description="Run Aloe scenarios in several worker processes.",
+        epilog="Other arguments are passed to Aloe.",
+    )
+    parser.add_argument(
+        '--workers', type=int, default=None,
+        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument(
+        '--browser-factory', metavar='MODULE:FUNCTION',
+        help="function creating the browser of each worker")
+    parser.add_argument(
+        '--log-directory', default='.',
+        help="directory to write the output of each worker to")
+
+    options, aloe_argv = parser.parse_known_args(argv)
+
+    result = run_parallel(
+        aloe_argv,
+        workers=options.workers,
+        browser_factory=options.browser_factory,
+        log_directory=options.log_directory,
+    )
+    result.report(sys.stderr)
+
+    sys.exit(0 if result.success else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+Start the browser in the background while the features and the application
+are still loading, rather than before the first step.
+
+.. code-block:: python
+
+    from aloe_webdriver import prewarm
+
+    prewarm.start(create_browser)
+
+The browser is put into ``world.browser`` when the first scenario starts,
+waiting for it to finish starting if needed. If there is a browser in
+``world.browser`` already, the pre-warmed one is not used. Either way, it is
+quit after all the tests have run.
+
+To choose the factory function when running the tests, call
+:func:`start_from_environment` instead, at the top of ``terrain.py``, and set
+the environment variable ``ALOE_WEBDRIVER_PREWARM`` to the function as
+``module:function``:
+
+.. code-block:: python
+
+    prewarm.start_from_environment()
+
+For a remote browser, pass the Selenium server address as ``status_url``
+to wait until the server reports it is ready before creating the browser.
+To only wait for a server to be ready, run the module::
+
+    python -m aloe_webdriver.prewarm http://localhost:4444/wd/hub
+"""
+
+import json
+import os
+import sys
+import threading
+from time import sleep, time
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from aloe import after, before, world
+from selenium.common.exceptions import TimeoutException
+
+from aloe_webdriver.util import import_function
+
+# Pylint cannot infer the attributes on world
+# pylint:disable=no-member
+
+
+STATUS_TIMEOUT = 60
+STATUS_CHECK_EVERY = 0.1
+
+ENVIRONMENT_VARIABLE = 'ALOE_WEBDRIVER_PREWARM'
+
+
+def server_ready(url):
+    """Whether the WebDriver server at the URL reports it is ready."""
+
+    try:
+        with urlopen(url.rstrip('/') + '/status', timeout=1) as response:
+            status = json.loads(response.read().decode('utf-8'))
+    except (URLError, OSError, ValueError):
+        return False
+
+    value = status.get('value')
+    if isinstance(value, dict) and 'ready' in value:
+        return bool(value['ready'])
+
+    # Servers predating the W3C protocol
+    return status.get('status') == 0
+
+
+def wait_for_server(url, timeout=None):
+    """
+    Wait until the WebDriver server at the URL is ready.
+
+    :param float timeout: how long to wait, in seconds, by default
+        ``STATUS_TIMEOUT``
+    """
+
+    if timeout is None:
+        timeout = STATUS_TIMEOUT
+
+    deadline = time() + timeout
+    while not server_ready(url):
+        if time() > deadline:
+            raise TimeoutException(
+                "WebDriver server at {} not ready.".format(url))
+        sleep(STATUS_CHECK_EVERY)
+
+
+class PrewarmedBrowser(object):
+    """
+    A browser being started in a background thread.
+
+    :param factory: a function creating the browser
+    :param status_url: the WebDriver server to wait for before creating
+        the browser
+    """
+
+    def __init__(self, factory, status_url=None):
+        self.factory = factory
+        self.status_url = status_url
+        self.browser = None
+        self.error = None
+
+        self.thread = threading.Thread(target=self.start)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def start(self):
+        """Create the browser."""
+
+        try:
+            if self.status_url:
+                wait_for_server(self.status_url)
+            self.browser = self.factory()
+        except Exception:  # pylint:disable=broad-except
+            self.error = sys.exc_info()[1]
+
+    def get(self):
+        """The browser, waiting until it has started."""
+
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.browser
+
+
+# The browser being started, and the one handed over to world.browser
+PREWARMED = None
+HANDED_OVER = None
+
+
+def start(factory, status_url=None):
+    """
+    Start creating the browser in the background.
+
+    Does nothing if a browser has been started already.
+    """
+
+    global PREWARMED  # pylint:disable=global-statement
+
+    if PREWARMED is None and HANDED_OVER is None:
+        PREWARMED = PrewarmedBrowser(factory, status_url=status_url)
+
+
+def start_from_environment():
+    """Start the browser if the factory is set in the environment."""
+
+    factory = os.environ.get(ENVIRONMENT_VARIABLE)
+    if factory:
+        start(import_function(factory))
+
+
+def take_browser():
+    """The pre-warmed browser, or None if none has been started."""
+
+    global PREWARMED  # pylint:disable=global-statement
+
+    if PREWARMED is None:
+        return None
+
+    prewarmed, PREWARMED = PREWARMED, None
+    return prewarmed.get()
+
+
+def hand_over_browser(scenario, outline, steps):
+    """Put the pre-warmed browser into world.browser."""
+
+    global HANDED_OVER  # pylint:disable=global-statement
+
+    if PREWARMED is None or getattr(world, 'browser', None):
+        return
+
+    HANDED_OVER = world.browser = take_browser()
+
+
+# Before the other hooks, which might need the browser
+before.each_example(hand_over_browser, priority=-1)
+
+
+@after.all
+def quit_prewarmed():
+    """Quit the pre-warmed browser."""
+
+    global HANDED_OVER  # pylint:disable=global-statement
+
+    browsers = []
+
+    if PREWARMED is not None:
+        try:
+            browsers.append(take_browser())
+        except Exception:  # pylint:disable=broad-except
+            pass
+
+    # Unless it has been replaced, e.g. by reuse_browser
+    if HANDED_OVER is not None and \
+            getattr(world, 'browser', None) is HANDED_OVER:
+        browsers.append(HANDED_OVER)
+        delattr(world, 'browser')
+    HANDED_OVER = None
+
+    for browser in browsers:
+        try:
+            browser.quit()
+        except Exception:  # pylint:disable=broad-except
+            pass
+
+
+def main():
+    """Wait for the WebDriver servers given on the command line."""
+
+    for url in sys.argv[1:]:
+        wait_for_server(url)
+
+
+if __name__ == '__main__':
+    main()
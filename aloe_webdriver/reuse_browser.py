@@ -0,0 +1,189 @@
+"""
+Hooks to keep the browser session across the scenarios, resetting its state
+before each one instead of starting a new browser.
+
+The browser is created by a factory function when the first scenario starts
+and stored in ``world.browser``. Before every following scenario, an open
+alert is dismissed, the extra windows are closed, the cookies and the local,
+session and IndexedDB storage of the current page are cleared, and the
+browser goes to ``about:blank`` in the main frame. The browser is quit after
+all the tests have run.
+
+.. code-block:: python
+
+    from aloe_webdriver import reuse_browser
+
+    reuse_browser.FACTORY = create_browser
+
+If the browser crashed or did not reset within ``RESET_TIMEOUT`` seconds,
+it is discarded and a new one created with the factory.
+
+Note that cookies and storage can only be cleared for the site the browser
+is on when the scenario ends; the state of other sites visited remains.
+
+Browsers which cannot list the IndexedDB databases of a site (such as Firefox
+before version 126) only have those named in ``INDEXED_DB_NAMES`` deleted:
+
+.. code-block:: python
+
+    reuse_browser.INDEXED_DB_NAMES = ['myapp-cache']
+
+A browser already in ``world.browser`` (for example, set up by
+:mod:`aloe_webdriver.parallel`) is reset in the same way, and only quit by
+these hooks if it has been replaced.
+"""
+
+import threading
+
+from aloe import after, before, world
+from selenium.common.exceptions import NoAlertPresentException
+
+from aloe_webdriver.util import RESET_STORAGE_SCRIPT
+
+# Pylint cannot infer the attributes on world
+# pylint:disable=no-member
+
+
+def no_factory():
+    """The default factory, asking to set one."""
+
+    raise ValueError(
+        "Set aloe_webdriver.reuse_browser.FACTORY to create browsers.")
+
+
+FACTORY = no_factory
+RESET_TIMEOUT = 30
+BLANK_URL = 'about:blank'
+
+# The IndexedDB databases to delete if the browser cannot list them
+INDEXED_DB_NAMES = ()
+
+# The browser created by these hooks, and its main window
+BROWSER = None
+MAIN_WINDOW = None
+
+
+def reset_browser(browser, main_window=None):
+    """
+    Reset the browser state.
+
+    :param browser: the browser to reset
+    :param main_window: the handle of the window to keep, by default the
+        first one
+    """
+
+    # An open alert would fail the window commands
+    try:
+        browser.switch_to.alert.dismiss()
+    except NoAlertPresentException:
+        pass
+
+    handles = browser.window_handles
+    if main_window not in handles:
+        main_window = handles[0]
+    for handle in handles:
+        if handle != main_window:
+            browser.switch_to.window(handle)
+            browser.close()
+    browser.switch_to.window(main_window)
+
+    browser.switch_to.default_content()
+
+    if browser.current_url != BLANK_URL:
+        browser.delete_all_cookies()
+        browser.execute_async_script(RESET_STORAGE_SCRIPT,
+                                     list(INDEXED_DB_NAMES))
+        browser.get(BLANK_URL)
+
+
+def try_reset_browser(browser, main_window=None, timeout=None):
+    """
+    Reset the browser state, giving up if it takes too long.
+
+    Returns whether the browser was reset.
+    """
+
+    if timeout is None:
+        timeout = RESET_TIMEOUT
+
+    succeeded = []
+
+    def reset():
+        """Reset the browser, recording the success."""
+        try:
+            reset_browser(browser, main_window)
+            succeeded.append(True)
+        except Exception:  # pylint:disable=broad-except
+            pass
+
+    # A hung browser might never respond, so reset it in a separate thread
+    resetting = threading.Thread(target=reset)
+    resetting.daemon = True
+    resetting.start()
+    resetting.join(timeout)
+
+    return bool(succeeded)
+
+
+def discard_browser(browser):
+    """Quit the browser, not waiting for it if it does not respond."""
+
+    def quit_browser():
+        """Quit the browser, ignoring the errors."""
+        try:
+            browser.quit()
+        except Exception:  # pylint:disable=broad-except
+            pass
+
+    quitting = threading.Thread(target=quit_browser)
+    quitting.daemon = True
+    quitting.start()
+    quitting.join(RESET_TIMEOUT)
+
+
+def new_browser():
+    """Create a browser with the factory and store it in world.browser."""
+
+    global BROWSER, MAIN_WINDOW  # pylint:disable=global-statement
+
+    BROWSER = world.browser = FACTORY()
+    MAIN_WINDOW = BROWSER.current_window_handle
+    return BROWSER
+
+
+def prepare_browser():
+    """
+    Make a browser with a clean state available in world.browser, resetting
+    the existing one or replacing it if it does not work.
+    """
+
+    browser = getattr(world, 'browser', None)
+    if browser is None:
+        return new_browser()
+
+    main_window = MAIN_WINDOW if browser is BROWSER else None
+    if try_reset_browser(browser, main_window):
+        return browser
+
+    discard_browser(browser)
+    return new_browser()
+
+
+@before.each_example
+def reset_session(scenario, outline, steps):
+    """Reset the browser before each scenario."""
+
+    prepare_browser()
+
+
+@after.all
+def quit_session():
+    """Quit the browser created by the hooks."""
+
+    global BROWSER, MAIN_WINDOW  # pylint:disable=global-statement
+
+    if BROWSER is not None:
+        discard_browser(BROWSER)
+        if getattr(world, 'browser', None) is BROWSER:
+            delattr(world, 'browser')
+        BROWSER = MAIN_WINDOW = None
@@ -21,8 +21,8 @@ Consider the following feature:
             And I press "Log in"
             Then I should see "Logged in"
 
-If there will be no "Logged in" text when expected, screenshot and the page
-source will be saved to, respectively::
+If there will be no "Logged in" text when expected, screenshot and the
+page source will be saved to, respectively::
 
     failed_features_account_feature_1_Log_in.png
     failed_features_account_feature_1_Log_in.html
@@ -37,13 +37,43 @@ To change the directory where the screenshots are saved, override the constant
     screenshot_failed.DIRECTORY = '/alternative/directory'
 
 Note that the given directory should already exist.
+
+Only taking the screenshot and getting the page source hold up the tests; the
+files are written by a background thread, at most ``QUEUE_SIZE`` of them
+waiting at a time. All of them are written by the time the tests finish.
+
+Further settings:
+
+``COMPRESS_HTML``
+    Whether to gzip the page source. Set to ``True`` to save it as
+    ``.html.gz`` instead of plain ``.html``.
+``PNG_COMPRESSION``
+    If set to a zlib compression level (0-9), the screenshots are re-encoded
+    at that level. Browsers favour speed over size when encoding them.
+``MAX_SIZE``
+    If set, files larger than this many bytes (after compression) are not
+    saved.
+``CONTENT_ADDRESSED``
+    Save each distinct screenshot and page source once, with a manifest per
+    failure, see :mod:`aloe_webdriver.snapshots`. ``RETENTION_SIZE`` and
+    ``RETENTION_AGE`` then limit the files kept.
 """
 
+import atexit
+import gzip
+import queue
 import re
 import os
+import struct
+import sys
+import threading
+import zlib
+from functools import partial
 
 from aloe import after, world
 
+from aloe_webdriver.snapshots import SnapshotStore
+
 # Pylint cannot infer the attributes on world
 # pylint:disable=no-member
 
@@ -51,42 +81,269 @@ from aloe import after, world
 DIRECTORY = ''
 FORMAT = 'failed_{feature_file}_{scenario_index}_{scenario_name}{outline_index}'
 
+COMPRESS_HTML = False
+PNG_COMPRESSION = None
+MAX_SIZE = None
+QUEUE_SIZE = 16
 
-@after.each_step
-def take_screenshot(self):
-    """Take a screenshot after a failed step."""
+CONTENT_ADDRESSED = False
+RETENTION_SIZE = None
+RETENTION_AGE = None
 
-    if not self.failed:
-        return
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
 
-    browser = getattr(world, 'browser', None)
-    if not browser:
-        return
+
+def png_chunks(data):
+    """The type and data of the chunks of a PNG image."""
+
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("Not a PNG image.")
+
+    position = len(PNG_SIGNATURE)
+    while position < len(data):
+        length, = struct.unpack('>I', data[position:position + 4])
+        chunk_type = data[position + 4:position + 8]
+        yield chunk_type, data[position + 8:position + 8 + length]
+        position += 12 + length
+
+
+def png_chunk(chunk_type, chunk_data):
+    """Encode a PNG chunk."""
+
+    return struct.pack('>I', len(chunk_data)) + chunk_type + chunk_data + \
+        struct.pack('>I', zlib.crc32(chunk_type + chunk_data) & 0xffffffff)
+
+
+def recompress_png(data, level):
+    """
+    Re-encode a PNG image with the given zlib compression level.
+
+    The pixel data is left as it is, only compressed again.
+    """
+
+    chunks = list(png_chunks(data))
+    pixels = zlib.decompress(b''.join(
+        chunk_data for chunk_type, chunk_data in chunks
+        if chunk_type == b'IDAT'))
+
+    result = [PNG_SIGNATURE]
+    for chunk_type, chunk_data in chunks:
+        if chunk_type == b'IDAT':
+            if pixels is not None:
+                result.append(png_chunk(
+                    b'IDAT', zlib.compress(pixels, level)))
+                pixels = None
+        else:
+            result.append(png_chunk(chunk_type, chunk_data))
+
+    recompressed = b''.join(result)
+    return recompressed if len(recompressed) < len(data) else data
+
+
+class ArtifactWriter(object):
+    """
+    Save files in a background thread.
+
+    :param int size: the number of tasks that can be waiting; adding more
+        blocks until some are done
+    """
+
+    def __init__(self, size):
+        self.queue = queue.Queue(maxsize=size)
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def add(self, description, task, *args):
+        """
+        Run a task saving files in the background thread.
+
+        :param description: what is being saved, to report errors with
+        :param task: the function to call with the remaining arguments
+        """
+
+        self.queue.put((description, task, args))
+
+    def run(self):
+        """Run the tasks as they are added."""
+
+        while True:
+            description, task, args = self.queue.get()
+            try:
+                task(*args)
+            except Exception as ex:  # pylint:disable=broad-except
+                sys.stderr.write(
+                    "Failed to save {}: {}\n".format(description, ex))
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """Wait until all the tasks are done."""
+
+        self.queue.join()
+
+
+# Started with the first failure
+WRITER = None
+
+
+def writer():
+    """The artifact writer, starting it if needed."""
+
+    global WRITER  # pylint:disable=global-statement
+
+    if WRITER is None:
+        WRITER = ArtifactWriter(QUEUE_SIZE)
+        atexit.register(WRITER.flush)
+    return WRITER
+
+
+def within_size(description, data):
+    """Whether the file is small enough to save, reporting it if not."""
+
+    if MAX_SIZE is not None and len(data) > MAX_SIZE:
+        sys.stderr.write(
+            "Not saving {}: {} bytes is over the limit of {}.\n".format(
+                description, len(data), MAX_SIZE))
+        return False
+
+    return True
+
+
+def encode_within_size(description, encode, data):
+    """The encoded file contents, or None if the file is too large."""
+
+    data = encode(data)
+    return data if within_size(description, data) else None
+
+
+def write_file(filename, encode, data):
+    """Encode and write a file, unless it is too large."""
+
+    data = encode_within_size(filename, encode, data)
+    if data is not None:
+        with open(filename, 'wb') as output:
+            output.write(data)
+
+
+def store_snapshot(name, png, page_source):
+    """Save the files to the content-addressed store, and the manifest."""
+
+    store = SnapshotStore(os.path.dirname(name) or '.')
+    name = os.path.basename(name)
+
+    files = {}
+    for kind, data, extension, encode in (
+            ('screenshot', png, '.png', encode_screenshot),
+            ('page_source', page_source.encode('utf-8'),
+             '.html.gz' if COMPRESS_HTML else '.html', compress_html),
+    ):
+        description = '{} of {}'.format(kind, name)
+        path, _ = store.add_object(
+            data, extension,
+            encode=partial(encode_within_size, description, encode))
+        if path is not None:
+            files[kind] = path
+
+    store.add_manifest(name, files)
+
+
+def prune_snapshots():
+    """Apply the retention limits to the content-addressed store."""
+
+    SnapshotStore(DIRECTORY or '.').prune(
+        max_size=RETENTION_SIZE, max_age=RETENTION_AGE)
+
+
+def encode_screenshot(png):
+    """
+    The screenshot file contents.
+
+    A screenshot which cannot be re-encoded is saved as the browser sent it.
+    """
+
+    if PNG_COMPRESSION is not None:
+        try:
+            png = recompress_png(png, PNG_COMPRESSION)
+        except (ValueError, struct.error, zlib.error):
+            pass
+    return png
+
+
+def compress_html(data):
+    """The page source file contents from the encoded source."""
+
+    if COMPRESS_HTML:
+        data = gzip.compress(data)
+    return data
+
+
+def encode_page_source(page_source):
+    """The page source file contents."""
+
+    return compress_html(page_source.encode('utf-8'))
+
+
+def artifact_name(step):
+    """The path of the failure artifacts of the step, without an extension."""
 
     try:
-        scenario_name = self.scenario.name
+        scenario_name = step.scenario.name
         scenario_index = \
-            self.scenario.feature.scenarios.index(self.scenario) + 1
+            step.scenario.feature.scenarios.index(step.scenario) + 1
     except AttributeError:
-        scenario_name = self.background.keyword
+        scenario_name = step.background.keyword
         scenario_index = 0
 
-    if self.outline is None:
+    if step.outline is None:
         outline_index_str = ''
     else:
-        outline_index = self.scenario.outlines.index(self.outline) + 1
+        outline_index = step.scenario.outlines.index(step.outline) + 1
         outline_index_str = '_{}'.format(outline_index)
 
     base_name = FORMAT.format(
-        feature_file=os.path.relpath(self.feature.filename),
+        feature_file=os.path.relpath(step.feature.filename),
         scenario_index=scenario_index,
         scenario_name=scenario_name,
         outline_index=outline_index_str,
     )
     base_name = re.sub(r'\W', '_', base_name, flags=re.UNICODE)
-    base_name = os.path.join(DIRECTORY, base_name)
+    return os.path.join(DIRECTORY, base_name)
+
+
+@after.each_step
+def take_screenshot(self):
+    """Take a screenshot after a failed step."""
+
+    if not self.failed:
+        return
+
+    browser = getattr(world, 'browser', None)
+    if not browser:
+        return
+
+    base_name = artifact_name(self)
+
+    png = world.browser.get_screenshot_as_png()
+    page_source = world.browser.page_source
+
+    if CONTENT_ADDRESSED:
+        writer().add(base_name, store_snapshot, base_name, png, page_source)
+        return
+
+    png_name = '{}.png'.format(base_name)
+    writer().add(png_name, write_file, png_name, encode_screenshot, png)
+    html_name = '{}.html{}'.format(base_name, '.gz' if COMPRESS_HTML else '')
+    writer().add(html_name, write_file, html_name, encode_page_source,
+                 page_source)
+
+
+@after.all
+def flush_screenshots():
+    """Finish writing the screenshots before the results are reported."""
 
-    world.browser.save_screenshot('{}.png'.format(base_name))
+    if WRITER is not None:
+        WRITER.flush()
 
-    with open('{}.html'.format(base_name), 'w') as page_source_file:
-        page_source_file.write(world.browser.page_source)
+    if CONTENT_ADDRESSED:
+        prune_snapshots()
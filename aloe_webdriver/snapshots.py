@@ -0,0 +1,183 @@
+"""
+A store of failure snapshots, keeping every distinct file once.
+
+Each file is saved under the SHA-256 hash of its contents in the ``objects``
+subdirectory, and every snapshot is a manifest naming the files it consists
+of::
+
+    failed_features_account_feature_1_Log_in.snapshot.json
+    objects/3f/3f5a...c2.png
+    objects/9b/9b0e...17.html.gz
+
+When many scenarios fail on the same page, the screenshot and the source are
+only saved once.
+
+Use with :mod:`aloe_webdriver.screenshot_failed` by setting
+``CONTENT_ADDRESSED``:
+
+.. code-block:: python
+
+    from aloe_webdriver import screenshot_failed
+
+    screenshot_failed.CONTENT_ADDRESSED = True
+    screenshot_failed.RETENTION_SIZE = 500 * 1024 * 1024
+    screenshot_failed.RETENTION_AGE = 7 * 24 * 3600
+
+After all the tests have run, the snapshots older than ``RETENTION_AGE``
+seconds are deleted. The oldest snapshots are then deleted until the files
+take up at most ``RETENTION_SIZE`` bytes.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from glob import glob
+from time import time
+
+
+MANIFEST_SUFFIX = '.snapshot.json'
+OBJECTS = 'objects'
+
+
+class SnapshotStore(object):
+    """
+    A directory of content-addressed snapshot files and their manifests.
+
+    :param directory: the directory to store the snapshots in
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def object_path(self, digest, extension):
+        """The path of a stored file, relative to the store directory."""
+
+        return os.path.join(OBJECTS, digest[:2], digest + extension)
+
+    def add_object(self, data, extension, encode=None):
+        """
+        Store a file unless it is stored already.
+
+        :param bytes data: the contents to hash
+        :param str extension: the file name extension
+        :param encode: a function returning the contents to write from the
+            data, only called if the file is not stored yet; returning
+            ``None`` skips the file
+        :returns: the path of the file relative to the store directory (or
+            ``None`` if skipped), and whether it has been written
+        """
+
+        path = self.object_path(hashlib.sha256(data).hexdigest(), extension)
+        full_path = os.path.join(self.directory, path)
+        if os.path.exists(full_path):
+            return path, False
+
+        if encode is not None:
+            data = encode(data)
+            if data is None:
+                return None, False
+
+        write_atomically(full_path, data)
+        return path, True
+
+    def add_manifest(self, name, files, **details):
+        """
+        Record a snapshot.
+
+        :param name: the snapshot name
+        :param dict files: the paths of the stored files, by their kind
+        :param details: other information to record
+        :returns: the path to the manifest
+        """
+
+        manifest = dict(details, name=name, created=time(), files=files)
+        path = os.path.join(self.directory, name + MANIFEST_SUFFIX)
+        write_atomically(
+            path, json.dumps(manifest, indent=2, sort_keys=True).encode())
+        return path
+
+    def manifests(self):
+        """The paths and contents of the manifests, oldest first."""
+
+        manifests = []
+        for path in glob(os.path.join(self.directory, '*' + MANIFEST_SUFFIX)):
+            try:
+                with open(path) as manifest_file:
+                    manifests.append((path, json.load(manifest_file)))
+            except (OSError, ValueError):
+                continue
+
+        return sorted(manifests, key=lambda item: item[1].get('created', 0))
+
+    def objects(self):
+        """The paths of the stored files relative to the store directory."""
+
+        root = os.path.join(self.directory, OBJECTS)
+        return {
+            os.path.relpath(os.path.join(directory, filename), self.directory)
+            for directory, _, filenames in os.walk(root)
+            for filename in filenames
+        }
+
+    def size(self, path):
+        """The size of a stored file, or 0 if it is missing."""
+
+        try:
+            return os.path.getsize(os.path.join(self.directory, path))
+        except OSError:
+            return 0
+
+    def prune(self, max_size=None, max_age=None):
+        """
+        Delete the snapshots over the limits and the files they alone use.
+
+        :param int max_size: the total size of the files to keep, in bytes
+        :param float max_age: the age of the snapshots to keep, in seconds
+        :returns: the number of snapshots deleted
+        """
+
+        manifests = self.manifests()
+        deleted = []
+
+        if max_age is not None:
+            cutoff = time() - max_age
+            while manifests and manifests[0][1].get('created', 0) < cutoff:
+                deleted.append(manifests.pop(0))
+
+        def referenced():
+            """The files used by the remaining snapshots."""
+            return {path for _, manifest in manifests
+                    for path in manifest.get('files', {}).values()}
+
+        if max_size is not None:
+            sizes = {path: self.size(path) for path in self.objects()}
+            kept = referenced()
+            while manifests and \
+                    sum(sizes.get(path, 0) for path in kept) > max_size:
+                deleted.append(manifests.pop(0))
+                kept = referenced()
+
+        for path, _ in deleted:
+            os.unlink(path)
+
+        for path in self.objects() - referenced():
+            os.unlink(os.path.join(self.directory, path))
+
+        return len(deleted)
+
+
+def write_atomically(path, data):
+    """Write a file so that it is never seen half-written."""
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory or '.', exist_ok=True)
+
+    handle, temp_path = tempfile.mkstemp(dir=directory or '.', suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
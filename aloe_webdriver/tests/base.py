@@ -2,8 +2,10 @@
 Base functions for tests.
 """
 
+import html
 import os
 import socketserver
+import tempfile
 import threading
 import unittest
 from contextlib import contextmanager
@@ -56,7 +58,15 @@ def feature(fails=False):
             {scenario_string}
             """.format(name=func.__name__, scenario_string=scenario)
 
-            result = self.run_feature_string(feature_string)
+            # Write the feature outside the package, rather than leave it
+            # behind in the features directory if the run is interrupted
+            with tempfile.TemporaryDirectory() as directory:
+                feature_path = os.path.join(
+                    directory, func.__name__ + '.feature')
+                with open(feature_path, 'w', encoding='utf-8') as feature_file:
+                    feature_file.write(feature_string)
+
+                result = self.run_features(feature_path)
 
             if fails:
                 self.assertFalse(result.success)
@@ -90,6 +100,28 @@ class TestRequestHandler(SimpleHTTPRequestHandler):
 
         return SimpleHTTPRequestHandler.do_GET(self)
 
+    def do_POST(self):  # pylint:disable=invalid-name
+        """Answer with a page showing the form data and the cookies sent."""
+
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length).decode('utf-8')
+
+        page = (
+            '<html><head><title>Posted</title></head><body>'
+            '<p id="data">{}</p><p id="cookies">{}</p>'
+            '</body></html>'
+        ).format(
+            html.escape(data),
+            html.escape(self.headers.get('Cookie', '')),
+        )
+        response = page.encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
     def log_message(self, *args, **kwargs):  # pylint:disable=arguments-differ
         """Turn off logging."""
         pass
@@ -125,11 +157,12 @@ def test_server():
     else:
         address = server.server_address
 
-    yield server, address
-
-    server.shutdown()
-    server_thread.join()
-    server.server_close()
+    try:
+        yield server, address
+    finally:
+        server.shutdown()
+        server_thread.join()
+        server.server_close()
 
 
 def browser_type():
@@ -149,9 +182,46 @@ def skip_if_browser(browsers, message):
     return lambda func: func
 
 
+# The fake WebDriver server for the 'fake' browser type, started on demand
+FAKE_SERVER = None
+
+
+def fake_webdriver_address():
+    """
+    The address of the fake WebDriver server, starting it if needed.
+
+    The latency of every command, in milliseconds, is read from
+    FAKE_WEBDRIVER_LATENCY.
+    """
+
+    global FAKE_SERVER  # pylint:disable=global-statement
+
+    # Avoid requiring lxml unless the fake browser is used
+    # pylint:disable=import-outside-toplevel
+    from aloe_webdriver.tests.fake_webdriver import start_server
+
+    if FAKE_SERVER is None:
+        latency = float(os.environ.get('FAKE_WEBDRIVER_LATENCY', 0)) / 1000
+        FAKE_SERVER = start_server(latency=latency)
+
+    return FAKE_SERVER.url
+
+
 def create_browser():
     """Create a Selenium browser for tests."""
 
+    if browser_type() == 'fake':
+        return webdriver.Remote(
+            fake_webdriver_address(),
+            desired_capabilities={},
+        )
+
+    if browser_type() == 'html':
+        # Avoid requiring lxml unless the HTML driver is used
+        # pylint:disable=import-outside-toplevel
+        from aloe_webdriver.html_driver import HTMLDriver
+        return HTMLDriver()
+
     if 'SELENIUM_ADDRESS' in os.environ:
         address = 'http://{}/wd/hub'.format(os.environ['SELENIUM_ADDRESS'])
 
@@ -0,0 +1,139 @@
+"""
+Benchmark finding elements by XPath against the native lookups chosen by
+util.locator_plan, on a large generated page.
+
+Uses the browser selected by BROWSER_TYPE, as the tests do:
+
+    BROWSER_TYPE=chrome python -m aloe_webdriver.tests.benchmark_locators
+"""
+
+import argparse
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from statistics import median
+from time import time
+
+from aloe_webdriver.tests.base import create_browser
+from aloe_webdriver.util import (
+    field_xpath,
+    locator_plan,
+    QUERY_SCRIPT,
+    string_literal,
+)
+
+
+def large_page(fields):
+    """A page with the given number of labelled fields in several forms."""
+
+    forms = []
+    for form in range(0, fields, 100):
+        rows = ''.join(
+            '<p><label for="field{0}">Field {0}</label>'
+            '<input type="text" id="field{0}" name="name{0}" value="{0}">'
+            '<a href="/link{0}">Link {0}</a></p>'.format(number)
+            for number in range(form, min(form + 100, fields))
+        )
+        forms.append('<form action="/submit{}">{}</form>'.format(form, rows))
+
+    return '<html><head><title>Large page</title></head><body>{}</body>' \
+        '</html>'.format(''.join(forms))
+
+
+def intents(fields):
+    """The elements to find: description, XPath and locator arguments."""
+
+    last = fields - 1
+    form = last - last % 100
+    return [
+        ("field by id",
+         field_xpath('text', 'id') % string_literal('field{}'.format(last)),
+         ('input', [('id', 'field{}'.format(last)), ('type', 'text')])),
+        ("field by name",
+         field_xpath('text', 'name') % string_literal('name{}'.format(last)),
+         ('input', [('name', 'name{}'.format(last)), ('type', 'text')])),
+        ("element by id",
+         'id("field{}")'.format(last),
+         ('*', [('id', 'field{}'.format(last))])),
+        ("form by action",
+         '//form[@action="/submit{}"]'.format(form),
+         ('form', [('action', '/submit{}'.format(form))])),
+        ("link by URL",
+         '//a[@href="/link{}"]'.format(last),
+         ('a', [('href', '/link{}'.format(last))])),
+    ]
+
+
+def serve(page):
+    """Serve the page from a background thread, returning the server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        """Serve the page at any path."""
+
+        def do_GET(self):  # pylint:disable=invalid-name
+            """Send the page."""
+            body = page.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):  # pylint:disable=arguments-differ
+            """Turn off logging."""
+
+    server = HTTPServer(('', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def timed(browser, plan, repeat):
+    """The elements found by the plan, and the median time in seconds."""
+
+    times = []
+    for _ in range(repeat):
+        start = time()
+        found = browser.execute_script(QUERY_SCRIPT, plan)
+        times.append(time() - start)
+    return found, median(times)
+
+
+def main():
+    """Run the benchmark."""
+
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--fields', type=int, default=5000,
+                        help="number of fields on the page")
+    parser.add_argument('--repeat', type=int, default=20,
+                        help="number of times to find each element")
+    options = parser.parse_args()
+
+    server = serve(large_page(options.fields))
+    browser = create_browser()
+    try:
+        browser.get('http://{}:{}/'.format(
+            os.environ.get('SERVER_HOST', 'localhost'),
+            server.server_address[1]))
+
+        print("{:<16} {:>10} {:>10} {:>8}".format(
+            "lookup", "XPath ms", "native ms", "speedup"))
+        for description, xpath, (tag, attributes) in intents(options.fields):
+            by_xpath, xpath_time = timed(
+                browser, {'op': 'xpath', 'xpath': xpath}, options.repeat)
+            native, native_time = timed(
+                browser, locator_plan(tag, attributes), options.repeat)
+            assert by_xpath == native, \
+                "Different elements found for {}.".format(description)
+
+            print("{:<16} {:>10.2f} {:>10.2f} {:>7.1f}x".format(
+                description, xpath_time * 1000, native_time * 1000,
+                xpath_time / native_time if native_time else float('inf')))
+    finally:
+        browser.quit()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
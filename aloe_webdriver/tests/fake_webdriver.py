@@ -0,0 +1,174 @@
+"""
+A stand-in WebDriver server answering the commands the steps use from a
+static DOM, for measuring the steps' own overhead without a browser.
+
+The pages are served from a directory (the test pages by default) by the
+browser emulation of :mod:`aloe_webdriver.html_driver`.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from time import sleep
+from urllib.parse import urlparse
+
+from aloe_webdriver.html_driver import BLANK_PAGE, HTMLBrowser, route, Sessions
+
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), 'html_pages')
+
+NOT_FOUND_PAGE = '<html><head><title>Not Found</title></head>' \
+    '<body><h1>Not Found</h1></body></html>'
+
+
+class FakeBrowser(HTMLBrowser):
+    """
+    A browser session loading the pages from a directory.
+
+    :param pages_dir: directory to load the pages from, by URL path
+    :param pages: a dictionary of page sources by URL path, taking
+        precedence over `pages_dir`
+    """
+
+    name = 'fake'
+
+    def __init__(self, pages_dir=PAGES_DIR, pages=None):
+        super().__init__()
+        self.pages_dir = pages_dir
+        self.pages = pages or {}
+
+    def source(self, url):
+        """The source of the page at the given URL."""
+
+        if url == 'about:blank':
+            return BLANK_PAGE
+
+        path = urlparse(url).path
+        if path in self.pages:
+            return self.pages[path]
+
+        filename = os.path.join(self.pages_dir, path.lstrip('/'))
+        try:
+            with open(filename, encoding='utf-8') as page:
+                return page.read()
+        except (IOError, ValueError):
+            return NOT_FOUND_PAGE
+
+    def fetch(self, url, data=None):
+        """Load the page from the directory, ignoring any form data."""
+
+        return url, self.source(url)
+
+
+class FakeWebDriverHandler(BaseHTTPRequestHandler):
+    """Dispatch the WebDriver commands to the browser session."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def handle_command(self, method):
+        """Run the command and send its result."""
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        params = json.loads(body.decode('utf-8')) if body else {}
+
+        path = urlparse(self.path).path
+        if path.startswith('/wd/hub'):
+            path = path[len('/wd/hub'):]
+
+        handler = route(method, path)
+        if handler is not None:
+            self.server.delay(handler[0])
+
+        with self.server.lock:
+            status, response = self.server.sessions.execute(
+                method, path, params)
+
+        response = json.dumps(response).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def do_GET(self):  # pylint:disable=invalid-name
+        """Handle a GET command."""
+        self.handle_command('GET')
+
+    def do_POST(self):  # pylint:disable=invalid-name
+        """Handle a POST command."""
+        self.handle_command('POST')
+
+    def do_DELETE(self):  # pylint:disable=invalid-name
+        """Handle a DELETE command."""
+        self.handle_command('DELETE')
+
+    def log_message(self, *args, **kwargs):  # pylint:disable=arguments-differ
+        """Turn off logging."""
+        pass
+
+
+class FakeWebDriverServer(ThreadingMixIn, HTTPServer):
+    """
+    The WebDriver server.
+
+    :param latency: seconds to delay each command by, or a dictionary of
+        delays by command (the ``cmd_`` method name of :class:`FakeBrowser`)
+    :param browser_args: arguments for :class:`FakeBrowser`
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, latency=0, **browser_args):
+        super().__init__(address, FakeWebDriverHandler)
+        self.latency = latency
+        self.sessions = Sessions(FakeBrowser, **browser_args)
+        self.lock = threading.Lock()
+
+    def delay(self, command):
+        """Simulate the latency of a command."""
+
+        if isinstance(self.latency, dict):
+            latency = self.latency.get(command, 0)
+        else:
+            latency = self.latency
+        if latency:
+            sleep(latency)
+
+
+def start_server(latency=0, **browser_args):
+    """
+    Start the fake WebDriver server in a background thread, on a free port.
+
+    The server URL is in its ``url`` attribute.
+    """
+
+    server = FakeWebDriverServer(('127.0.0.1', 0), latency=latency,
+                                 **browser_args)
+    server.url = 'http://{}:{}'.format(*server.server_address)
+
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+
+    return server
+
+
+@contextmanager
+def fake_webdriver_server(latency=0, **browser_args):
+    """
+    A context manager running the fake WebDriver server.
+
+    Yields the server URL.
+    """
+
+    server = start_server(latency=latency, **browser_args)
+    try:
+        yield server.url
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -33,6 +33,24 @@ if os.environ.get('TAKE_SCREENSHOTS'):
     if SCREENSHOTS_DIR:
         aloe_webdriver.screenshot_failed.DIRECTORY = SCREENSHOTS_DIR
 
+    if os.environ.get('SCREENSHOTS_CONTENT_ADDRESSED'):
+        aloe_webdriver.screenshot_failed.CONTENT_ADDRESSED = True
+
+    if os.environ.get('SCREENSHOTS_COMPRESS_HTML'):
+        aloe_webdriver.screenshot_failed.COMPRESS_HTML = True
+
+if os.environ.get('COMMAND_LOG'):
+    # Only record the commands if asked to
+    import aloe_webdriver.command_log
+    reload(aloe_webdriver.command_log)
+
+if os.environ.get('METRICS_OUTPUT'):
+    # Only record the metrics if asked to
+    import aloe_webdriver.metrics
+    reload(aloe_webdriver.metrics)
+
+    aloe_webdriver.metrics.OUTPUT = os.environ['METRICS_OUTPUT']
+
 
 @around.all
 @contextmanager
@@ -0,0 +1,164 @@
+"""
+Benchmark the WebDriver commands issued by the steps.
+
+The steps are run against the fake WebDriver server, so no browser is needed:
+
+    python -m unittest -v aloe_webdriver.tests.test_benchmark
+
+Set FAKE_WEBDRIVER_LATENCY to the latency of each command, in milliseconds,
+to see the effect of a remote browser.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from aloe.testing import FeatureTest, in_directory
+
+
+FEATURE = """
+Feature: Benchmark the steps
+
+Scenario: Look for text
+    When I visit test page "basic_page"
+    Then I should see "Hello there!"
+    And I should see "Username:"
+    And I should not see "Some spiffy hidden text"
+    And I should see a link to "Google" with the url "http://google.com/"
+    And There should be an element matching $("#somediv")
+    And There should be exactly 1 elements matching $("#somediv")
+    And There should not be an element matching $("#missing")
+    And I should not see an element with id of "hidden_text"
+
+Scenario: Fill in a form
+    When I visit test page "basic_page"
+    And I fill in "bio" with "everything awesome"
+    And I fill in "Password: " with "neat"
+    And I check "I have a bike"
+    And I choose "Male"
+    And I select "Mercedes" from "car_choice"
+    Then input "bio" has value "everything awesome"
+    And The "I have a bike" checkbox should be checked
+    And The "Male" option should be chosen
+    And The "Mercedes" option from "car_choice" should be selected
+    And the form should have values:
+        | field         | value              |
+        | bio           | everything awesome |
+        | I have a bike | checked            |
+        | Male          | checked            |
+        | car_choice    | Mercedes           |
+    When I press "Submit!"
+    Then The browser's URL should contain "bio=everything"
+
+Scenario: Fill in a form at once
+    When I visit test page "basic_page"
+    And I fill in the following:
+        | field         | value              |
+        | bio           | everything awesome |
+        | Password:     | neat               |
+        | I have a bike | checked            |
+        | Male          | checked            |
+        | car_choice    | Mercedes           |
+    When I press "Submit!"
+    Then The browser's URL should contain "bio=everything"
+
+Scenario: Press buttons
+    When I visit test page "button_page"
+    And I press "Button element"
+    And I press "Input button"
+    And I press "Anchor button"
+"""
+
+# The most commands each step may issue
+BUDGETS = {
+    'Then I should see "Hello there!"': 1,
+    'And I should see "Username:"': 1,
+    # The first negative check sets the script timeout too
+    'And I should not see "Some spiffy hidden text"': 2,
+    'And There should be an element matching $("#somediv")': 2,
+    'And There should be exactly 1 elements matching $("#somediv")': 1,
+    'And There should not be an element matching $("#missing")': 1,
+    'And I should not see an element with id of "hidden_text"': 1,
+    'And I fill in "bio" with "everything awesome"': 4,
+    'And I fill in "Password: " with "neat"': 4,
+    'And I check "I have a bike"': 2,
+    'And I choose "Male"': 2,
+    'And I select "Mercedes" from "car_choice"': 2,
+    'Then input "bio" has value "everything awesome"': 1,
+    'And The "I have a bike" checkbox should be checked': 1,
+    'And The "Male" option should be chosen': 1,
+    'And the form should have values:': 1,
+    'And I fill in the following:': 1,
+    'When I press "Submit!"': 2,
+    'And I press "Button element"': 2,
+}
+
+
+@in_directory(os.path.dirname(__file__))
+class TestBenchmark(FeatureTest):
+    """Benchmark the WebDriver commands issued by the steps."""
+
+    def setUp(self):
+        """Use the fake browser and create a directory for the metrics."""
+
+        super().setUp()
+
+        self.browser_type = os.environ.get('BROWSER_TYPE')
+        os.environ['BROWSER_TYPE'] = 'fake'
+
+        self.dir_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Restore the browser type and remove the metrics."""
+
+        if self.browser_type is None:
+            del os.environ['BROWSER_TYPE']
+        else:
+            os.environ['BROWSER_TYPE'] = self.browser_type
+
+        if 'METRICS_OUTPUT' in os.environ:
+            del os.environ['METRICS_OUTPUT']
+
+        shutil.rmtree(self.dir_path)
+
+        super().tearDown()
+
+    def run_benchmark(self):
+        """Run the benchmark feature, returning the metrics of each step."""
+
+        output = os.path.join(self.dir_path, 'metrics.json')
+        os.environ['METRICS_OUTPUT'] = output
+
+        result = self.run_feature_string(FEATURE)
+        self.assertTrue(result.success)
+
+        with open(output) as metrics:
+            return [
+                step for step in json.load(metrics)['steps']
+                if step['step']
+            ]
+
+    def test_benchmark(self):
+        """Report the commands of each step and check them against budget."""
+
+        steps = self.run_benchmark()
+
+        report = ['', "{:>8} {:>8}  {}".format("commands", "ms", "step")]
+        for step in steps:
+            report.append("{:>8} {:>8.1f}  {}".format(
+                sum(stats['count'] for stats in step['commands'].values()),
+                step['duration'] * 1000,
+                step['step'],
+            ))
+        sys.stderr.write('\n'.join(report) + '\n')
+
+        counts = {
+            step['step']: sum(
+                stats['count'] for stats in step['commands'].values())
+            for step in steps
+        }
+        for sentence, budget in BUDGETS.items():
+            with self.subTest(step=sentence):
+                self.assertLessEqual(counts[sentence], budget)
@@ -0,0 +1,142 @@
+"""
+Test saving the last commands after failed steps.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from glob import glob
+
+from aloe.testing import FeatureTest, in_directory
+from selenium.webdriver.remote.command import Command
+
+from aloe_webdriver import command_log
+from aloe_webdriver.util import CAPTURE_CONSOLE_SCRIPT
+
+
+@in_directory(os.path.dirname(__file__))
+class TestCommandLog(FeatureTest):
+    """Test saving the last commands after failed steps."""
+
+    def setUp(self):
+        """Enable the hooks saving the commands."""
+
+        super().setUp()
+
+        self.dir_path = tempfile.mkdtemp()
+
+        # These environment variables control whether the hooks are registered
+        # in tests/features/steps.py
+        os.environ['TAKE_SCREENSHOTS'] = '1'
+        os.environ['SCREENSHOTS_DIR'] = self.dir_path
+        os.environ['COMMAND_LOG'] = '1'
+
+    def tearDown(self):
+        """Remove the saved files."""
+
+        for variable in ('TAKE_SCREENSHOTS', 'SCREENSHOTS_DIR', 'COMMAND_LOG'):
+            del os.environ[variable]
+
+        shutil.rmtree(self.dir_path)
+
+        super().tearDown()
+
+    def test_command_log(self):
+        """Test the commands of a failed scenario are saved."""
+
+        feature_string = """
+Feature: Test saving the commands
+
+Scenario: This scenario succeeds
+    When I visit test page "basic_page"
+    Then I should see "Hello there"
+
+Scenario: This scenario fails
+    When I visit test page "link_page"
+    Then I should see "A unicorn"
+"""
+
+        self.run_feature_string(feature_string)
+
+        logs = glob(os.path.join(self.dir_path, '*.commands.json'))
+        self.assertEqual(len(logs), 1)
+        self.assertIn('_2_This_scenario_fails', logs[0])
+        self.assertEqual(
+            len(glob(os.path.join(self.dir_path, '*.png'))), 1)
+
+        with open(logs[0]) as log_file:
+            log = json.load(log_file)
+
+        steps = [entry['step'] for entry in log['commands']
+                 if 'step' in entry]
+        self.assertEqual(steps[-2:], [
+            'When I visit "http://0.0.0.0:7755/link_page.html"',
+            'Then I should see "A unicorn"',
+        ])
+
+        visits = [entry for entry in log['commands']
+                  if entry.get('command') == 'get']
+        self.assertIn('link_page.html', visits[-1]['params'])
+        # The commands of the failing step come last
+        self.assertIn('command', log['commands'][-1])
+        self.assertIsInstance(log['console'], list)
+
+
+class RecordedBrowser(object):
+    """A browser answering every command with a long string."""
+
+    def __init__(self):
+        self.sent = []
+
+    def execute(self, driver_command, params=None):
+        """Record the command sent."""
+
+        self.sent.append((driver_command, params))
+        return {'value': 'x' * 10000}
+
+    def execute_script(self, script, *args):
+        """Run a script."""
+
+        return self.execute(Command.W3C_EXECUTE_SCRIPT,
+                            {'script': script, 'args': list(args)})
+
+
+class TestInstrument(unittest.TestCase):
+    """Test recording the commands sent to the browser."""
+
+    def setUp(self):
+        """Instrument a browser."""
+
+        command_log.COMMANDS.clear()
+        self.browser = RecordedBrowser()
+        command_log.instrument(self.browser)
+
+    def test_truncated(self):
+        """Test the commands are kept truncated and sent unchanged."""
+
+        self.browser.execute_script('return 1;', 'y' * 10000)
+
+        self.assertEqual(self.browser.sent, [
+            (Command.W3C_EXECUTE_SCRIPT,
+             {'script': 'return 1;', 'args': ['y' * 10000]}),
+        ])
+        _, command, params, response, error = command_log.COMMANDS[-1]
+        self.assertEqual(command, Command.W3C_EXECUTE_SCRIPT)
+        self.assertEqual(len(params), command_log.TRUNCATE + 3)
+        self.assertTrue(params.startswith('{"script": "return 1;"'))
+        self.assertEqual(response, '"' + 'x' * 499 + '...')
+        self.assertIsNone(error)
+
+    def test_capture_console(self):
+        """Test the console messages are recorded once per page visited."""
+
+        self.browser.execute(Command.GET, {'url': 'http://localhost/'})
+        self.browser.execute(Command.GET_TITLE)
+
+        self.assertEqual(
+            [command for command, _ in self.browser.sent],
+            [Command.GET, Command.W3C_EXECUTE_SCRIPT, Command.GET_TITLE])
+        self.assertEqual(self.browser.sent[1][1]['script'],
+                         CAPTURE_CONSOLE_SCRIPT)
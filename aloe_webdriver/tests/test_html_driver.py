@@ -0,0 +1,178 @@
+"""
+Test the in-process HTML driver.
+"""
+
+import unittest
+
+from aloe_webdriver import css  # pylint:disable=unused-import
+from aloe_webdriver.html_driver import HTMLBrowser, HTMLDriver
+from aloe_webdriver.util import (
+    ABSENCE_SCRIPT,
+    BROWSER_SCRIPTS,
+    fill_in_fields,
+    find_button,
+    find_field,
+    FORM_STATE_SCRIPT,
+    form_states,
+    locate,
+    QUERY_SCRIPT,
+    TEXT_SEARCH_SCRIPT,
+)
+
+from aloe_webdriver.tests.base import (
+    create_browser,
+    skip_if_browser,
+    test_server,
+)
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webelement import WebElement
+
+# pylint:disable=missing-docstring
+
+
+class TestHTMLDriver(unittest.TestCase):
+    """Test the in-process HTML driver."""
+
+    def setUp(self):
+        self.browser = HTMLDriver()
+
+    def tearDown(self):
+        self.browser.quit()
+
+    def test_get_form(self):
+        with test_server() as (_, address):
+            self.browser.get(
+                'http://{0[0]}:{0[1]}/basic_page.html'.format(address))
+            self.assertEqual(self.browser.title, "A Basic Page")
+
+            fill_in_fields(self.browser, [
+                (find_field(self.browser, 'textarea', 'bio'),
+                 "everything awesome"),
+            ])
+            [bio] = form_states(self.browser, [
+                find_field(self.browser, 'textarea', 'bio')])
+            self.assertEqual(bio[0]['value'], "everything awesome")
+
+            find_button(self.browser, "Submit!").click()
+
+        self.assertIn('bio=everything+awesome', self.browser.current_url)
+
+    def test_post_form(self):
+        with test_server() as (_, address):
+            self.browser.get(
+                'http://{0[0]}:{0[1]}/post_page.html'.format(address))
+            self.browser.add_cookie({'name': 'session', 'value': 'abc'})
+            self.assertEqual(
+                self.browser.get_cookie('session')['value'], 'abc')
+
+            find_field(self.browser, 'text', 'Name:').send_keys("Aloe")
+            find_button(self.browser, "Post").click()
+
+            self.assertEqual(self.browser.title, "Posted")
+            self.assertEqual(
+                self.browser.find_element_by_id('data').text, 'name=Aloe')
+            self.assertEqual(
+                self.browser.find_element_by_id('cookies').text,
+                'session=abc')
+
+    def test_unreachable(self):
+        with self.assertRaises(WebDriverException):
+            self.browser.get('http://127.0.0.1:1/')
+
+    def test_unknown_script(self):
+        with self.assertRaises(WebDriverException):
+            self.browser.execute_script("return document.title;")
+
+
+class TestScripts(unittest.TestCase):
+    """Test the HTML driver can run all the scripts the steps use."""
+
+    def test_all_scripts_handled(self):
+        # The jQuery steps register their scripts on import
+        self.assertIn('load_and_find_by_jquery', BROWSER_SCRIPTS)
+
+        for name in BROWSER_SCRIPTS:
+            with self.subTest(script=name):
+                self.assertTrue(
+                    callable(getattr(HTMLBrowser, 'script_' + name, None)),
+                    "HTMLBrowser cannot run the {} script.".format(name))
+
+
+@skip_if_browser(('fake', 'html'), "A browser is needed to compare with.")
+class TestScriptResults(unittest.TestCase):
+    """Test the HTML driver's scripts agree with a browser running them."""
+
+    PAGES = ('basic_page', 'option_page', 'tooltips')
+
+    TEXTS = (
+        "Hello there!",
+        "Username:",
+        "Some spiffy hidden text",
+        "Submit as tentative",
+        "Time passed.",
+        "Light Blue",
+        "Bogeyman",
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.browser = create_browser()
+        cls.html_browser = HTMLDriver()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.browser.quit()
+        cls.html_browser.quit()
+        super().tearDownClass()
+
+    def describe(self, value):
+        """The value with the elements replaced by their tags and names."""
+
+        if isinstance(value, WebElement):
+            return (value.tag_name, value.get_attribute('id') or None,
+                    value.get_attribute('name') or None)
+        if isinstance(value, dict):
+            return {key: self.describe(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.describe(item) for item in value]
+        return value
+
+    def script_results(self, browser):
+        """The results of the scripts on the page open in the browser."""
+
+        results = []
+        for text in self.TEXTS:
+            results.append(browser.execute_script(TEXT_SEARCH_SCRIPT, text))
+            results.append(browser.execute_async_script(
+                ABSENCE_SCRIPT, {'text': text}, 0, 0))
+
+        selectors = [
+            find_button(browser, "Submit!"),
+            find_field(browser, 'text', 'Username:'),
+            find_field(browser, 'select', 'Favorite Colors:'),
+            find_field(browser, 'select', 'Shade:'),
+            find_field(browser, 'checkbox', 'I have a bike'),
+            locate(browser, attributes=[('title', 'A tooltip')]),
+            locate(browser, attributes=[('id', 'hidden_text')],
+                   filter_displayed=True),
+        ]
+        for selector in selectors:
+            results.append(browser.execute_script(
+                QUERY_SCRIPT, selector.plan))
+        results.append(browser.execute_script(
+            FORM_STATE_SCRIPT, [selector.plan for selector in selectors]))
+
+        return self.describe(results)
+
+    def test_script_results(self):
+        with test_server() as (_, address):
+            for page in self.PAGES:
+                with self.subTest(page=page):
+                    url = 'http://{0[0]}:{0[1]}/{1}.html'.format(
+                        address, page)
+                    self.browser.get(url)
+                    self.html_browser.get(url)
+                    self.assertEqual(self.script_results(self.html_browser),
+                                     self.script_results(self.browser))
@@ -0,0 +1,100 @@
+"""
+Test recording the WebDriver commands of each step.
+"""
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+
+from aloe.testing import FeatureTest, in_directory
+
+
+FEATURE = """
+Feature: Test recording metrics
+
+Scenario: Look at the page
+    When I visit test page "basic_page"
+    Then I should see "Hello there"
+    And I should not see "A unicorn"
+"""
+
+# Selenium names the command differently in the W3C dialect
+SCRIPT_COMMANDS = ('executeScript', 'w3cExecuteScript')
+
+
+@in_directory(os.path.dirname(__file__))
+class TestMetrics(FeatureTest):
+    """Test recording the WebDriver commands of each step."""
+
+    def setUp(self):
+        """Create a directory for the metrics."""
+
+        super().setUp()
+
+        self.dir_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the metrics."""
+
+        if 'METRICS_OUTPUT' in os.environ:
+            del os.environ['METRICS_OUTPUT']
+
+        shutil.rmtree(self.dir_path)
+
+        super().tearDown()
+
+    def run_with_metrics(self, filename):
+        """Run the feature, recording the metrics to the given file."""
+
+        output = os.path.join(self.dir_path, filename)
+        os.environ['METRICS_OUTPUT'] = output
+
+        result = self.run_feature_string(FEATURE)
+        self.assertTrue(result.success)
+
+        return output
+
+    def test_json(self):
+        """Test the metrics are saved as JSON."""
+
+        with open(self.run_with_metrics('metrics.json')) as output:
+            metrics = json.load(output)
+
+        steps = {
+            step['step']: step
+            for step in metrics['steps']
+        }
+
+        see = steps['Then I should see "Hello there"']
+        self.assertEqual(see['scenario'], "Look at the page")
+        self.assertFalse(see['failed'])
+        self.assertEqual(
+            sum(stats['count'] for command, stats in see['commands'].items()
+                if command in SCRIPT_COMMANDS),
+            1,
+        )
+
+        # The test page step visits the page in a nested step
+        visit = next(
+            step for sentence, step in steps.items()
+            if sentence.startswith('When I visit "')
+        )
+        self.assertIn('get', visit['commands'])
+        self.assertEqual(
+            sum(visit['commands']['get']['histogram']),
+            visit['commands']['get']['count'],
+        )
+
+    def test_csv(self):
+        """Test the metrics are saved as CSV."""
+
+        with open(self.run_with_metrics('metrics.csv')) as output:
+            rows = list(csv.DictReader(output))
+
+        self.assertIn(
+            ('Then I should see "Hello there"', '1'),
+            [(row['step'], row['count']) for row in rows
+             if row['command'] in SCRIPT_COMMANDS],
+        )
@@ -0,0 +1,142 @@
+"""
+Test running the scenarios in parallel.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+
+from aloe.testing import in_directory
+
+from aloe_webdriver.parallel import run_parallel
+
+
+STEPS = """
+import aloe_webdriver
+import aloe_webdriver.screenshot_failed
+"""
+
+FEATURE = """
+Feature: Parallel {number}
+
+Scenario: Look at the page
+    When I visit "http://localhost/basic_page.html"
+    Then I should see "Hello there"
+
+Scenario: Look at the links
+    When I visit "http://localhost/link_page.html"
+    Then I should see "Page o link"
+
+Scenario: Look at the buttons
+    When I visit "http://localhost/button_page.html"
+    Then I should see "Look at all these buttons!"
+"""
+
+FAILING_FEATURE = """
+Feature: Failing in parallel
+
+@timeout=1
+Scenario: Look for something not there
+    When I visit "http://localhost/basic_page.html"
+    Then I should see "Bogeyman"
+"""
+
+
+class TestParallel(unittest.TestCase):
+    """Test running the scenarios in parallel."""
+
+    def setUp(self):
+        """Create the features to run and use the fake browser."""
+
+        self.dir_path = tempfile.mkdtemp()
+
+        features_dir = os.path.join(self.dir_path, 'features')
+        os.mkdir(features_dir)
+        open(os.path.join(features_dir, '__init__.py'), 'w').close()
+        with open(os.path.join(features_dir, 'steps.py'), 'w') as steps:
+            steps.write(STEPS)
+        for number in range(1, 4):
+            feature_path = os.path.join(
+                features_dir, 'parallel_{}.feature'.format(number))
+            with open(feature_path, 'w') as feature:
+                feature.write(FEATURE.format(number=number))
+
+        self.browser_type = os.environ.get('BROWSER_TYPE')
+        os.environ['BROWSER_TYPE'] = 'fake'
+
+    def tearDown(self):
+        """Remove the features and restore the browser type."""
+
+        if self.browser_type is None:
+            del os.environ['BROWSER_TYPE']
+        else:
+            os.environ['BROWSER_TYPE'] = self.browser_type
+
+        shutil.rmtree(self.dir_path)
+
+    def run_parallel(self):
+        """Run the features with two workers."""
+
+        @in_directory(self.dir_path)
+        def run():
+            """Run the features in the temporary directory."""
+            return run_parallel(
+                workers=2,
+                browser_factory='aloe_webdriver.tests.base:create_browser',
+                log_directory=self.dir_path,
+            )
+
+        return run()
+
+    def test_parallel(self):
+        """Test every scenario is run once, by either worker."""
+
+        result = self.run_parallel()
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.tests_run, 9)
+        self.assertEqual(
+            [worker['worker'] for worker in result.workers],
+            ['worker-1', 'worker-2'],
+        )
+
+        for worker in result.workers:
+            self.assertTrue(os.path.exists(os.path.join(
+                self.dir_path, 'aloe-{}.log'.format(worker['worker']))))
+
+        report = StringIO()
+        result.report(report)
+        self.assertIn("Ran 9 scenarios", report.getvalue())
+        self.assertIn("OK", report.getvalue())
+
+    def test_failure(self):
+        """Test the failures are reported, with screenshots per worker."""
+
+        with open(os.path.join(self.dir_path, 'features',
+                               'failing.feature'), 'w') as feature:
+            feature.write(FAILING_FEATURE)
+
+        result = self.run_parallel()
+
+        self.assertFalse(result.success)
+        self.assertEqual(result.tests_run, 10)
+        self.assertEqual(len(result.failures), 1)
+        self.assertIn("Look for something not there", result.failures[0][0])
+
+        report = StringIO()
+        result.report(report)
+        self.assertIn("FAILED (failures=1, errors=0)", report.getvalue())
+
+        screenshots = [
+            os.path.join(worker_dir, filename)
+            for worker_dir in os.listdir(self.dir_path)
+            if re.match(r'^worker-\d$', worker_dir)
+            for filename in os.listdir(
+                os.path.join(self.dir_path, worker_dir))
+        ]
+        self.assertEqual(len(screenshots), 2)
+        for screenshot in screenshots:
+            self.assertIn('failed_features_failing_feature_1', screenshot)
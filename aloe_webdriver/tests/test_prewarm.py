@@ -0,0 +1,89 @@
+"""
+Test starting the browser in the background.
+"""
+
+import os
+import socket
+import unittest
+from time import time
+
+from aloe import world
+from selenium.common.exceptions import TimeoutException
+
+from aloe_webdriver import prewarm
+from aloe_webdriver.tests.base import create_browser
+from aloe_webdriver.tests.fake_webdriver import fake_webdriver_server
+
+# Pylint cannot infer the attributes on world
+# pylint:disable=no-member
+
+
+class TestPrewarm(unittest.TestCase):
+    """Test starting the browser in the background."""
+
+    def setUp(self):
+        """Create the browsers with the fake WebDriver server."""
+
+        self.browser_type = os.environ.get('BROWSER_TYPE')
+        os.environ['BROWSER_TYPE'] = 'fake'
+
+    def tearDown(self):
+        """Quit the browsers and restore the browser type."""
+
+        prewarm.quit_prewarmed()
+
+        if self.browser_type is None:
+            del os.environ['BROWSER_TYPE']
+        else:
+            os.environ['BROWSER_TYPE'] = self.browser_type
+
+    def test_server_ready(self):
+        """Test waiting for the WebDriver server."""
+
+        with fake_webdriver_server() as url:
+            self.assertTrue(prewarm.server_ready(url))
+            prewarm.wait_for_server(url)
+
+        # Find a port nothing listens on
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            url = 'http://127.0.0.1:{}'.format(sock.getsockname()[1])
+
+        self.assertFalse(prewarm.server_ready(url))
+
+        start = time()
+        with self.assertRaises(TimeoutException):
+            prewarm.wait_for_server(url, timeout=0.5)
+        self.assertLess(time() - start, 2)
+
+    def test_hand_over(self):
+        """Test the browser is put into world.browser."""
+
+        prewarm.start(create_browser)
+        prewarm.hand_over_browser(None, None, None)
+
+        browser = world.browser
+        browser.get('http://localhost/basic_page.html')
+        self.assertEqual(browser.title, "A Basic Page")
+
+        # Only the first scenario gets a new browser
+        prewarm.hand_over_browser(None, None, None)
+        self.assertIs(world.browser, browser)
+
+        prewarm.quit_prewarmed()
+        self.assertFalse(hasattr(world, 'browser'))
+
+    def test_existing_browser(self):
+        """Test an existing browser is not replaced."""
+
+        existing = world.browser = object()
+        try:
+            prewarm.start(create_browser)
+            prewarm.hand_over_browser(None, None, None)
+            self.assertIs(world.browser, existing)
+
+            prewarm.quit_prewarmed()
+            self.assertIs(world.browser, existing)
+            self.assertIsNone(prewarm.PREWARMED)
+        finally:
+            del world.browser
@@ -0,0 +1,86 @@
+"""
+Test reusing the browser session across scenarios.
+"""
+
+import os
+import unittest
+
+from aloe import world
+
+from aloe_webdriver import reuse_browser
+from aloe_webdriver.tests.base import create_browser
+from aloe_webdriver.tests.fake_webdriver import fake_webdriver_server
+
+from selenium import webdriver
+
+# Pylint cannot infer the attributes on world
+# pylint:disable=no-member
+
+
+class TestReuseBrowser(unittest.TestCase):
+    """Test reusing the browser session across scenarios."""
+
+    def setUp(self):
+        """Create the browsers with the fake WebDriver server."""
+
+        self.browser_type = os.environ.get('BROWSER_TYPE')
+        os.environ['BROWSER_TYPE'] = 'fake'
+
+        self.factory = reuse_browser.FACTORY
+        reuse_browser.FACTORY = create_browser
+
+    def tearDown(self):
+        """Quit the browser and restore the settings."""
+
+        reuse_browser.quit_session()
+        reuse_browser.FACTORY = self.factory
+
+        if self.browser_type is None:
+            del os.environ['BROWSER_TYPE']
+        else:
+            os.environ['BROWSER_TYPE'] = self.browser_type
+
+    def test_reset(self):
+        """Test the browser is reused with its state reset."""
+
+        browser = reuse_browser.prepare_browser()
+        self.assertIs(world.browser, browser)
+
+        browser.get('http://localhost/frame_page.html')
+        browser.add_cookie({'name': 'session', 'value': 'secret'})
+        browser.switch_to.frame(0)
+
+        self.assertIs(reuse_browser.prepare_browser(), browser)
+        self.assertEqual(browser.current_url, 'about:blank')
+        self.assertEqual(browser.get_cookies(), [])
+
+    def test_crashed(self):
+        """Test a crashed browser is replaced."""
+
+        browser = reuse_browser.prepare_browser()
+        browser.quit()
+
+        replacement = reuse_browser.prepare_browser()
+        self.assertIsNot(replacement, browser)
+        self.assertIs(world.browser, replacement)
+        self.assertEqual(replacement.current_url, 'about:blank')
+
+    def test_hung(self):
+        """Test a browser not responding is replaced."""
+
+        with fake_webdriver_server(latency={'get': 2}) as url:
+            world.browser = webdriver.Remote(url, desired_capabilities={})
+            world.browser.get('http://localhost/basic_page.html')
+
+            timeout = reuse_browser.RESET_TIMEOUT
+            try:
+                reuse_browser.RESET_TIMEOUT = 0.5
+                replacement = reuse_browser.prepare_browser()
+            finally:
+                reuse_browser.RESET_TIMEOUT = timeout
+
+            self.assertIs(world.browser, replacement)
+            self.assertNotEqual(
+                replacement.command_executor._url,  # pylint:disable=protected-access
+                url,
+            )
@@ -3,14 +3,27 @@
 Test saving screenshots after failed steps.
 """
 
+import gzip
+import json
 import re
 import os
 import shutil
 import tempfile
+import unittest
+import zlib
 from glob import iglob
+from unittest.mock import patch
 
 from aloe.testing import FeatureTest, in_directory
 
+from aloe_webdriver.screenshot_failed import (
+    encode_screenshot,
+    png_chunk,
+    png_chunks,
+    PNG_SIGNATURE,
+    recompress_png,
+)
+
 
 @in_directory(os.path.dirname(__file__))
 class TestScreenshots(FeatureTest):
@@ -21,7 +34,7 @@ class TestScreenshots(FeatureTest):
     def cleanup_screenshots(self):
         """Clean up any screenshots taken."""
 
-        for ext in ('png', 'html'):
+        for ext in ('png', 'html', 'html.gz'):
             for filename in iglob('failed_*.{}'.format(ext)):
                 os.unlink(filename)
 
@@ -45,8 +58,10 @@ class TestScreenshots(FeatureTest):
 
         del os.environ['TAKE_SCREENSHOTS']
 
-        if 'SCREENSHOTS_DIR' in os.environ:
-            del os.environ['SCREENSHOTS_DIR']
+        for variable in ('SCREENSHOTS_DIR', 'SCREENSHOTS_CONTENT_ADDRESSED',
+                         'SCREENSHOTS_COMPRESS_HTML'):
+            if variable in os.environ:
+                del os.environ[variable]
 
         self.cleanup_screenshots()
 
@@ -98,6 +113,15 @@ class TestScreenshots(FeatureTest):
         self.show_files()
         raise AssertionError(message)
 
+    def assert_page_source(self, filename, message):
+        """Assert the page source of the basic page was saved."""
+
+        self.assert_file_present(filename, message)
+        opener = gzip.open if filename.endswith('.gz') else open
+        with opener(filename, 'rt', encoding='utf-8') as page_source:
+            self.assertIn("<title>A Basic Page</title>", page_source.read(),
+                          message)
+
     def test_failed_screenshots(self):
         """Test that failed tests screenshots and page source are recorded."""
 
@@ -129,10 +153,10 @@ Scenario: This scenario fails
             'failed_{}_2_This_scenario_fails.png'.format(feature),
             "Failed scenario should be screenshotted."
         )
-        with open('failed_{}_2_This_scenario_fails.html'.format(feature)) \
-                as page_source:
-            self.assertIn("<title>A Basic Page</title>", page_source.read(),
-                          "Failed scenario page source should be saved.")
+        self.assert_page_source(
+            'failed_{}_2_This_scenario_fails.html'.format(feature),
+            "Failed scenario page source should be saved."
+        )
 
     def test_failed_background(self):
         """Test that failure of a background step is recorded."""
@@ -156,9 +180,10 @@ Scenario: This scenario fails
             'failed_{}_0_背景.png'.format(feature),
             "Failed background should be screenshotted."
         )
-        with open('failed_{}_0_背景.html'.format(feature)) as page_source:
-            self.assertIn("<title>A Basic Page</title>", page_source.read(),
-                          "Failed background page source should be saved.")
+        self.assert_page_source(
+            'failed_{}_0_背景.html'.format(feature),
+            "Failed background page source should be saved."
+        )
 
     def test_failed_examples(self):
         """Test that failure in an example is recorded."""
@@ -187,10 +212,10 @@ Scenario Outline: Succeeds sometimes
             'failed_{}_1_Succeeds_sometimes_2.png'.format(feature),
             "Failed example should be screenshotted."
         )
-        with open('failed_{}_1_Succeeds_sometimes_2.html'.format(feature)) \
-                as page_source:
-            self.assertIn("<title>A Basic Page</title>", page_source.read(),
-                          "Failed example page source should be saved.")
+        self.assert_page_source(
+            'failed_{}_1_Succeeds_sometimes_2.html'.format(feature),
+            "Failed example page source should be saved."
+        )
 
     def test_failed_screenshots_to_dir(self):
         """
@@ -218,6 +243,107 @@ Scenario: This scenario fails
             png_file,
             "Failed scenario should be screenshotted."
         )
-        with open(html_file) as page_source:
-            self.assertIn("<title>A Basic Page</title>", page_source.read(),
-                          "Failed scenario page source should be saved.")
+        self.assert_page_source(
+            html_file,
+            "Failed scenario page source should be saved."
+        )
+
+    def test_compressed_page_source(self):
+        """Test the page source is gzipped if asked to."""
+
+        feature_string = """
+Feature: Test compressing the page source
+
+Scenario: This scenario fails
+    When I visit test page "basic_page"
+    Then I should see "A unicorn"
+"""
+        os.environ['SCREENSHOTS_COMPRESS_HTML'] = '1'
+        result = self.run_feature_string(feature_string)
+        feature = self.feature_name(result)
+
+        self.assert_file_absent(
+            'failed_{}_1_This_scenario_fails.html'.format(feature),
+            "Page source should not be saved uncompressed."
+        )
+        self.assert_page_source(
+            'failed_{}_1_This_scenario_fails.html.gz'.format(feature),
+            "Failed scenario page source should be saved gzipped."
+        )
+
+    def test_content_addressed(self):
+        """Test identical screenshots are stored once."""
+
+        feature_string = """
+Feature: Test storing identical screenshots
+
+Scenario: This scenario fails
+    When I visit test page "basic_page"
+    Then I should see "A unicorn"
+
+Scenario: This scenario fails too
+    When I visit test page "basic_page"
+    Then I should see "A dragon"
+"""
+        self.dir_path = tempfile.mkdtemp()
+        os.environ['SCREENSHOTS_DIR'] = self.dir_path
+        os.environ['SCREENSHOTS_CONTENT_ADDRESSED'] = '1'
+        result = self.run_feature_string(feature_string)
+        feature = self.feature_name(result)
+
+        manifests = []
+        for index, name in ((1, 'This_scenario_fails'),
+                            (2, 'This_scenario_fails_too')):
+            manifest_file = os.path.join(
+                self.dir_path, 'failed_{}_{}_{}.snapshot.json'.format(
+                    feature, index, name))
+            self.assert_file_present(
+                manifest_file, "Failed scenario should have a manifest.")
+            with open(manifest_file) as manifest:
+                manifests.append(json.load(manifest)['files'])
+
+        self.assertEqual(manifests[0], manifests[1])
+        self.assertEqual(
+            len(list(iglob(os.path.join(self.dir_path, 'objects', '*', '*')))),
+            2)
+        self.assert_page_source(
+            os.path.join(self.dir_path, manifests[0]['page_source']),
+            "Failed scenario page source should be saved."
+        )
+
+
+class TestRecompressPNG(unittest.TestCase):
+    """Test re-encoding the screenshots."""
+
+    def test_recompress_png(self):
+        """Test the pixels stay the same, compressed better."""
+
+        header = png_chunk(b'IHDR', bytes.fromhex('00000040000000400800000000'))
+        pixels = (b'\x00' + bytes(range(64))) * 64
+        image = PNG_SIGNATURE + header + \
+            png_chunk(b'IDAT', zlib.compress(pixels, 0)[:100]) + \
+            png_chunk(b'IDAT', zlib.compress(pixels, 0)[100:]) + \
+            png_chunk(b'IEND', b'')
+
+        recompressed = recompress_png(image, 9)
+
+        self.assertLess(len(recompressed), len(image))
+        chunks = list(png_chunks(recompressed))
+        self.assertEqual([chunk_type for chunk_type, _ in chunks],
+                         [b'IHDR', b'IDAT', b'IEND'])
+        self.assertEqual(chunks[0], (b'IHDR', header[8:-4]))
+        self.assertEqual(zlib.decompress(chunks[1][1]), pixels)
+
+    def test_not_png(self):
+        """Test other data is rejected."""
+
+        with self.assertRaises(ValueError):
+            recompress_png(b'GIF89a', 9)
+
+    def test_encode_broken_png(self):
+        """Test a screenshot which cannot be re-encoded is kept as it is."""
+
+        image = PNG_SIGNATURE + png_chunk(b'IEND', b'')
+
+        with patch('aloe_webdriver.screenshot_failed.PNG_COMPRESSION', 9):
+            self.assertEqual(encode_screenshot(image), image)
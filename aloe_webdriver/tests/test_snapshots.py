@@ -0,0 +1,107 @@
+"""
+Test the content-addressed snapshot store.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from time import time
+
+from aloe_webdriver.snapshots import SnapshotStore
+
+
+class TestSnapshotStore(unittest.TestCase):
+    """Test the content-addressed snapshot store."""
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.store = SnapshotStore(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super().tearDown()
+
+    def snapshot(self, name, *contents, age=0):
+        """Store a snapshot of the given files, created age seconds ago."""
+
+        files = {
+            'file{}'.format(index): self.store.add_object(data, '.txt')[0]
+            for index, data in enumerate(contents)
+        }
+        path = self.store.add_manifest(name, files)
+
+        with open(path) as manifest_file:
+            manifest = json.load(manifest_file)
+        manifest['created'] = time() - age
+        with open(path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+
+    def names(self):
+        """The names of the stored snapshots."""
+        return [manifest['name'] for _, manifest in self.store.manifests()]
+
+    def test_deduplicate(self):
+        """Test identical files are stored once."""
+
+        encoded = []
+
+        def encode(data):
+            """Record the files written."""
+            encoded.append(data)
+            return data.upper()
+
+        first = self.store.add_object(b'page', '.html', encode=encode)
+        second = self.store.add_object(b'page', '.html', encode=encode)
+        other = self.store.add_object(b'other', '.html', encode=encode)
+
+        self.assertTrue(first[1])
+        self.assertEqual(second, (first[0], False))
+        self.assertNotEqual(other[0], first[0])
+        self.assertEqual(encoded, [b'page', b'other'])
+        self.assertEqual(len(self.store.objects()), 2)
+
+        with open(os.path.join(self.directory, first[0]), 'rb') as stored:
+            self.assertEqual(stored.read(), b'PAGE')
+
+    def test_skip(self):
+        """Test the encoder can skip a file."""
+
+        self.assertEqual(
+            self.store.add_object(b'page', '.html', encode=lambda data: None),
+            (None, False))
+        self.assertEqual(self.store.objects(), set())
+
+    def test_prune_age(self):
+        """Test pruning the snapshots by age."""
+
+        self.snapshot('old', b'shared', b'old', age=3600)
+        self.snapshot('new', b'shared', b'new')
+
+        self.assertEqual(self.store.prune(max_age=60), 1)
+        self.assertEqual(self.names(), ['new'])
+        self.assertEqual(len(self.store.objects()), 2)
+
+    def test_prune_size(self):
+        """Test pruning the oldest snapshots to fit in the size."""
+
+        self.snapshot('oldest', b'a' * 100, age=30)
+        self.snapshot('older', b'b' * 100, b'c' * 10, age=20)
+        self.snapshot('newer', b'b' * 100, age=10)
+        self.snapshot('newest', b'd' * 50)
+
+        self.assertEqual(self.store.prune(max_size=150), 2)
+        self.assertEqual(self.names(), ['newer', 'newest'])
+        self.assertEqual(len(self.store.objects()), 2)
+
+    def test_prune_unreferenced(self):
+        """Test files no snapshot uses are removed."""
+
+        self.snapshot('kept', b'kept')
+        self.store.add_object(b'orphan', '.png')
+
+        self.assertEqual(self.store.prune(), 0)
+        self.assertEqual(self.names(), ['kept'])
+        self.assertEqual(len(self.store.objects()), 1)
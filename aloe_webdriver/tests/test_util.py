@@ -1,21 +1,45 @@
 # -*- coding: utf-8 -*-
 """Test step functions directly."""
 
+import operator
 import unittest
+from functools import reduce
 from time import sleep, time
 
 from aloe import world
+from aloe.parser import Feature
+from aloe_webdriver import util
 from aloe_webdriver.util import (
+    confirm_absent,
+    DOMChanges,
+    ElementSelector,
+    ExponentialBackoff,
+    fill_in_fields,
+    FixedInterval,
+    find_any_field,
     find_button,
     find_field,
     find_field_by_id,
     find_field_by_label,
     find_field_by_name,
+    find_option,
+    first_interactable,
+    form_states,
+    locate,
+    locator_plan,
     option_in_select,
+    probe_interactable,
+    SelectorCache,
+    tagged_timeout,
     wait_for,
+    wait_until_idle,
 )
 
-from aloe_webdriver.tests.base import create_browser, test_server
+from aloe_webdriver.tests.base import (
+    create_browser,
+    skip_if_browser,
+    test_server,
+)
 
 # pylint:disable=missing-docstring
 
@@ -39,6 +63,106 @@ class TestUtil(unittest.TestCase):
         world.browser.quit()
         delattr(world, 'browser')
 
+    def test_element_selector(self):
+        text_inputs = ElementSelector(world.browser, '//input[@type="text"]')
+        self.assertEqual(
+            [elem.get_attribute('id') for elem in text_inputs],
+            ['username', 'firstname', 'hidden_username'],
+        )
+
+        visible = ElementSelector(world.browser, '//input[@type="text"]',
+                                  filter_displayed=True)
+        self.assertEqual(
+            [elem.get_attribute('id') for elem in visible],
+            ['username', 'firstname'],
+        )
+
+    def test_element_selector_context(self):
+        form = world.browser.find_element_by_id('the-form')
+        selects = ElementSelector(form, './/select')
+        self.assertEqual(len(selects), 2)
+        assert not ElementSelector(form, './/a')
+
+    def test_element_selector_algebra(self):
+        def ids(selector):
+            return [elem.get_attribute('id') for elem in selector]
+
+        inputs = ElementSelector(world.browser, '//input[@type="text"]')
+        named = ElementSelector(world.browser, '//*[@name="user"]')
+        hidden = ElementSelector(world.browser, '//*[@id="hidden_username"]')
+
+        self.assertEqual(ids(inputs & named), ['username'])
+        self.assertEqual(ids(hidden.union(named)),
+                         ['username', 'hidden_username'])
+        self.assertEqual(ids(inputs.limit(1)), ['username'])
+        self.assertEqual(ids(inputs.filter(displayed=True)),
+                         ['username', 'firstname'])
+        self.assertEqual(ids(hidden.filter(displayed=True).otherwise(named)),
+                         ['username'])
+
+        form = ElementSelector(world.browser, '//form')
+        self.assertEqual(ids(form.find('.//input[@type="date"]')), ['dob'])
+        assert not form.find('.//a')
+
+    def test_locate(self):
+        def ids(selector):
+            return [elem.get_attribute('id') for elem in selector]
+
+        self.assertEqual(
+            locator_plan('input', [('name', 'user'), ('id', 'username')]),
+            {'op': 'id', 'id': 'username',
+             'css': 'input[name="user"][id="username"]'})
+        self.assertEqual(locator_plan('form', [('action', 'a"b')]),
+                         {'op': 'css', 'css': 'form[action="a\\"b"]'})
+
+        self.assertEqual(ids(locate(world.browser, attributes=[
+            ('id', 'username')])), ['username'])
+        self.assertEqual(
+            ids(locate(world.browser, 'input', [('type', 'text')],
+                       filter_displayed=True)),
+            ['username', 'firstname'])
+        assert not locate(world.browser, 'select', [('id', 'username')])
+        assert not locate(world.browser, attributes=[('id', 'no_such_id')])
+
+        # Within other elements
+        form = locate(world.browser, 'form')
+        self.assertEqual(ids(locate(form, 'input', [('type', 'date')])),
+                         ['dob'])
+
+        # Combined with XPath in document order, without duplicates
+        hidden = locate(world.browser, attributes=[('id', 'hidden_username')])
+        named = ElementSelector(world.browser, '//*[@name="user"]')
+        username = locate(world.browser, attributes=[('id', 'username')])
+        self.assertEqual(ids(hidden + named + username),
+                         ['username', 'hidden_username'])
+
+    def test_selector_cache(self):
+        def find_changed():
+            return list(ElementSelector(world.browser, '//*[.="Changed"]'))
+
+        try:
+            util.CACHE = SelectorCache(size=2)
+
+            assert not find_changed()
+            self.assertEqual(len(util.CACHE.results), 1)
+
+            world.browser.execute_script("""
+                document.getElementById('somediv').innerHTML = 'Changed';
+            """)
+            self.assertEqual(len(find_changed()), 1)
+            self.assertEqual(find_changed(), find_changed())
+
+            # Only the most recent queries are kept
+            assert find_field(world.browser, 'text', 'username')
+            assert find_field(world.browser, 'text', 'firstname')
+            self.assertEqual(len(util.CACHE.results), 2)
+
+            # Navigation invalidates the cache
+            world.browser.get('about:blank')
+            assert not find_changed()
+        finally:
+            util.CACHE = None
+
     def test_find_by_id(self):
         assert find_field_by_id(world.browser, 'password', 'pass')
 
@@ -60,6 +184,39 @@ class TestUtil(unittest.TestCase):
         assert find_field(world.browser, 'text', 'user')
         assert find_field(world.browser, 'text', 'ชื่อ:')
 
+    def test_find_field_index(self):
+        # The index finds the same fields as the queries by id, name and
+        # label would
+        for field_types, value in (
+                (('text',), 'username'),
+                (('text',), 'user'),
+                (('text',), 'Username:'),
+                (('text', 'password'), 'Password'),
+                (('textarea',), 'bio'),
+                (('select',), 'car_choice'),
+                (('select',), 'Favorite Colors:'),
+                (('radio', 'checkbox'), 'vehicle'),
+                (('radio', 'checkbox'), 'a'),
+                (('date', 'text'), 'Date of birth:'),
+                (('text',), 'Favorite Colors:'),
+        ):
+            queried = reduce(operator.add, (
+                selector
+                for field_type in field_types
+                for selector in (
+                    find_field_by_id(world.browser, field_type, value),
+                    find_field_by_name(world.browser, field_type, value),
+                    find_field_by_label(world.browser, field_type, value),
+                )
+            ))
+            self.assertEqual(
+                list(find_any_field(world.browser, field_types, value)),
+                list(queried))
+
+        self.assertEqual(
+            len(find_any_field(world.browser, ('radio', 'checkbox'), 'a')),
+            4)
+
     def test_find_button(self):
         assert find_button(world.browser, 'submit_main')
         assert find_button(world.browser, 'Submit!')
@@ -67,6 +224,240 @@ class TestUtil(unittest.TestCase):
         assert find_button(world.browser, 'Submit as tentative')
         assert find_button(world.browser, 'ส่งฟอร์ม')
 
+    def test_find_button_by_content(self):
+        button = find_button(world.browser, 'Submit')
+        self.assertEqual(button.get_attribute('name'), 'submit_tentative')
+
+    def test_wait_for_dom_changes(self):
+        world.browser.execute_script("""
+            window.setTimeout(function () {
+                document.getElementById('somediv').innerHTML = 'Changed';
+            }, 1000);
+        """)
+
+        @wait_for(scheduler=DOMChanges(interval=10))
+        def changed():
+            assert ElementSelector(
+                world.browser, '//div[@id="somediv"][.="Changed"]')
+
+        start_time = time()
+        changed()
+        self.assertLess(time() - start_time, 5)
+
+    @skip_if_browser(('fake', 'html'),
+                     "Pages do not run scripts without a browser.")
+    def test_wait_until_idle(self):
+        with test_server():
+            # Start watching the requests
+            assert wait_until_idle(world.browser, timeout=1)
+
+            world.browser.execute_script("""
+                window.fetch('/ajax_target.html').then(function (response) {
+                    return response.text();
+                }).then(function (text) {
+                    document.getElementById('somediv').innerHTML = text;
+                });
+            """)
+            assert wait_until_idle(world.browser, timeout=0.2) is False
+
+            start_time = time()
+            assert wait_until_idle(world.browser, timeout=10)
+            self.assertLess(time() - start_time, 5)
+
+            # No retries needed once the page is idle
+            assert ElementSelector(
+                world.browser,
+                '//div[@id="somediv"][contains(., "Loaded with AJAX")]')
+
+    def test_confirm_absent(self):
+        assert confirm_absent(world.browser, {'text': "Bogeyman"})
+        assert not confirm_absent(
+            world.browser, {'text': "Hello there!"}, timeout=0.2)
+
+        assert confirm_absent(world.browser, {
+            'plan': locate(world.browser, attributes=[('id', 'hidden_text')],
+                           filter_displayed=True).plan,
+        })
+        assert not confirm_absent(world.browser, {
+            'plan': locate(world.browser, attributes=[('id', 'somediv')],
+                           filter_displayed=True).plan,
+        }, timeout=0.2)
+
+        # The page has no jQuery
+        self.assertIsNone(
+            confirm_absent(world.browser, {'jquery': '#missing'}))
+
+        # Longer timeouts are waited for in several scripts, but no longer
+        start_time = time()
+        assert not confirm_absent(
+            world.browser, {'text': "Hello there!"}, timeout=2.5)
+        self.assertGreaterEqual(time() - start_time, 2.5)
+        self.assertLess(time() - start_time, 4)
+
+    def test_confirm_absent_fallback(self):
+        # The page is checked once if the browser cannot wait
+        failing = "throw new Error('Cannot wait.');"
+        assert confirm_absent(
+            world.browser, {'text': "Bogeyman"}, script=failing)
+        assert not confirm_absent(
+            world.browser, {'text': "Hello there!"}, script=failing)
+
+    @skip_if_browser(('fake', 'html'),
+                     "Pages do not run scripts without a browser.")
+    def test_confirm_absent_waits(self):
+        world.browser.execute_script("""
+            window.setTimeout(function () {
+                var div = document.getElementById('somediv');
+                div.parentNode.removeChild(div);
+            }, 500);
+        """)
+
+        start_time = time()
+        assert confirm_absent(world.browser, {'text': "Hello there!"},
+                              timeout=5)
+        self.assertLess(time() - start_time, 2)
+
+        # A match appearing during the quiet time is noticed
+        world.browser.execute_script("""
+            window.setTimeout(function () {
+                document.body.appendChild(document.createTextNode('Boo'));
+            }, 100);
+        """)
+        assert not confirm_absent(world.browser, {'text': "Boo"},
+                                  quiet=1, timeout=0.5)
+
+    def test_form_states(self):
+        username, bike, colors, missing = form_states(world.browser, [
+            find_field(world.browser, 'text', 'username'),
+            find_field(world.browser, 'checkbox', 'I have a bike'),
+            find_field(world.browser, 'select', 'Favorite Colors:'),
+            find_field(world.browser, 'text', 'no_such_field'),
+        ])
+
+        self.assertEqual(len(username), 1)
+        self.assertEqual(username[0]['tag'], 'input')
+        self.assertEqual(username[0]['type'], 'text')
+        self.assertEqual(username[0]['id'], 'username')
+        self.assertEqual(username[0]['element'].get_attribute('id'),
+                         'username')
+
+        self.assertEqual(bike[0]['value'], 'Bike')
+        self.assertFalse(bike[0]['selected'])
+
+        self.assertEqual(colors[0]['type'], 'select-multiple')
+        self.assertEqual(
+            [(option['value'], option['text'], option['selected'])
+             for option in colors[0]['controls']],
+            [('blue', 'Blue', False), ('red', 'Red', True),
+             ('green', 'Green', False), ('black', 'Black', False),
+             ('cyan', 'ฟ้า', False)])
+
+        self.assertEqual(missing, [])
+
+    def test_fill_in_fields(self):
+        username = find_field(world.browser, 'text', 'username')
+        bike = find_field(world.browser, 'checkbox', 'I have a bike')
+        colors = find_field(world.browser, 'select', 'Favorite Colors:')
+        vehicles = find_field(world.browser, 'checkbox', 'vehicle')
+        female = find_field(world.browser, 'radio', 'Female')
+
+        self.assertEqual(fill_in_fields(world.browser, [
+            (username, 'Danni'),
+            (find_field(world.browser, 'text', 'no_such_field'), 'x'),
+            (vehicles, 'checked'),
+            (bike, 'yes'),
+            (female, 'unchecked'),
+            (colors, 'Blue, Purple'),
+        ]), [
+            None,
+            ['missing'],
+            ['multiple', 2],
+            ['state', 'yes'],
+            None,
+            ['option', 'Purple'],
+        ])
+
+        # Nothing is changed if any field cannot be filled in
+        self.assertEqual(username.get_attribute('value'), '')
+
+        self.assertEqual(fill_in_fields(world.browser, [
+            (username, 'Danni'),
+            (bike, 'checked'),
+            (colors, 'Blue, green'),
+        ]), [None, None, None])
+
+        self.assertEqual(username.get_attribute('value'), 'Danni')
+        self.assertTrue(bike.is_selected())
+        self.assertEqual(
+            [option.get_attribute('value') for option in
+             colors.find_elements_by_xpath('./option')
+             if option.is_selected()],
+            ['blue', 'green'])
+
+    def visit_interactable_page(self):
+        with test_server() as (_, address):
+            world.browser.get(
+                'http://{0[0]}:{0[1]}/interactable_page.html'.format(address))
+
+    def test_probe_interactable(self):
+        self.visit_interactable_page()
+
+        probed = probe_interactable(
+            world.browser, locate(world.browser, 'button', [('title', 'Save')]))
+        self.assertEqual(
+            [(state['element'].get_attribute('id'),
+              state['displayed'], state['enabled']) for state in probed[:2]],
+            [('hidden', False, True), ('disabled', True, False)])
+        assert not any(state['hit'] for state in probed[:-1])
+        assert probed[-1]['hit']
+
+        with self.assertRaisesRegex(AssertionError, 'it is not displayed'):
+            first_interactable(
+                world.browser, locate(world.browser, attributes=[
+                    ('id', 'hidden')]), "the hidden button")
+        with self.assertRaisesRegex(AssertionError, 'it is disabled'):
+            first_interactable(
+                world.browser, locate(world.browser, attributes=[
+                    ('id', 'disabled')]), "the disabled button")
+        with self.assertRaisesRegex(AssertionError, 'Cannot find'):
+            first_interactable(
+                world.browser, locate(world.browser, attributes=[
+                    ('id', 'missing')]), "the missing button")
+        with self.assertRaisesRegex(AssertionError, 'Found 4 elements'):
+            first_interactable(
+                world.browser, locate(world.browser, 'button', [
+                    ('title', 'Save')]), "a button", single=True)
+
+    @skip_if_browser(('fake', 'html'),
+                     "Pages are not laid out without a browser.")
+    def test_probe_layout(self):
+        self.visit_interactable_page()
+
+        # The covered button is passed over, the one below the window is
+        # scrolled into view
+        button = first_interactable(
+            world.browser, locate(world.browser, 'button', [('title', 'Save')]),
+            "a button")
+        self.assertEqual(button.get_attribute('id'), 'below')
+
+        with self.assertRaisesRegex(AssertionError, 'covered'):
+            first_interactable(
+                world.browser, locate(world.browser, attributes=[
+                    ('id', 'covered')]), "the covered button")
+
+    def test_find_option_by_contents(self):
+        with test_server() as (_, address):
+            world.browser.get(
+                'http://{0[0]}:{0[1]}/option_page.html'.format(address))
+
+        # The first option containing the text, even if others do
+        option = find_option(world.browser, 'Shade:', 'Blue')
+        self.assertEqual(len(option), 1)
+        self.assertEqual(option.get_attribute('value'), 'blue')
+
+        option = find_option(world.browser, 'Shade:', 'Light')
+        self.assertEqual(option.get_attribute('value'), 'lightblue')
+
     def test_option_in_select(self):
         assert option_in_select(world.browser, 'Favorite Colors:', 'Blue')
         assert option_in_select(world.browser, 'Favorite Colors:', 'ฟ้า')
@@ -103,8 +494,8 @@ class TestWaitFor(unittest.TestCase):
 
     def test_slow_function(self):
         """
-        Test that wait_for still waits for the required number of seconds if the
-        wrapped function takes a long time to execute.
+        Test that the time taken by the wrapped function counts towards the
+        timeout.
         """
 
         start_time = time()
@@ -119,11 +510,72 @@ class TestWaitFor(unittest.TestCase):
             """
 
             result = time() - start_time >= seconds
-            sleep(7)
+            sleep(4)
             assert result
             return True
 
         # pylint:disable=unexpected-keyword-arg
         # wait_for decorator parses the argument
 
-        assert slow_seconds_passed(3, timeout=5)
+        with self.assertRaises(AssertionError):
+            slow_seconds_passed(3, timeout=3)
+        self.assertLess(time() - start_time, 5)
+
+        start_time = time()
+        assert slow_seconds_passed(3, timeout=6)
+
+    def test_default_timeout(self):
+        """
+        Test the timeout given to the decorator.
+        """
+
+        start_time = time()
+
+        @wait_for(timeout=1, scheduler=FixedInterval(0.1))
+        def never():
+            """Always fail."""
+            raise AssertionError("Never succeeds.")
+
+        with self.assertRaises(AssertionError):
+            never()
+        self.assertLess(time() - start_time, 2)
+
+        start_time = time()
+        with self.assertRaises(AssertionError):
+            never(timeout=0)  # pylint:disable=unexpected-keyword-arg
+        self.assertLess(time() - start_time, 0.5)
+
+    def test_tagged_timeout(self):
+        """
+        Test reading the timeout from the scenario tags.
+        """
+
+        feature = Feature.from_string("""
+        @timeout=20
+        Feature: Timeouts
+
+        @timeout=2.5
+        Scenario: Shorter timeout
+            When I wait
+
+        Scenario: Feature timeout
+            When I wait
+        """)
+
+        self.assertEqual(
+            tagged_timeout(feature.scenarios[0].steps[0]), 2.5)
+        self.assertEqual(
+            tagged_timeout(feature.scenarios[1].steps[0]), 20)
+
+    def test_backoff(self):
+        """
+        Test the exponential backoff delays.
+        """
+
+        delays = ExponentialBackoff(
+            initial=0.1, factor=2, maximum=1, jitter=0.5).delays()
+        delays = [next(delays) for _ in range(6)]
+
+        for delay, longest in zip(delays, (0.1, 0.2, 0.4, 0.8, 1, 1)):
+            self.assertLessEqual(delay, longest)
+            self.assertGreaterEqual(delay, longest / 2)
@@ -59,6 +59,16 @@ class TestSteps(FeatureTest):
         Then I should see "Loaded with AJAX"
         """
 
+    @feature()
+    def test_page_idle(self):
+        """
+        Given I visit test page "link_page"
+        And I wait for the page to be idle
+        When I click "Load content with AJAX"
+        And I wait for the page to be idle
+        Then I should see "Loaded with AJAX"
+        """
+
     @feature()
     def test_I_see_a_form(self):
         """
@@ -115,6 +125,16 @@ class TestSteps(FeatureTest):
         Then I should not see option "Mercedes" in selector "car_choice"
         """
 
+    @feature()
+    def test_combo_box_overlapping_options(self):
+        """
+        Given I visit test page "option_page"
+        When I select "Light Blue" from "Shade:"
+        Then The "Light Blue" option from "Shade:" should be selected
+        When I select "Blue" from "Shade:"
+        Then The "Blue" option from "Shade:" should be selected
+        """
+
     @feature()
     def test_multi_combo_boxes(self):
         '''
@@ -131,6 +151,37 @@ class TestSteps(FeatureTest):
             """
         '''
 
+    @feature()
+    def test_multi_combo_box_groups(self):
+        '''
+        Given I visit test page "option_page"
+        When I select the following from "Sizes:":
+            """
+            Any
+            Small
+            """
+        Then The following options from "Sizes:" should be selected:
+            """
+            Any
+            Small
+            """
+        '''
+
+    @feature(fails=True)
+    def test_multi_combo_box_groups_fail(self):
+        '''
+        Given I visit test page "option_page"
+        When I select the following from "Sizes:":
+            """
+            Any
+            Small
+            """
+        Then The following options from "Sizes:" should be selected:
+            """
+            Any
+            """
+        '''
+
     @feature()
     def test_radio_buttons(self):
         """
@@ -140,6 +191,15 @@ class TestSteps(FeatureTest):
         And The "Female" option should not be chosen
         """
 
+    @feature()
+    def test_invisible_text(self):
+        """
+        When I visit test page "basic_page"
+        Then I should see "Username:"
+        And I should not see "Some spiffy hidden text"
+        And I should not see "A Basic Page"
+        """
+
     @feature(fails=True)
     def test_hidden_text(self):
         """
@@ -225,6 +285,75 @@ class TestSteps(FeatureTest):
         Then input "username" has value "Ricky"
         """
 
+    @feature()
+    def test_fill_in_the_following(self):
+        '''
+        When I visit test page "basic_page"
+        And I fill in the following:
+            | field            | value              |
+            | Username:        | Danni              |
+            | bio              | everything awesome |
+            | Date of birth:   | 1992-02-14         |
+            | Male             | checked            |
+            | I have a bike    | checked            |
+            | car_choice       | Mercedes           |
+            | Favorite Colors: | Blue, Green        |
+        Then input "username" has value "Danni"
+        And The "I have a bike" checkbox should be checked
+        And The "Male" option should be chosen
+        And The "Mercedes" option from "car_choice" should be selected
+        And The following options from "Favorite Colors:" should be selected:
+            """
+            Blue
+            Green
+            """
+        And the form should have values:
+            | field         | value              |
+            | bio           | everything awesome |
+            | dob           | 1992-02-14         |
+        When I press "Submit!"
+        Then The browser's URL should contain "user=Danni"
+        '''
+
+    @feature(fails=True)
+    def test_fill_in_the_following_fail(self):
+        """
+        When I visit test page "basic_page"
+        And I fill in the following:
+            | field      | value |
+            | username   | Danni |
+            | car_choice | Skoda |
+        """
+
+    @feature()
+    def test_form_values(self):
+        """
+        When I visit test page "basic_page"
+        And I fill in "username" with "Danni"
+        And I check "I have a bike"
+        And I choose "Male"
+        And I select "Mercedes" from "car_choice"
+        Then the form should have values:
+            | field         | value     |
+            | username      | Danni     |
+            | I have a bike | checked   |
+            | I have a car  | unchecked |
+            | Male          | checked   |
+            | Female        | unchecked |
+            | car_choice    | Mercedes  |
+        """
+
+    @feature(fails=True)
+    def test_form_values_fail(self):
+        """
+        When I visit test page "basic_page"
+        And I fill in "username" with "Danni"
+        Then the form should have values:
+            | field         | value   |
+            | username      | Ricky   |
+            | I have a bike | checked |
+        """
+
     # Chrome's date fields expect input in a localized format, for example,
     # mm/dd/yyyy for en_US (note day and month swapped vis-a-vis ISO format).
     # The test browser locale is set to en_US.
@@ -2,9 +2,14 @@
 `Aloe-Webdriver` includes several utilities for writing Selenium_ tests.
 """
 
+import json
 import operator
-from copy import copy
-from functools import wraps
+import pkgutil
+import re
+from collections import OrderedDict
+from functools import partial, wraps
+from importlib import import_module
+from random import random
 from time import time, sleep
 
 try:
@@ -12,7 +17,15 @@ try:
 except NameError:
     from functools import reduce  # pylint:disable=redefined-builtin,ungrouped-imports
 
-from selenium.common.exceptions import NoSuchElementException
+from aloe import world
+from aloe.parser import Step
+from selenium.common.exceptions import (
+    StaleElementReferenceException,
+    TimeoutException,
+    UnexpectedAlertPresentException,
+    WebDriverException,
+)
+from selenium.webdriver.remote.webelement import WebElement
 
 # pylint:disable=missing-docstring,redefined-outer-name,redefined-builtin
 # pylint:disable=invalid-name
@@ -43,59 +56,1067 @@ def string_literal(content):
     return content
 
 
+# Characters to escape in CSS strings
+CSS_ESCAPES = {
+    '\\': '\\\\',
+    '"': '\\"',
+    '\n': '\\a ',
+    '\r': '\\d ',
+    '\f': '\\c ',
+    '\0': '\\fffd ',
+}
+
+
+def css_string(content):
+    """
+    A CSS string literal of the content.
+
+    Unlike :func:`string_literal`, can represent any string.
+    """
+
+    return '"' + ''.join(CSS_ESCAPES.get(char, char) for char in content) + \
+        '"'
+
+
+# The same atom Selenium uses to implement WebElement.is_displayed()
+IS_DISPLAYED_JS = pkgutil.get_data(
+    'selenium.webdriver.remote', 'isDisplayed.js').decode('utf8')
+
+# The scripts run in the browser by name. Each starts with a comment naming
+# it, for browser emulations (such as aloe_webdriver.html_driver) to tell
+# which script they are asked to run, wherever it is embedded.
+BROWSER_SCRIPTS = {}
+
+SCRIPT_MARKER = '/* aloe_webdriver:{} */\n'
+SCRIPT_MARKER_PATTERN = re.compile(r'/\* aloe_webdriver:(\w+) \*/')
+
+
+def browser_script(name, source):
+    """Register a script to run in the browser, marked with its name."""
+
+    script = SCRIPT_MARKER.format(name) + source
+    BROWSER_SCRIPTS[name] = script
+    return script
+
+
+def script_name(script):
+    """
+    The name of the first marked script in the given JavaScript code, or
+    ``None`` if there is none.
+    """
+
+    match = SCRIPT_MARKER_PATTERN.search(script)
+    return match and match.group(1)
+
+
+# Instrumentation of the current document: a random document ID and a
+# generation counter incremented on every change to the DOM or the URL,
+# notifying the listeners waiting for changes, and the XHR and fetch requests
+# in flight and whether the page is being navigated away from, notifying the
+# listeners waiting for the page to be idle
+PAGE_STATE_JS = """
+function pageState() {
+    var state = window.aloeWebdriver;
+    if (state && state.document === document) {
+        return state;
+    }
+
+    state = window.aloeWebdriver = {
+        document: document,
+        id: Math.random().toString(36).slice(2),
+        generation: 0,
+        listeners: [],
+        requests: 0,
+        navigating: false,
+        navigationTimer: null,
+        lastActivity: Date.now(),
+        activityListeners: []
+    };
+
+    function activity() {
+        state.lastActivity = Date.now();
+        var listeners = state.activityListeners;
+        state.activityListeners = [];
+        listeners.forEach(function (listener) {
+            listener();
+        });
+    }
+
+    function requestStarted() {
+        state.requests++;
+        activity();
+    }
+
+    function requestFinished() {
+        state.requests--;
+        activity();
+    }
+
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        requestStarted();
+        this.addEventListener('loadend', requestFinished);
+        try {
+            return send.apply(this, arguments);
+        } catch (e) {
+            this.removeEventListener('loadend', requestFinished);
+            requestFinished();
+            throw e;
+        }
+    };
+
+    var fetch = window.fetch;
+    if (fetch) {
+        window.fetch = function () {
+            requestStarted();
+            try {
+                return fetch.apply(this, arguments).then(function (response) {
+                    requestFinished();
+                    return response;
+                }, function (error) {
+                    requestFinished();
+                    throw error;
+                });
+            } catch (e) {
+                requestFinished();
+                throw e;
+            }
+        };
+    }
+
+    function navigationOver() {
+        clearTimeout(state.navigationTimer);
+        if (state.navigating) {
+            state.navigating = false;
+            activity();
+        }
+    }
+
+    // A cancelled unload or a download leaves the page in place, so the
+    // navigation is given up on after a while, or when the page is shown again
+    window.addEventListener('beforeunload', function () {
+        state.navigating = true;
+        activity();
+        clearTimeout(state.navigationTimer);
+        state.navigationTimer = setTimeout(navigationOver, 2000);
+    });
+    window.addEventListener('pageshow', navigationOver);
+    document.addEventListener('readystatechange', activity);
+
+    function changed() {
+        state.generation++;
+        var listeners = state.listeners;
+        state.listeners = [];
+        listeners.forEach(function (listener) {
+            listener();
+        });
+    }
+
+    new MutationObserver(changed).observe(document, {
+        attributes: true,
+        characterData: true,
+        childList: true,
+        subtree: true
+    });
+
+    ['pushState', 'replaceState'].forEach(function (method) {
+        var original = history[method];
+        history[method] = function () {
+            var result = original.apply(this, arguments);
+            changed();
+            return result;
+        };
+    });
+    window.addEventListener('popstate', changed);
+    window.addEventListener('hashchange', changed);
+
+    return state;
+}
+
+function pageToken(state) {
+    return state.id + ':' + state.generation;
+}
+
+function pageBusy(state) {
+    return state.navigating || state.requests > 0 ||
+        document.readyState !== 'complete';
+}
+"""
+
+# Helper functions shared by the scripts evaluating queries in the browser
+SCRIPT_PRELUDE = "var isDisplayed = " + IS_DISPLAYED_JS + ";" + \
+    PAGE_STATE_JS + """
+
+function isEnabled(element) {
+    var matches = element.matches ||
+        element.webkitMatchesSelector ||
+        element.msMatchesSelector;
+    return !(matches && matches.call(element, ':disabled'));
+}
+
+function matchesSelector(element, css) {
+    var matches = element.matches ||
+        element.webkitMatchesSelector ||
+        element.msMatchesSelector;
+    return matches.call(element, css);
+}
+
+function selectCSS(css, context) {
+    return Array.prototype.slice.call(
+        (context || document).querySelectorAll(css));
+}
+
+function selectById(id, css, context) {
+    if (!context) {
+        var element = document.getElementById(id);
+        if (!element) {
+            return [];
+        }
+        if (matchesSelector(element, css)) {
+            return [element];
+        }
+        // Another element with the same ID might match
+    }
+    return selectCSS(css, context);
+}
+
+function selectXPath(xpath, context) {
+    var snapshot = document.evaluate(
+        xpath, context || document, null,
+        XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+
+    var result = [];
+    for (var i = 0; i < snapshot.snapshotLength; i++) {
+        var node = snapshot.snapshotItem(i);
+        if (node.nodeType === Node.ELEMENT_NODE) {
+            result.push(node);
+        }
+    }
+    return result;
+}
+
+function uniqueInDocumentOrder(elements) {
+    var result = [];
+    elements.forEach(function (element) {
+        if (result.indexOf(element) === -1) {
+            result.push(element);
+        }
+    });
+    return result.sort(function (a, b) {
+        if (a === b) {
+            return 0;
+        }
+        return a.compareDocumentPosition(b) &
+            Node.DOCUMENT_POSITION_FOLLOWING ? -1 : 1;
+    });
+}
+
+function textLength(element) {
+    var text = element.innerText || element.textContent || '';
+    return text.replace(/\\s+/g, ' ').trim().length;
+}
+
+// The form controls of the page with their types, IDs, names and the text of
+// the labels pointing to them, kept until the DOM changes
+function fieldIndex() {
+    var state = pageState();
+    if (state.fields && state.fields.generation === state.generation) {
+        return state.fields.controls;
+    }
+
+    var labels = {};
+    selectCSS('label[for]').forEach(function (label) {
+        var target = label.getAttribute('for');
+        if (!labels.hasOwnProperty(target)) {
+            labels[target] = [];
+        }
+        labels[target].push(label.textContent);
+    });
+
+    var controls = selectCSS('input, select, textarea').map(function (element) {
+        var id = element.getAttribute('id');
+        return {
+            element: element,
+            tag: element.tagName.toLowerCase(),
+            type: (element.getAttribute('type') || '').toLowerCase(),
+            id: id,
+            name: element.getAttribute('name'),
+            labels: id !== null && labels.hasOwnProperty(id) ? labels[id] : []
+        };
+    });
+
+    state.fields = {generation: state.generation, controls: controls};
+    return controls;
+}
+
+function selectFields(types, value, context) {
+    return fieldIndex().filter(function (control) {
+        return (!context || context !== control.element &&
+                context.contains(control.element)) &&
+            types.some(function (type) {
+                return type === 'select' || type === 'textarea' ?
+                    control.tag === type :
+                    control.tag === 'input' && control.type === type;
+            }) &&
+            (control.id === value || control.name === value ||
+             control.labels.some(function (text) {
+                 return text.indexOf(value) !== -1;
+             }));
+    }).map(function (control) {
+        return control.element;
+    });
+}
+
+function evaluatePlan(plan, context) {
+    var result, i;
+    switch (plan.op) {
+    case 'xpath':
+        return selectXPath(plan.xpath, context);
+    case 'css':
+        return selectCSS(plan.css, context);
+    case 'id':
+        return selectById(plan.id, plan.css, context);
+    case 'field':
+        return selectFields(plan.types, plan.value, context);
+    case 'elements':
+        return plan.elements.slice();
+    case 'filter':
+        return evaluatePlan(plan.plan, context).filter(function (element) {
+            return (!plan.displayed || isDisplayed(element)) &&
+                (!plan.enabled || isEnabled(element));
+        });
+    case 'concat':
+        result = [];
+        plan.plans.forEach(function (subplan) {
+            result.push.apply(result, evaluatePlan(subplan, context));
+        });
+        return result;
+    case 'union':
+        result = [];
+        plan.plans.forEach(function (subplan) {
+            result.push.apply(result, evaluatePlan(subplan, context));
+        });
+        return uniqueInDocumentOrder(result);
+    case 'intersection':
+        result = evaluatePlan(plan.plans[0], context);
+        for (i = 1; i < plan.plans.length; i++) {
+            var other = evaluatePlan(plan.plans[i], context);
+            result = result.filter(function (element) {
+                return other.indexOf(element) !== -1;
+            });
+        }
+        return result;
+    case 'otherwise':
+        for (i = 0; i < plan.plans.length; i++) {
+            result = evaluatePlan(plan.plans[i], context);
+            if (result.length) {
+                return result;
+            }
+        }
+        return [];
+    case 'scope':
+        result = [];
+        evaluatePlan(plan.context, context).forEach(function (element) {
+            result.push.apply(result, evaluatePlan(plan.plan, element));
+        });
+        return uniqueInDocumentOrder(result);
+    case 'limit':
+        return evaluatePlan(plan.plan, context).slice(0, plan.count);
+    case 'shortest':
+        var best = null, bestLength = null;
+        // Keep the first of the equally long candidates
+        evaluatePlan(plan.plan, context).forEach(function (element) {
+            var length = plan.by_text ?
+                textLength(element) : (element.value || '').length;
+            if (best === null || length < bestLength) {
+                best = element;
+                bestLength = length;
+            }
+        });
+        return best === null ? [] : [best];
+    }
+    throw new Error('Unknown query operation: ' + plan.op);
+}
+"""
+
+QUERY_SCRIPT = browser_script('query', SCRIPT_PRELUDE + """
+return evaluatePlan(arguments[0], null);
+""")
+
+# Whether any of the innermost elements containing the given text (i.e. the
+# ones without any children containing it) is displayed, where the text is
+# normalised as with XPath normalize-space()
+TEXT_SEARCH_JS = """
+function textDisplayed(text) {
+    function containsText(element) {
+        return element.textContent
+            .replace(/[ \\t\\r\\n]+/g, ' ')
+            .replace(/^ | $/g, '')
+            .indexOf(text) !== -1;
+    }
+
+    var root = document.documentElement;
+    if (!root || !containsText(root)) {
+        return false;
+    }
+
+    // Only descend into the elements containing the text: their descendants
+    // cannot contain it either
+    var walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT, {
+        acceptNode: function (element) {
+            return containsText(element) ?
+                NodeFilter.FILTER_ACCEPT : NodeFilter.FILTER_REJECT;
+        }
+    }, false);
+
+    // In document order, an element is followed by the matching elements
+    // inside it, if any, so the matching element is innermost unless the
+    // next one is its descendant
+    var previous = root, element;
+    while ((element = walker.nextNode())) {
+        if (!previous.contains(element) && isDisplayed(previous)) {
+            return true;
+        }
+        previous = element;
+    }
+    return isDisplayed(previous);
+}
+"""
+
+TEXT_SEARCH_SCRIPT = browser_script(
+    'text_search', SCRIPT_PRELUDE + TEXT_SEARCH_JS + """
+return textDisplayed(arguments[0]);
+""")
+
+# Check that nothing matches the given query (a query plan, a text or a jQuery
+# selector) for the given number of milliseconds, checking again on every
+# change to the page, and waiting no longer than the given timeout in
+# milliseconds for the matches to disappear. Returns whether nothing matched,
+# or null if the query needs jQuery and the page has none
+ABSENCE_SCRIPT = browser_script(
+    'absence', SCRIPT_PRELUDE + TEXT_SEARCH_JS + """
+var query = arguments[0],
+    quiet = arguments[1],
+    timeout = arguments[2],
+    done = arguments[arguments.length - 1];
+
+function found() {
+    if (query.text !== undefined) {
+        return textDisplayed(query.text);
+    }
+    if (query.jquery !== undefined) {
+        return window.jQuery(query.jquery).length > 0;
+    }
+    return evaluatePlan(query.plan, null).length > 0;
+}
+
+if (query.jquery !== undefined && !window.jQuery) {
+    done(null);
+    return;
+}
+
+var state = pageState(), start = Date.now(), absentSince = null,
+    finished = false, listening = false, timer;
+
+function finish(absent) {
+    if (!finished) {
+        finished = true;
+        clearTimeout(timer);
+        done(absent);
+    }
+}
+
+function onChange() {
+    listening = false;
+    check();
+}
+
+function check() {
+    if (finished) {
+        return;
+    }
+    clearTimeout(timer);
+
+    var now = Date.now(), wait;
+    if (found()) {
+        absentSince = null;
+        wait = start + timeout - now;
+        if (wait <= 0) {
+            finish(false);
+            return;
+        }
+    } else {
+        if (absentSince === null) {
+            absentSince = now;
+        }
+        wait = absentSince + quiet - now;
+        if (wait <= 0) {
+            finish(true);
+            return;
+        }
+    }
+
+    if (!listening) {
+        listening = true;
+        state.listeners.push(onChange);
+    }
+    timer = setTimeout(check, wait);
+}
+
+window.addEventListener('pagehide', function () {
+    finish(false);
+});
+check();
+""")
+
+# Wait until the page changes from the given token, or for the given number of
+# milliseconds, returning the new token
+WAIT_FOR_CHANGE_SCRIPT = browser_script('wait_for_change', PAGE_STATE_JS + """
+var last = arguments[0],
+    timeout = arguments[1],
+    done = arguments[arguments.length - 1];
+
+var state = pageState();
+if (pageToken(state) !== last) {
+    done(pageToken(state));
+    return;
+}
+
+var finished = false, timer;
+function finish() {
+    if (!finished) {
+        finished = true;
+        clearTimeout(timer);
+        done(pageToken(state));
+    }
+}
+
+timer = setTimeout(finish, timeout);
+state.listeners.push(finish);
+window.addEventListener('pagehide', finish);
+""")
+
+# Wait until the page has finished loading and there have been no requests in
+# flight for the given number of milliseconds, but no longer than the given
+# timeout in milliseconds, returning whether the page is idle
+IDLE_SCRIPT = browser_script('idle', PAGE_STATE_JS + """
+var quiet = arguments[0],
+    timeout = arguments[1],
+    done = arguments[arguments.length - 1];
+
+var state = pageState(), start = Date.now(),
+    finished = false, listening = false, timer;
+
+function finish(idle) {
+    if (!finished) {
+        finished = true;
+        clearTimeout(timer);
+        done(idle);
+    }
+}
+
+function onActivity() {
+    listening = false;
+    check();
+}
+
+function check() {
+    if (finished) {
+        return;
+    }
+    clearTimeout(timer);
+
+    var now = Date.now(), busy = pageBusy(state),
+        wait = busy ? timeout : quiet - (now - state.lastActivity);
+    if (!busy && wait <= 0) {
+        finish(true);
+        return;
+    }
+
+    wait = Math.min(wait, start + timeout - now);
+    if (wait <= 0) {
+        finish(false);
+        return;
+    }
+    if (!listening) {
+        listening = true;
+        state.activityListeners.push(onActivity);
+    }
+    timer = setTimeout(check, wait);
+}
+
+check();
+""")
+
+# Evaluate a query plan unless the page hasn't changed since the given token
+# and the cached elements are still there, returning the current token and
+# the elements (or null to use the cached ones)
+CACHED_QUERY_SCRIPT = browser_script('cached_query', SCRIPT_PRELUDE + """
+var token = arguments[0],
+    cached = arguments[1],
+    plan = arguments[2];
+
+var state = pageState();
+if (cached && token === pageToken(state) &&
+        cached.every(function (element) {
+            return document.contains(element);
+        })) {
+    return [token, null];
+}
+
+return [pageToken(state), evaluatePlan(plan, null)];
+""")
+
+
+# The state of the elements selected by each of the given query plans, and
+# of the form controls and options within them
+FORM_STATE_SCRIPT = browser_script('form_state', SCRIPT_PRELUDE + """
+function controlState(element) {
+    var tag = element.tagName.toLowerCase();
+    return {
+        element: element,
+        tag: tag,
+        type: element.type || null,
+        id: element.id,
+        name: element.getAttribute('name'),
+        value: element.value === undefined ? null : element.value,
+        text: tag === 'option' ?
+            element.text.replace(/\\s+/g, ' ').trim() : null,
+        selected: Boolean(tag === 'option' ?
+            element.selected : element.checked)
+    };
+}
+
+return arguments[0].map(function (plan) {
+    return evaluatePlan(plan, null).map(function (element) {
+        var state = controlState(element);
+        state.controls = Array.prototype.map.call(
+            element.querySelectorAll('input, select, textarea, option'),
+            controlState);
+        return state;
+    });
+});
+""")
+
+
+# Set the values of the only element selected by each of the given query
+# plans, firing the events typing or clicking would; nothing is changed
+# unless all the elements are found and can take their values
+FILL_IN_SCRIPT = browser_script('fill_in', SCRIPT_PRELUDE + """
+function fire(element, type) {
+    var event = document.createEvent('HTMLEvents');
+    event.initEvent(type, true, false);
+    element.dispatchEvent(event);
+}
+
+function setValue(element, value) {
+    // Use the native setter, as frameworks may override the property
+    var descriptor = Object.getOwnPropertyDescriptor(
+        Object.getPrototypeOf(element), 'value');
+    if (descriptor && descriptor.set) {
+        descriptor.set.call(element, value);
+    } else {
+        element.value = value;
+    }
+}
+
+function optionText(option) {
+    return option.text.replace(/\\s+/g, ' ').trim();
+}
+
+function prepare(plan, value) {
+    var elements = evaluatePlan(plan, null);
+    if (!elements.length) {
+        return {problem: ['missing']};
+    }
+    if (elements.length > 1) {
+        return {problem: ['multiple', elements.length]};
+    }
+
+    var element = elements[0];
+    if (!isEnabled(element) || element.readOnly) {
+        return {problem: ['disabled']};
+    }
+
+    switch (element.type) {
+    case 'checkbox':
+    case 'radio':
+        if (value !== 'checked' && value !== 'unchecked') {
+            return {problem: ['state', value]};
+        }
+        var check = value === 'checked';
+        if (element.type === 'radio' && element.checked && !check) {
+            return {problem: ['state', value]};
+        }
+        return {apply: function () {
+            if (element.checked !== check) {
+                element.click();
+            }
+        }};
+    case 'select-one':
+    case 'select-multiple':
+        var names = element.multiple ?
+            value.split(',').map(function (name) {
+                return name.trim();
+            }).filter(Boolean) : [value];
+        var options = Array.prototype.slice.call(element.options);
+        var chosen = [];
+        for (var i = 0; i < names.length; i++) {
+            var option = options.filter(function (option) {
+                return optionText(option) === names[i] ||
+                    option.value === names[i];
+            })[0];
+            if (!option) {
+                return {problem: ['option', names[i]]};
+            }
+            chosen.push(option);
+        }
+        return {apply: function () {
+            options.forEach(function (option) {
+                option.selected = chosen.indexOf(option) !== -1;
+            });
+            fire(element, 'input');
+            fire(element, 'change');
+        }};
+    default:
+        return {apply: function () {
+            setValue(element, value);
+            fire(element, 'input');
+            fire(element, 'change');
+        }};
+    }
+}
+
+var prepared = arguments[0].map(function (field) {
+    return prepare(field[0], field[1]);
+});
+var problems = prepared.map(function (field) {
+    return field.problem || null;
+});
+if (problems.every(function (problem) { return problem === null; })) {
+    prepared.forEach(function (field) {
+        field.apply();
+    });
+}
+return problems;
+""")
+
+
+# Probe the elements selected by the given query plan in turn until one can
+# be clicked (or all of them, if the second argument is true): it is displayed
+# and enabled, and, once scrolled into view, its centre is within the window
+# and not covered by another element
+INTERACTABLE_SCRIPT = browser_script('interactable', SCRIPT_PRELUDE + """
+function probe(element) {
+    var result = {
+        element: element,
+        displayed: isDisplayed(element),
+        enabled: isEnabled(element),
+        in_viewport: false,
+        hit: false
+    };
+    if (!result.displayed || !result.enabled) {
+        return result;
+    }
+
+    var rect = element.getBoundingClientRect();
+    var width = window.innerWidth || document.documentElement.clientWidth,
+        height = window.innerHeight || document.documentElement.clientHeight;
+    if (rect.top < 0 || rect.left < 0 ||
+            rect.bottom > height || rect.right > width) {
+        element.scrollIntoView({block: 'center', inline: 'center'});
+        rect = element.getBoundingClientRect();
+    }
+
+    var x = rect.left + rect.width / 2,
+        y = rect.top + rect.height / 2;
+    result.in_viewport = x >= 0 && y >= 0 && x < width && y < height;
+    if (result.in_viewport) {
+        var hit = document.elementFromPoint(x, y);
+        result.hit = hit !== null &&
+            (hit === element || element.contains(hit));
+    }
+    return result;
+}
+
+var candidates = evaluatePlan(arguments[0], null), probed = [];
+for (var i = 0; i < candidates.length; i++) {
+    var result = probe(candidates[i]);
+    probed.push(result);
+    if (result.hit && !arguments[1]) {
+        break;
+    }
+}
+return probed;
+""")
+
+
+# Record the last console messages and JavaScript errors of the page, from
+# when it is first run on it onwards
+CONSOLE_CAPTURE_JS = """
+(function () {
+    if (window.aloeWebdriverConsole) {
+        return;
+    }
+    var messages = window.aloeWebdriverConsole = [];
+
+    function describe(value) {
+        // Objects without a prototype or with a broken toString
+        try {
+            return String(value);
+        } catch (e) {
+            try {
+                return Object.prototype.toString.call(value);
+            } catch (e2) {
+                return '?';
+            }
+        }
+    }
+
+    function log(level, message) {
+        if (messages.length >= 100) {
+            messages.shift();
+        }
+        messages.push({
+            level: level,
+            message: message,
+            timestamp: Date.now()
+        });
+    }
+
+    ['log', 'info', 'warn', 'error'].forEach(function (level) {
+        var original = console[level];
+        console[level] = function () {
+            var parts = [];
+            for (var i = 0; i < arguments.length; i++) {
+                parts.push(describe(arguments[i]));
+            }
+            log(level, parts.join(' '));
+            return original.apply(this, arguments);
+        };
+    });
+    window.addEventListener('error', function (event) {
+        log('error', event.message + ' (' + event.filename + ':' +
+            event.lineno + ')');
+    });
+    window.addEventListener('unhandledrejection', function (event) {
+        log('error', 'Unhandled rejection: ' + describe(event.reason));
+    });
+})();
+"""
+
+# Start recording the console messages and JavaScript errors of the page
+CAPTURE_CONSOLE_SCRIPT = browser_script('capture_console', CONSOLE_CAPTURE_JS)
+
+# The console messages and JavaScript errors recorded on the page, starting to
+# record them if they were not yet
+CONSOLE_SCRIPT = browser_script('console', CONSOLE_CAPTURE_JS + """
+return window.aloeWebdriverConsole;
+""")
+
+
+# Clear the local, session and IndexedDB storage of the page, returning whether
+# all of IndexedDB could be cleared. Browsers which cannot list the databases
+# (such as Firefox before version 126) only have the ones named in
+# arguments[0] deleted.
+RESET_STORAGE_SCRIPT = browser_script('reset_storage', """
+var names = arguments[0];
+var done = arguments[arguments.length - 1];
+try { window.localStorage.clear(); } catch (e) {}
+try { window.sessionStorage.clear(); } catch (e) {}
+if (!window.indexedDB) {
+    done(false);
+    return;
+}
+function deleteDatabases(databases) {
+    databases.forEach(function (name) {
+        window.indexedDB.deleteDatabase(name);
+    });
+}
+if (!window.indexedDB.databases) {
+    deleteDatabases(names);
+    done(false);
+    return;
+}
+window.indexedDB.databases().then(function (databases) {
+    deleteDatabases(databases.map(function (database) {
+        return database.name;
+    }));
+    done(true);
+}, function () {
+    deleteDatabases(names);
+    done(false);
+});
+""")
+
+
 class ElementSelector(object):
     """
     A set of elements on a page matching an XPath query.
 
-    :param browser: ``world.browser``
+    :param browser: ``world.browser``, an element or another
+        :class:`ElementSelector` to search within
     :param str xpath: XPath query
     :param list elements: list of :class:`selenium.WebElement` objects
     :param bool filter_displayed: whether to only return displayed elements
     :param bool filter_enabled: whether to only return enabled elements
+    :param dict plan: query plan, see :attr:`plan`
+    :param dict locator: query plan to find the elements with instead of
+        `xpath`, see :func:`locate`
 
     Delays evaluation to batch the queries together, allowing operations on
     selectors (e.g. union) to be performed first, and then issuing as few
-    requests to the browser as possible.
+    requests to the browser as possible. The operations build up a query plan
+    which the browser evaluates, together with the visibility and enabled
+    filters, in a single request.
 
-    One of `xpath` or `elements` must be passed. Passing `xpath` creates a
-    selector delaying evaluation until it's needed, passing `elements`
-    stores the elements immediately.
+    One of `xpath`, `locator`, `plan` or `elements` must be passed. Passing
+    `xpath`, `locator` or `plan` creates a selector delaying evaluation until
+    it's needed, passing `elements` stores the elements immediately.
 
     Can behave as an iterable of elements or a single element by proxying all
     method calls, asserting that there is only one element selected.
 
     Can be combined using the addition operator (``+``) to `OR` XPath queries
-    together.
+    together, and the ``&`` operator to intersect them. See also
+    :meth:`union`, :meth:`find`, :meth:`limit`, :meth:`otherwise` and
+    :meth:`shortest`.
     """
 
     def __init__(self, browser, xpath=None, elements=None,  # pylint:disable=too-many-arguments
-                 filter_displayed=False, filter_enabled=False):
+                 filter_displayed=False, filter_enabled=False, plan=None,
+                 locator=None):
         """
         Initialise the selector.
 
-        One of `xpath` or `elements` must be passed. Passing `xpath` creates a
-        selector delaying evaluation until it's needed, passing `elements`
-        stores the elements immediately.
+        One of `xpath`, `locator`, `plan` or `elements` must be passed.
+        Passing `xpath`, `locator` or `plan` creates a selector delaying
+        evaluation until it's needed, passing `elements` stores the elements
+        immediately.
         """
         self.browser = browser
 
-        if xpath is None and elements is None:
-            raise ValueError("Must supply either xpath or elements.")
+        if xpath is None and elements is None and plan is None and \
+                locator is None:
+            raise ValueError(
+                "Must supply either xpath, locator, plan or elements.")
 
+        # An XPath query is kept as the equivalent locator
         if xpath is not None:
-            self.xpath = xpath
-        else:
+            locator = {'op': 'xpath', 'xpath': xpath}
+        self.locator = locator
+        self._query = plan
+        # Set on the unions of plain queries made by adding them
+        self._summands_filters = None
+        if locator is None and plan is None:
             self._elements_cached = elements
 
         self.filter_displayed = filter_displayed
         self.filter_enabled = filter_enabled
 
+    @property
+    def xpath(self):
+        """The XPath query of the selector, if it has one."""
+
+        if self.locator is not None and self.locator['op'] == 'xpath':
+            return self.locator['xpath']
+        return None
+
     @property
     def evaluated(self):
         """Whether the selector has already been evaluated."""
 
         return hasattr(self, '_elements_cached')
 
+    @property
+    def driver(self):
+        """The browser to evaluate the query in."""
+
+        browser = self.browser
+        while isinstance(browser, ElementSelector):
+            browser = browser.browser
+
+        if isinstance(browser, WebElement):
+            return browser.parent
+
+        return browser
+
+    @property
+    def plan(self):
+        """
+        The query plan to evaluate in the browser.
+
+        The plan is a tree of dictionaries, each having an ``op`` key naming
+        the operation and the operation parameters:
+
+        * ``xpath``: elements matching ``xpath``
+        * ``css``: elements matching the CSS selector ``css``
+        * ``id``: the element with the ID ``id`` if it matches the CSS
+          selector ``css``, see :func:`locator_plan`
+        * ``field``: the form fields of any of the ``types`` having ``value``
+          as their ID, name or label text, see :func:`find_field`
+        * ``elements``: the given ``elements``
+        * ``filter``: elements of ``plan`` which are ``displayed`` and/or
+          ``enabled``
+        * ``concat``: elements of all the ``plans`` one after another
+        * ``union``: elements of any of the ``plans``, in document order
+        * ``intersection``: elements of the first of the ``plans`` which are
+          in all the others
+        * ``otherwise``: elements of the first of the ``plans`` which has any
+        * ``scope``: elements of ``plan`` evaluated within each element of
+          ``context``, in document order
+        * ``limit``: the first ``count`` elements of ``plan``
+        * ``shortest``: the element of ``plan`` with the shortest value (or
+          text, if ``by_text``)
+        """
+
+        if self.evaluated:
+            return {'op': 'elements', 'elements': list(self._elements_cached)}
+
+        if self._query is not None:
+            return self._query
+
+        plan = self.locator
+        if self.filter_displayed or self.filter_enabled:
+            plan = {
+                'op': 'filter',
+                'plan': plan,
+                'displayed': self.filter_displayed,
+                'enabled': self.filter_enabled,
+            }
+
+        if isinstance(self.browser, ElementSelector):
+            plan = {'op': 'scope', 'context': self.browser.plan, 'plan': plan}
+        elif isinstance(self.browser, WebElement):
+            plan = {
+                'op': 'scope',
+                'context': {'op': 'elements', 'elements': [self.browser]},
+                'plan': plan,
+            }
+
+        return plan
+
+    def _combine(self, op, *others, **params):
+        """A delayed selector combining the plans of several selectors."""
+
+        plans = []
+        for selector in (self,) + others:
+            plan = as_selector(self.driver, selector).plan
+            # All the combining operations are associative
+            if plan['op'] == op and not params:
+                plans.extend(plan['plans'])
+            else:
+                plans.append(plan)
+
+        return ElementSelector(
+            self.driver, plan=dict(op=op, plans=plans, **params))
+
+    def _wrap(self, op, **params):
+        """A delayed selector applying an operation to this one's plan."""
+
+        return ElementSelector(
+            self.driver, plan=dict(op=op, plan=self.plan, **params))
+
     def filter(self, displayed=False, enabled=False):
         """
         Filter elements by visibility and enabled status.
@@ -106,44 +1127,82 @@ class ElementSelector(object):
         Returns: an :class:`ElementSelector`
         """
 
+        if not displayed and not enabled:
+            return self
+
+        return self._wrap('filter', displayed=displayed, enabled=enabled)
+
+    def union(self, other):
+        """
+        The elements selected by either selector, in document order.
+
+        Returns: an :class:`ElementSelector`
+        """
+
+        return self._combine('union', other)
+
+    def intersection(self, other):
+        """
+        The elements selected by both selectors.
+
+        Returns: an :class:`ElementSelector`
+        """
+
+        return self._combine('intersection', other)
+
+    __and__ = intersection
+
+    def otherwise(self, other):
+        """
+        The elements of this selector, or, if there are none, the elements of
+        the other one.
+
+        Returns: an :class:`ElementSelector`
+        """
+
+        return self._combine('otherwise', other)
+
+    def find(self, xpath, **kwargs):
+        """
+        The elements matching an XPath query within the selected elements.
+
+        :param str xpath: XPath query, relative to each selected element
+        :param kwargs: other parameters for :class:`ElementSelector`
+
+        Returns: an :class:`ElementSelector`
+        """
+
+        return ElementSelector(self, xpath=xpath, **kwargs)
+
+    def limit(self, count):
+        """
+        The first `count` elements of the selector.
+
+        Returns: an :class:`ElementSelector`
+        """
+
         if self.evaluated:
-            # Filter elements one by one
-            result = self
+            return ElementSelector(self.browser, elements=self[:count])
 
-            if displayed:
-                result = ElementSelector(
-                    result.browser,
-                    elements=[e for e in result if e.is_displayed()]
-                )
+        return self._wrap('limit', count=count)
 
-            if enabled:
-                result = ElementSelector(
-                    result.browser,
-                    elements=[e for e in result if e.is_enabled()]
-                )
+    def shortest(self, by_text=False):
+        """
+        The element with the shortest value (or text), i.e. the most closely
+        matching one.
 
-        else:
-            result = copy(self)
-            if displayed:
-                result.displayed = True
-            if enabled:
-                result.enabled = True
+        Returns: an :class:`ElementSelector`
+        """
 
-        return result
+        return self._wrap('shortest', by_text=by_text)
 
     def _select(self):
         """Fetch the elements from the browser."""
 
-        for element in self.browser.find_elements_by_xpath(self.xpath):
-            if self.filter_displayed:
-                if not element.is_displayed():
-                    continue
+        if CACHE is not None:
+            return CACHE.select(self.driver, self.plan)
 
-            if self.filter_enabled:
-                if not element.is_enabled():
-                    continue
-
-            yield element
+        return self.driver.execute_script(QUERY_SCRIPT, self.plan) or []
 
     def _elements(self):
         """
@@ -153,6 +1212,21 @@ class ElementSelector(object):
             setattr(self, '_elements_cached', list(self._select()))
         return self._elements_cached
 
+    @property
+    def _union_filters(self):
+        """
+        The filters of a delayed XPath or locator query, or of a union of
+        them made by adding, or None for other selectors.
+        """
+
+        if self.evaluated:
+            return None
+
+        if self._query is None:
+            return (self.filter_displayed, self.filter_enabled)
+
+        return self._summands_filters
+
     def __add__(self, other):
         """
         Return a union of the two selectors.
@@ -160,28 +1234,29 @@ class ElementSelector(object):
         Where possible, avoid evaluating either selector to batch queries.
         """
 
-        if not self.evaluated \
+        filters = self._union_filters
+        if filters is not None \
                 and isinstance(other, ElementSelector) \
-                and not other.evaluated \
-                and self.filter_displayed == other.filter_displayed \
-                and self.filter_enabled == other.filter_enabled:
-            # Both summands are delayed, return a new delayed selector
-            return ElementSelector(
-                self.browser,
-                xpath=self.xpath + '|' + other.xpath,
-                filter_displayed=self.filter_displayed,
-                filter_enabled=self.filter_enabled,
-            )
-        else:
-            # Have to evaluate everything now
-            # other can be either an already evaluated ElementSelector, a list
-            # or a single element
-            try:
-                other = list(other)
-            except TypeError:
-                other = [other]
+                and other._union_filters == filters \
+                and self.browser is other.browser:
+            # Both summands are plain queries, return a new delayed selector
+            if self.xpath is not None and other.xpath is not None:
+                return ElementSelector(
+                    self.browser,
+                    xpath=self.xpath + '|' + other.xpath,
+                    filter_displayed=self.filter_displayed,
+                    filter_enabled=self.filter_enabled,
+                )
 
-            return ElementSelector(self.browser, elements=list(self) + other)
+            # Like the XPath union, in document order
+            union = self._combine('union', other)
+            union._summands_filters = filters  # pylint:disable=protected-access
+            return union
+        else:
+            # Return the elements of the first selector followed by the
+            # elements of the second; other can be either an ElementSelector,
+            # a list or a single element
+            return self._combine('concat', other)
 
     # The class behaves as a container for the elements, fetching the list from
     # the browser on the first attempt to enumerate itself.
@@ -204,15 +1279,307 @@ class ElementSelector(object):
         Delegate all calls to the only element selected.
         """
 
-        if attr == '_elements_cached':
+        if attr == '_elements_cached' or attr.startswith('__'):
             # Never going to be on the element
-            raise AttributeError()
+            raise AttributeError(attr)
 
         assert len(self) == 1, \
             'Must be a single element, have {0}'.format(len(self))
         return getattr(self[0], attr)
 
 
+def as_selector(browser, value):
+    """
+    Convert an element or a list of elements into an
+    :class:`ElementSelector`.
+
+    :param browser: ``world.browser``
+    :param value: an :class:`ElementSelector`, an element or a list of them
+
+    Returns: an :class:`ElementSelector`
+    """
+
+    if isinstance(value, ElementSelector):
+        return value
+
+    try:
+        elements = list(value)
+    except TypeError:
+        elements = [value]
+
+    return ElementSelector(browser, elements=elements)
+
+
+def locator_plan(tag='*', attributes=()):
+    """
+    The cheapest query plan finding the elements by tag and attribute values.
+
+    :param str tag: the tag name, or ``*`` for any element
+    :param attributes: a list of (name, value) pairs the attributes must
+        equal
+
+    The elements are found by ``getElementById`` if the ``id`` is among the
+    attributes, otherwise with a CSS selector. Either is much faster than
+    XPath on large pages; XPath is only needed to match the text or parts of
+    the values.
+    """
+
+    css = tag + ''.join(
+        '[{}={}]'.format(name, css_string(value))
+        for name, value in attributes
+    )
+
+    for name, value in attributes:
+        if name == 'id':
+            return {'op': 'id', 'id': value, 'css': css}
+
+    return {'op': 'css', 'css': css}
+
+
+def locate(browser, tag='*', attributes=(), **kwargs):
+    """
+    Find the elements by tag and attribute values.
+
+    :param browser: ``world.browser``, an element or an
+        :class:`ElementSelector` to search within
+    :param kwargs: other parameters for :class:`ElementSelector`
+
+    See :func:`locator_plan`.
+
+    Returns: an :class:`ElementSelector`
+    """
+
+    return ElementSelector(
+        browser, locator=locator_plan(tag, attributes), **kwargs)
+
+
+class SelectorCache(object):
+    """
+    A cache of the elements found by :class:`ElementSelector` queries.
+
+    :param int size: the number of queries to keep the results of
+
+    The cached results are used for as long as the page stays the same: each
+    lookup still makes a request to the browser, but it only checks that the
+    DOM hasn't changed and the elements are still in the document since the
+    results were cached, and only runs the query again otherwise. Navigating
+    to another page invalidates the cache.
+
+    Changes not reflected in the DOM, e.g. elements becoming hidden due to
+    scrolling or resizing the window, are not noticed. To use the cache:
+
+    .. code-block:: python
+
+        from aloe_webdriver import util
+
+        util.CACHE = util.SelectorCache()
+    """
+
+    def __init__(self, size=128):
+        self.size = size
+        self.driver = None
+        self.token = None
+        self.results = OrderedDict()
+
+    def clear(self):
+        """Forget all the cached results."""
+
+        self.token = None
+        self.results.clear()
+
+    def select(self, driver, plan):
+        """
+        Evaluate a query plan, reusing the cached results if the page hasn't
+        changed.
+
+        :param driver: the browser
+        :param dict plan: the query plan (see :attr:`ElementSelector.plan`)
+
+        Returns: a list of elements
+        """
+
+        if driver is not self.driver:
+            self.clear()
+            self.driver = driver
+
+        key = json.dumps(plan, sort_keys=True,
+                         default=lambda element: element.id)
+        cached = self.results.get(key)
+
+        try:
+            token, elements = driver.execute_script(
+                CACHED_QUERY_SCRIPT, self.token, cached, plan)
+        except StaleElementReferenceException:
+            # The cached elements are from a page no longer displayed
+            self.clear()
+            token, elements = driver.execute_script(
+                CACHED_QUERY_SCRIPT, None, None, plan)
+
+        if elements is None:
+            self.results.move_to_end(key)
+            return cached
+
+        if token != self.token:
+            self.clear()
+            self.token = token
+
+        self.results[key] = elements = elements or []
+        self.results.move_to_end(key)
+        while len(self.results) > self.size:
+            self.results.popitem(last=False)
+
+        return elements
+
+
+CACHE = None
+
+
+def form_states(browser, selectors):
+    """
+    The state of the selected form controls, in a single request.
+
+    :param browser: ``world.browser``
+    :param selectors: a list of :class:`ElementSelector` objects, elements
+        or lists of elements
+
+    Returns: for each selector, a list of dictionaries, one per selected
+    element, with the keys:
+
+    * ``element``: the element
+    * ``tag``: the tag name, in lowercase
+    * ``type``: the ``type`` property, e.g. ``checkbox`` or ``select-one``
+    * ``id``, ``name``: the attributes
+    * ``value``: the current value
+    * ``text``: the text of an option, ``None`` for the other elements
+    * ``selected``: whether an option is selected, or a checkbox or a radio
+      button checked
+    * ``controls``: the states of the inputs, selects, textareas and options
+      within the element, e.g. the options of a select or the fields of a
+      form
+    """
+
+    plans = [as_selector(browser, selector).plan for selector in selectors]
+    return browser.execute_script(FORM_STATE_SCRIPT, plans)
+
+
+def form_state(selector):
+    """
+    The state of the form controls of an :class:`ElementSelector`, see
+    :func:`form_states`.
+    """
+
+    return form_states(selector.driver, [selector])[0]
+
+
+def single_state(states, description):
+    """
+    The state of the only element, asserting there is exactly one.
+
+    :param states: the states as returned by :func:`form_state`
+    :param description: the element description for the error messages
+    """
+
+    if not states:
+        raise AssertionError("Cannot find {}.".format(description))
+    if len(states) > 1:
+        raise AssertionError("Found {} elements for {}, expected one.".format(
+            len(states), description))
+    return states[0]
+
+
+def fill_in_fields(browser, fields):
+    """
+    Set the values of several form fields in a single request.
+
+    :param browser: ``world.browser``
+    :param fields: a list of (selector, value) tuples, the selectors being
+        :class:`ElementSelector` objects, elements or lists of elements
+
+    Text fields are set to the value. Checkboxes and radio buttons are
+    clicked to become ``checked`` or ``unchecked``. The option of a select
+    with the value as its text or value is selected; for a multiple select,
+    the value is a comma-separated list of the options to select. The
+    ``input`` and ``change`` events are fired as if the user had changed
+    the fields.
+
+    No field is changed unless every selector finds exactly one field which
+    can take its value.
+
+    Returns: for each field, ``None`` if it can be set, otherwise a list
+    describing the problem: ``['missing']``, ``['multiple', count]``,
+    ``['disabled']``, ``['state', value]`` (a checkbox or radio button value
+    other than ``checked`` or ``unchecked``, or unchecking a radio button) or
+    ``['option', name]`` (an option not found)
+    """
+
+    return browser.execute_script(FILL_IN_SCRIPT, [
+        [as_selector(browser, selector).plan, value]
+        for selector, value in fields
+    ])
+
+
+def probe_interactable(browser, selector, probe_all=False):
+    """
+    Check which of the selected elements can be clicked, in a single
+    request.
+
+    :param browser: ``world.browser``
+    :param selector: an :class:`ElementSelector`, an element or a list of
+        elements
+    :param probe_all: whether to probe all the elements
+
+    The elements are probed in turn until one is displayed, enabled, within
+    the window once scrolled into view and not covered by other elements at
+    its centre, or until they are all probed if ``probe_all`` is true.
+
+    Returns: a list of dictionaries, one per element probed, with the
+    element (``element``) and whether each of the checks (``displayed``,
+    ``enabled``, ``in_viewport``, ``hit``) passed
+    """
+
+    return browser.execute_script(
+        INTERACTABLE_SCRIPT, as_selector(browser, selector).plan, probe_all)
+
+
+def first_interactable(browser, selector, description, single=False):
+    """
+    The first of the selected elements that can be clicked, see
+    :func:`probe_interactable`.
+
+    :param browser: ``world.browser``
+    :param selector: an :class:`ElementSelector`, an element or a list of
+        elements
+    :param description: the element description for the error messages
+    :param single: whether to require exactly one element to be selected
+
+    Raises AssertionError if there is no such element, or if ``single`` is
+    true and more than one element is selected.
+    """
+
+    probed = probe_interactable(browser, selector, probe_all=single)
+    if not probed:
+        raise AssertionError("Cannot find {}.".format(description))
+    if single and len(probed) > 1:
+        raise AssertionError("Found {} elements for {}, expected one.".format(
+            len(probed), description))
+
+    if probed[-1]['hit']:
+        return probed[-1]['element']
+
+    # Report why the first candidate cannot be clicked
+    first = probed[0]
+    if not first['displayed']:
+        reason = "not displayed"
+    elif not first['enabled']:
+        reason = "disabled"
+    elif not first['in_viewport']:
+        reason = "outside the window"
+    else:
+        reason = "covered by another element"
+    raise AssertionError("Cannot click {}: it is {}.".format(
+        description, reason))
+
+
 def element_id_by_label(browser, label):
     """
     The ID of an element referenced by a `label`s ``for`` attribute. The label
@@ -269,6 +1636,51 @@ def field_xpath(field, attribute):
     return xpath.format(field=field, attr=attribute)
 
 
+def field_locator(field, attribute, value):
+    """
+    The tag and attributes to locate a field by, as :func:`field_xpath` does.
+
+    Returns: a (tag, attributes) tuple for :func:`locate`, or ``None`` if
+    the field must be matched by its contents using :func:`field_xpath`
+    """
+
+    if field in ('button-role', 'button-element') and attribute == 'value':
+        return None
+
+    if field in ['select', 'textarea', 'option']:
+        return field, [(attribute, value)]
+
+    if field == 'button-role':
+        return '*', [('role', 'button'), (attribute, value)]
+
+    if field == 'button-element':
+        return 'button', [(attribute, value)]
+
+    return 'input', [(attribute, value), ('type', field)]
+
+
+def find_field_by_attribute(browser, field, attribute, value, **kwargs):
+    """
+    Locate the fields with an attribute equal to the value, or, for
+    ``value`` of the buttons, containing it.
+
+    Uses native lookups where possible, see :func:`locator_plan`.
+
+    Returns: an :class:`ElementSelector`
+    """
+
+    locator = field_locator(field, attribute, value)
+    if locator is None:
+        return ElementSelector(
+            browser,
+            xpath=str(field_xpath(field, attribute) % string_literal(value)),
+            **kwargs
+        )
+
+    tag, attributes = locator
+    return locate(browser, tag, attributes, **kwargs)
+
+
 def find_button(browser, value):
     """
     Find a button with the given value.
@@ -282,6 +1694,8 @@ def find_button(browser, value):
         <button>
         <{a,p,div,span,...} role="button">
 
+    All the queries are combined into a single request to the browser.
+
     Returns: an :class:`ElementSelector`
     """
     field_types = (
@@ -307,19 +1721,32 @@ def find_field_with_value(browser, field, value):
 
 
 def find_option(browser, select_name, option_name):
-    # First, locate the select
+    """
+    Locate an option of a select.
+
+    :param browser: ``world.browser``
+    :param string select_name: an id, name or label of the select
+    :param string option_name: an id, name, label or text of the option
+
+    The select and the option are searched for in a single request.
+
+    Returns: an :class:`ElementSelector`
+    """
     select_box = find_field(browser, 'select', select_name)
-    assert select_box, "Cannot find a '{}' select.".format(select_name)
 
-    # Now locate the option
-    option_box = find_field(select_box, 'option', option_name)
-    if not option_box:
+    option_box = find_field(select_box, 'option', option_name).otherwise(
         # Locate by contents
-        option_box = select_box.find_element_by_xpath(str(
-            './/option[contains(., "%s")]' % option_name))
+        select_box.find(str('.//option[contains(., "%s")]' % option_name))
+        .limit(1))
+    if not option_box:
+        assert select_box, "Cannot find a '{}' select.".format(select_name)
     return option_box
 
 
+# The field types not in the index of form controls
+UNINDEXED_FIELDS = ('option', 'button-element', 'button-role')
+
+
 def find_field(browser, field_type, value):
     """
     Locate an input field.
@@ -331,11 +1758,13 @@ def find_field(browser, field_type, value):
     This first looks for `value` as the id of the element, else
     the name of the element, else as a label for the element.
 
+    Inputs, selects and textareas are looked up in an index of the form
+    controls of the page, built in the browser and kept until the DOM
+    changes, rather than with a query for each of the id, name and label.
+
     Returns: an :class:`ElementSelector`
     """
-    return find_field_by_id(browser, field_type, value) + \
-        find_field_by_name(browser, field_type, value) + \
-        find_field_by_label(browser, field_type, value)
+    return find_any_field(browser, (field_type,), value)
 
 
 def find_any_field(browser, field_types, field_name):
@@ -351,11 +1780,26 @@ def find_any_field(browser, field_types, field_name):
     See also: :func:`find_field`.
     """
 
-    return reduce(
-        operator.add,
-        (find_field(browser, field_type, field_name)
-         for field_type in field_types)
-    )
+    selectors = []
+
+    indexed = [field_type for field_type in field_types
+               if field_type not in UNINDEXED_FIELDS]
+    if indexed:
+        selectors.append(ElementSelector(
+            browser,
+            locator={'op': 'field', 'types': indexed, 'value': field_name},
+            filter_displayed=True,
+        ))
+
+    for field_type in field_types:
+        if field_type in UNINDEXED_FIELDS:
+            selectors.extend((
+                find_field_by_id(browser, field_type, field_name),
+                find_field_by_name(browser, field_type, field_name),
+                find_field_by_label(browser, field_type, field_name),
+            ))
+
+    return reduce(operator.add, selectors)
 
 
 def find_field_by_id(browser, field_type, id):
@@ -368,11 +1812,8 @@ def find_field_by_id(browser, field_type, id):
 
     Returns: an :class:`ElementSelector`
     """
-    return ElementSelector(
-        browser,
-        xpath=field_xpath(field_type, 'id') % string_literal(id),
-        filter_displayed=True,
-    )
+    return find_field_by_attribute(
+        browser, field_type, 'id', id, filter_displayed=True)
 
 
 def find_field_by_name(browser, field_type, name):
@@ -385,12 +1826,8 @@ def find_field_by_name(browser, field_type, name):
 
     Returns: an :class:`ElementSelector`
     """
-    return ElementSelector(
-        browser,
-        field_xpath(field_type, 'name') %
-        string_literal(name),
-        filter_displayed=True,
-    )
+    return find_field_by_attribute(
+        browser, field_type, 'name', name, filter_displayed=True)
 
 
 def find_field_by_value(browser, field_type, name):
@@ -403,25 +1840,15 @@ def find_field_by_value(browser, field_type, name):
 
     Returns: an :class:`ElementSelector`
     """
-    xpath = field_xpath(field_type, 'value') % string_literal(name)
-    elems = ElementSelector(
-        browser,
-        xpath=str(xpath),
+    elems = find_field_by_attribute(
+        browser, field_type, 'value', name,
         filter_displayed=True,
         filter_enabled=True,
     )
 
-    # sort by shortest first (most closely matching)
-    if field_type in ('button-element', 'button-role'):
-        elems = sorted(elems, key=lambda elem: len(elem.text))
-    else:
-        elems = sorted(elems,
-                       key=lambda elem: len(elem.get_attribute('value')))
-
-    if elems:
-        elems = [elems[0]]
-
-    return ElementSelector(browser, elements=elems)
+    # shortest first (most closely matching)
+    return elems.shortest(
+        by_text=field_type in ('button-element', 'button-role'))
 
 
 def find_field_by_label(browser, field_type, label):
@@ -456,49 +1883,352 @@ def option_in_select(browser, select_name, option):
     create the DOM until we click on it.
     """
 
-    select = find_field(browser, 'select', select_name)
-    assert select, "Cannot find a '{}' select.".format(select_name)
+    select = find_field(browser, 'select', select_name).limit(1)
+    option = select.find(str(
+        './/option[normalize-space(text())=%s]' % string_literal(option)))
 
-    try:
-        return select.find_element_by_xpath(str(
-            './/option[normalize-space(text())=%s]' % string_literal(option)))
-    except NoSuchElementException:
-        return None
+    # Fetch both the select and the option in a single request
+    found = list(select + option.limit(1))
+    assert found, "Cannot find a '{}' select.".format(select_name)
+
+    if len(found) > 1:
+        return found[1]
+    return None
 
 
 TIMEOUT = 15
 CHECK_EVERY = 0.2
 
 
-def wait_for(func):
+class FixedInterval(object):
+    """
+    A :func:`wait_for` scheduler retrying at a fixed interval.
+
+    :param float interval: seconds between the attempts (default
+        ``CHECK_EVERY``)
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval
+
+    def delays(self):
+        """Seconds to wait before each subsequent attempt."""
+
+        while True:
+            yield CHECK_EVERY if self.interval is None else self.interval
+
+    def pause(self, delay):  # pylint:disable=no-self-use
+        """Wait for the given number of seconds before the next attempt."""
+
+        sleep(delay)
+
+
+class ExponentialBackoff(FixedInterval):
+    """
+    A :func:`wait_for` scheduler retrying after exponentially growing
+    intervals, randomly shortened to spread the load of parallel sessions.
+
+    :param float initial: seconds to wait before the second attempt
+    :param float factor: how much longer to wait before each next attempt
+    :param float maximum: the longest wait between attempts
+    :param float jitter: the largest fraction of each wait to skip at random
+    """
+
+    def __init__(self, initial=0.05, factor=1.5, maximum=1.0, jitter=0.25):
+        super().__init__()
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self.jitter = jitter
+
+    def delays(self):
+        delay = self.initial
+        while True:
+            yield delay * (1 - self.jitter * random())
+            delay = min(delay * self.factor, self.maximum)
+
+
+class DOMChanges(FixedInterval):
+    """
+    A :func:`wait_for` scheduler retrying as soon as the page changes.
+
+    After a failed attempt, waits in the browser until the DOM is modified,
+    the URL changes or the page is navigated away from, but no longer than
+    `interval` seconds (as not every change is visible in the DOM).
+
+    :param float interval: the longest wait between attempts
+    :param browser: the browser to watch (default ``world.browser``)
+
+    To use for all the steps:
+
+    .. code-block:: python
+
+        from aloe_webdriver import util
+
+        util.SCHEDULER = util.DOMChanges()
+    """
+
+    def __init__(self, interval=2.0, browser=None):
+        super().__init__(interval)
+        self.browser = browser
+        self.token = None
+
+    def pause(self, delay):
+        browser = self.browser or world.browser
+
+        start = time()
+        try:
+            self.token = browser.execute_async_script(
+                WAIT_FOR_CHANGE_SCRIPT, self.token, int(delay * 1000))
+        except TimeoutException:
+            # The browser's script timeout is shorter than the delay
+            sleep(max(0, delay - (time() - start)))
+        except WebDriverException:
+            # The page was navigated away from, or is blocked by an alert
+            self.token = None
+            sleep(max(0, min(delay, CHECK_EVERY) - (time() - start)))
+
+
+SCHEDULER = ExponentialBackoff()
+
+# Seconds without requests in flight for the page to be considered idle
+IDLE_QUIET = 0.1
+
+# Whether to wait for the page to be idle before the first attempt of the
+# functions decorated with wait_for
+WAIT_FOR_IDLE = False
+
+
+def wait_until_idle(browser, timeout=None, quiet=None):
+    """
+    Wait until the page has finished loading and there are no XHR or
+    ``fetch`` requests in flight, nor a pending navigation.
+
+    :param browser: ``world.browser``
+    :param float timeout: the longest time to wait, in seconds (default
+        ``TIMEOUT``)
+    :param float quiet: how long the page must stay without requests, in
+        seconds (default ``IDLE_QUIET``)
+
+    The waiting is done by the browser, returning as soon as the page is idle.
+    Only the requests started after the page was first inspected by one of
+    the utilities are known.
+
+    Returns: whether the page became idle in time
+    """
+
+    deadline = time() + (TIMEOUT if timeout is None else timeout)
+    quiet = IDLE_QUIET if quiet is None else quiet
+
+    while True:
+        remaining = deadline - time()
+        start = time()
+        try:
+            if browser.execute_async_script(
+                    IDLE_SCRIPT,
+                    int(quiet * 1000),
+                    int(max(remaining, 0) * 1000)):
+                return True
+        except TimeoutException:
+            # The browser's script timeout is shorter than the wait
+            pass
+        except UnexpectedAlertPresentException:
+            # Nothing happens on the page until the alert is dealt with
+            return False
+        except WebDriverException:
+            # The page was navigated away from, wait for the new one
+            sleep(max(0, min(remaining, CHECK_EVERY) - (time() - start)))
+
+        if time() >= deadline:
+            return False
+
+
+# Seconds for which nothing must match for a negative assertion to pass
+ABSENCE_QUIET = 0.1
+
+# The longest time, in seconds, a single absence check waits in the browser
+# for the matches to disappear, well within the browsers' default script
+# timeout
+ABSENCE_WAIT = 2.0
+
+
+def absent_now(browser, query):
+    """
+    Check once that nothing on the page matches a text or query plan query
+    of :func:`confirm_absent`.
+    """
+
+    if 'text' in query:
+        return not browser.execute_script(TEXT_SEARCH_SCRIPT, query['text'])
+    return not browser.execute_script(QUERY_SCRIPT, query['plan'])
+
+
+def confirm_absent(browser, query, quiet=None, timeout=None,  # pylint:disable=too-many-arguments
+                   script=ABSENCE_SCRIPT, check_now=absent_now):
+    """
+    Check, in a single request, that nothing on the page matches the query.
+
+    :param browser: ``world.browser``
+    :param query: a dictionary with either a query plan (``plan``, see
+        :attr:`ElementSelector.plan`), a text to look for as in
+        :func:`aloe_webdriver.contains_content` (``text``) or a jQuery
+        selector (``jquery``)
+    :param float quiet: how long nothing must match, in seconds (default
+        ``ABSENCE_QUIET``)
+    :param float timeout: how long to wait for the matches to disappear, in
+        seconds (default ``ABSENCE_WAIT``)
+    :param script: the script doing the check, for adding jQuery first
+    :param check_now: a function of the browser and the query checking once
+        that nothing matches, for when the browser cannot wait (see
+        :func:`absent_now`)
+
+    The query is checked again on every change to the page, so a match
+    appearing briefly during the `quiet` time is noticed. The browser waits
+    no more than ``ABSENCE_WAIT`` seconds in each script, which is run again
+    until the timeout; if its script timeout is shorter than that, or the
+    page is navigated away from, the page is checked with `check_now`
+    instead.
+
+    Returns: whether nothing matched, or ``None`` if the query is a jQuery
+    selector and the page has no jQuery
+    """
+
+    quiet = ABSENCE_QUIET if quiet is None else quiet
+    timeout = ABSENCE_WAIT if timeout is None else timeout
+    deadline = time() + timeout
+
+    while True:
+        wait = min(max(deadline - time(), 0), ABSENCE_WAIT)
+        try:
+            absent = browser.execute_async_script(
+                script, query, int(quiet * 1000), int(wait * 1000))
+        except UnexpectedAlertPresentException:
+            # Nothing can be checked until the alert is dealt with
+            raise
+        except WebDriverException:
+            # The script timed out or the page was navigated away from while
+            # checking, check the page as it is now
+            start = time()
+            absent = bool(check_now(browser, query))
+            remaining = deadline - start
+            if not absent and remaining > 0:
+                sleep(max(0, min(remaining, CHECK_EVERY) - (time() - start)))
+                continue
+
+        if absent is None:
+            return None
+        if absent or time() >= deadline:
+            return bool(absent)
+
+
+TIMEOUT_TAG = re.compile(r'^timeout=(\d+(?:\.\d+)?)$')
+
+
+def tagged_timeout(step):
+    """
+    The timeout set for the step's scenario or feature by a tag, e.g.
+    ``@timeout=5``.
+
+    :param step: an Aloe step
+
+    Returns: number of seconds or ``None``
+    """
+
+    try:
+        tags = step.scenario.tags
+    except AttributeError:
+        try:
+            tags = step.feature.tags
+        except AttributeError:
+            return None
+
+    for tag in tags:
+        match = TIMEOUT_TAG.match(tag)
+        if match:
+            return float(match.group(1))
+
+    return None
+
+
+def step_timeout(step):
+    """
+    The time to wait for a step to pass: the one set by a tag (see
+    :func:`tagged_timeout`), or ``TIMEOUT``.
+
+    :param step: an Aloe step
+
+    Returns: number of seconds
+    """
+
+    timeout = tagged_timeout(step)
+    return TIMEOUT if timeout is None else timeout
+
+
+def wait_for(func=None, timeout=None, scheduler=None, idle=None):
     """
     A decorator to invoke a function, retrying on assertion errors for a
     specified time interval.
 
     Adds a kwarg `timeout` to `func` which is a number of seconds to try
-    for (default 15).
+    for. The time taken by the function itself counts towards the timeout; no
+    attempts are started after it expires.
+
+    When not passed explicitly, the timeout is taken from a ``@timeout=N`` tag
+    on the scenario or feature of the step being run, then from the
+    decorator's `timeout` argument, and defaults to ``TIMEOUT`` (15 seconds):
+
+    .. code-block:: python
+
+        @step('I should see the report')
+        @wait_for(timeout=60)
+        def see_report(self):
+            ...
+
+    The intervals between the attempts are decided by `scheduler`, by default
+    ``SCHEDULER`` (see :class:`ExponentialBackoff` and
+    :class:`FixedInterval`).
+
+    If `idle` is true (by default, if ``WAIT_FOR_IDLE`` is), the first attempt
+    is made once ``world.browser`` is idle (see :func:`wait_until_idle`),
+    waiting no longer than the timeout.
     """
 
+    if func is None:
+        return partial(wait_for, timeout=timeout, scheduler=scheduler,
+                       idle=idle)
+
     @wraps(func)
     def wrapped(*args, **kwargs):
-        timeout = kwargs.pop('timeout', TIMEOUT)
+        start = time()
 
-        start = None
+        deadline = kwargs.pop('timeout', None)
+        if deadline is None and args and isinstance(args[0], Step):
+            deadline = tagged_timeout(args[0])
+        if deadline is None:
+            deadline = TIMEOUT if timeout is None else timeout
+        deadline += start
+
+        schedule = scheduler or SCHEDULER
+        delays = schedule.delays()
+
+        if WAIT_FOR_IDLE if idle is None else idle:
+            wait_until_idle(world.browser, timeout=deadline - time())
 
         while True:
             try:
                 return func(*args, **kwargs)
             except AssertionError:
-                # The function took some time to test the assertion, however,
-                # the result might correspond to the state of the world at any
-                # point in time, perhaps earlier than the timeout. Therefore,
-                # start counting time from the first assertion fail, not from
-                # before the function was called.
-                if not start:
-                    start = time()
-                if time() - start < timeout:
-                    sleep(CHECK_EVERY)
+                remaining = deadline - time()
+                if remaining > 0:
+                    schedule.pause(min(next(delays), remaining))
                     continue
                 raise
 
     return wrapped
+
+
+def import_function(path):
+    """Import a function given as ``module:function``."""
+
+    module_name, _, function_name = path.partition(':')
+    return getattr(import_module(module_name), function_name)
@@ -40,6 +40,9 @@ if __name__ == '__main__':
             setup_requires=['setuptools_scm'],
 
             install_requires=requirements.readlines(),
+            extras_require={
+                'html': ['cssselect', 'lxml'],
+            },
 
             test_suite='aloe_webdriver',
             tests_require=test_requirements.readlines(),